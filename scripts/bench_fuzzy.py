@@ -0,0 +1,70 @@
+"""
+Microbenchmark for fuzzy name lookup.
+Compares FuzzyIndex closest-match queries with a linear scan that computes the
+edit distance to every name, and times incremental adds and removes.
+
+Usage:
+    python scripts/bench_fuzzy.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fuzzy_index import FuzzyIndex, edit_distance, normalize
+
+SYLLABLES = [
+    "ba", "ko", "ri", "mun", "tel", "sa", "dor", "vi", "pen", "lo", "gra", "sti",
+    "nar", "fe", "quo", "zil", "ta", "mer", "chi", "on",
+]
+
+def make_names(count, seed=1):
+    """Pronounceable one- and two-word names, like spot and site names"""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(rng.randint(1, 2))]
+        names.add(" ".join(words))
+    return sorted(names)
+
+def mishear(name, rng):
+    """Change one character of a name"""
+    index = rng.randrange(len(name))
+    return name[:index] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[index + 1:]
+
+def linear_closest(names, query):
+    """Reference implementation: edit distance to every name"""
+    spelling = normalize(query)
+    return min(names, key=lambda name: edit_distance(spelling, normalize(name)))
+
+def main():
+    print(f"{'names':>7} {'index query':>12} {'linear query':>13} {'visited':>8} {'add':>9} {'remove':>9}")
+    rng = random.Random(2)
+    for size in (100, 1000, 10000):
+        names = make_names(size)
+        index = FuzzyIndex(names)
+        queries = [mishear(rng.choice(names), rng) for _ in range(200)]
+
+        index.tree.visits = 0
+        seconds = timeit.timeit(lambda: [index.closest(query) for query in queries], number=1)
+        query_us = seconds / len(queries) * 1e6
+        visited = index.tree.visits / len(queries) / index.tree.size
+
+        linear_queries = queries[:20]
+        seconds = timeit.timeit(lambda: [linear_closest(names, query) for query in linear_queries], number=1)
+        linear_us = seconds / len(linear_queries) * 1e6
+
+        extra = make_names(size + 200, seed=3)[:200]
+        seconds = timeit.timeit(lambda: [index.add(name) for name in extra], number=1)
+        add_us = seconds / len(extra) * 1e6
+        seconds = timeit.timeit(lambda: [index.remove(name) for name in extra], number=1)
+        remove_us = seconds / len(extra) * 1e6
+
+        print(f"{size:>7} {query_us:>9.1f} us {linear_us:>10.1f} us {visited:>7.1%} "
+              f"{add_us:>6.1f} us {remove_us:>6.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmark for command dispatch.
+Compares registry resolution with a linear chain of string comparisons as the
+number of registered commands grows.
+
+Usage:
+    python scripts/bench_registry.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from command_registry import CommandRegistry
+
+def noop(*args):
+    pass
+
+def build(size):
+    """Build a registry and an equivalent linear chain with `size` filler commands and a tenth as many prefixes"""
+    registry = CommandRegistry()
+    chain = []
+    for index in range(size):
+        phrase = f"filler command {index}"
+        registry.register_exact(phrase, noop)
+        chain.append(("exact", phrase))
+        if index % 10 == 0:
+            prefix = f"filler prefix {index} "
+            registry.register_prefix(prefix, noop, lambda text: (text,))
+            chain.append(("prefix", prefix))
+        if index < 10:
+            # Parameterized commands stay few; the combined regex is tried once per command
+            pattern = rf"(?P<n{index}>\d+)\s+filler{index}"
+            registry.register_pattern(f"pattern {index}", pattern, noop, lambda match: ())
+            chain.append(("pattern", re.compile(pattern)))
+    # The commands being measured sit at the bottom, like "mark" and "exit" in handle_command
+    registry.register_prefix("mark ", noop, lambda text: (text,))
+    registry.register_exact("exit", noop)
+    chain.append(("prefix", "mark "))
+    chain.append(("exact", "exit"))
+    registry.compile_patterns()
+    return registry, chain
+
+def linear_dispatch(chain, command):
+    """Reference implementation: check every command in order"""
+    for kind, key in chain:
+        if kind == "exact" and command == key:
+            return key
+        if kind == "prefix" and command.startswith(key):
+            return key
+        if kind == "pattern" and key.match(command):
+            return key
+    return None
+
+def main():
+    print(f"{'commands':>9} {'registry exit':>14} {'registry mark':>14} {'linear exit':>12} {'linear mark':>12}")
+    for size in (10, 100, 1000, 10000):
+        registry, chain = build(size)
+        runs = 2000
+        results = []
+        for command in ("exit", "mark desk"):
+            assert registry.resolve(command) is not None
+            seconds = timeit.timeit(lambda: registry.resolve(command), number=runs)
+            results.append(seconds / runs * 1e6)
+        for command in ("exit", "mark desk"):
+            seconds = timeit.timeit(lambda: linear_dispatch(chain, command), number=runs // 10)
+            results.append(seconds / (runs // 10) * 1e6)
+        print(f"{size:>9} " + " ".join(f"{value:>11.2f} us" for value in results))
+
+if __name__ == "__main__":
+    main()
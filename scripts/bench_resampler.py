@@ -0,0 +1,76 @@
+"""
+Microbenchmark for the streaming resampler.
+Feeds ten seconds of audio at common device rates through PolyphaseResampler in
+BLOCK_SIZE-sized blocks and reports CPU time per second of audio, next to plain
+linear interpolation (np.interp), which is cheaper but lets tones above 8 kHz alias
+into the band the recognizer listens to.
+
+Usage:
+    python scripts/bench_resampler.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from resampler import PolyphaseResampler
+
+OUTPUT_RATE = 16000
+BLOCK_SIZE = 4000  # Output samples per block, as config.BLOCK_SIZE
+SECONDS = 10
+RATES = (22050, 32000, 44100, 48000, 96000)
+
+def tone(frequency, rate, seconds, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+def in_blocks(samples, rate):
+    size = round(BLOCK_SIZE * rate / OUTPUT_RATE)
+    return [samples[start:start + size] for start in range(0, len(samples), size)]
+
+def linear(block, rate):
+    """Reference: linear interpolation without an anti-aliasing filter (stateless)"""
+    positions = np.arange(0, len(block), rate / OUTPUT_RATE)
+    return np.interp(positions, np.arange(len(block)), block).astype(np.int16)
+
+def cpu_ms_per_second(resample, blocks):
+    started = time.process_time()
+    for block in blocks:
+        resample(block)
+    return (time.process_time() - started) * 1000 / SECONDS
+
+def level_db(samples, reference):
+    """RMS level of samples relative to a sine of the reference amplitude, ignoring the edges"""
+    trimmed = samples[len(samples) // 10:-len(samples) // 10].astype(np.float64)
+    rms = np.sqrt(np.mean(trimmed ** 2))
+    return 20 * np.log10(rms / (reference / np.sqrt(2))) if rms else None
+
+def format_db(level, width):
+    return f"{'silent':>{width}}" if level is None else f"{level:>{width - 3}.1f} dB"
+
+def main():
+    print(f"{'rate':>6} {'taps':>5} {'polyphase':>13} {'linear':>13} {'realtime':>9} "
+          f"{'1 kHz':>7} {'9.5 kHz alias':>14} {'linear alias':>13}")
+    for rate in RATES:
+        blocks = in_blocks(tone(440, rate, SECONDS), rate)
+        resampler = PolyphaseResampler(rate, OUTPUT_RATE)
+        polyphase_ms = cpu_ms_per_second(resampler.process, blocks)
+        linear_ms = cpu_ms_per_second(lambda block: linear(block, rate), blocks)
+
+        passband = PolyphaseResampler(rate, OUTPUT_RATE).process(tone(1000, rate, 1))
+        if rate > 2 * 9500:
+            alias = PolyphaseResampler(rate, OUTPUT_RATE).process(tone(9500, rate, 1))
+            alias_db = format_db(level_db(alias, 8000), 14)
+            linear_alias_db = format_db(level_db(linear(tone(9500, rate, 1), rate), 8000), 13)
+        else:
+            alias_db = linear_alias_db = "-"
+
+        print(f"{rate:>6} {resampler.taps:>5} {polyphase_ms:>7.2f} ms/s {linear_ms:>7.2f} ms/s "
+              f"{1000 / polyphase_ms:>8.0f}x {format_db(level_db(passband, 8000), 7)} {alias_db:>14} {linear_alias_db:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 import subprocess
 import os
 from speech import speak
+from fuzzy_index import FuzzyIndex, normalize
 
 # Dictionary of websites
 common_websites = {
@@ -51,6 +52,21 @@ common_apps = {
     }
 }
 
+# Lookup indexes, built once from the dictionaries above
+website_names = {normalize(name): name for name in common_websites}
+website_index = FuzzyIndex(common_websites)
+app_index = FuzzyIndex(common_apps)
+
+def find_website(site_name):
+    """Return the URL for a website name, allowing spacing differences and misheard names"""
+    name = website_names.get(normalize(site_name)) or website_index.closest(site_name)
+    return common_websites[name] if name else None
+
+def find_application(app_name):
+    """Return the known application name closest to app_name, or None"""
+    app_name = app_name.lower()
+    return app_name if app_name in common_apps else app_index.closest(app_name)
+
 def open_application(app_name):
     """Open an application"""
     app_info = common_apps.get(app_name.lower())
@@ -90,19 +106,10 @@ def open_website(site_name):
     """Open a website by name"""
     import webbrowser
     
-    # Try direct match first
-    if site_name in common_websites:
-        url = common_websites[site_name]
-    else:
-        # Try normalized match (remove spaces)
-        normalized_name = site_name.replace(" ", "")
-        for k, v in common_websites.items():
-            if k.replace(" ", "") == normalized_name:
-                url = v
-                break
-        else:  # No match found
-            return False
-    
+    url = find_website(site_name)
+    if url is None:
+        return False
+
     try:
         webbrowser.open(url)
         print(f"Opening website: {url}")
@@ -118,11 +125,12 @@ def go_to_target(target):
         return True
     
     # Then check if it's an application
-    if target in common_apps:
-        if open_application(target):
+    app_name = find_application(target)
+    if app_name:
+        if open_application(app_name):
             return True
         else:
-            speak(f"Failed to launch {target}")
+            speak(f"Failed to launch {app_name}")
             return False
     
     speak(f"I don't know how to open {target}")
@@ -0,0 +1,259 @@
+"""Bounded microphone audio buffer for GAIA"""
+
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DROP_OLDEST = "drop_oldest"  # Overwrite the oldest unread audio so the backlog stays fresh
+DROP_NEWEST = "drop_newest"  # Discard incoming audio until the reader catches up
+
+class AudioRingBuffer:
+    """Fixed-capacity ring of int16 samples written by the audio callback and read in blocks"""
+
+    def __init__(self, capacity_samples, sample_rate=16000, overflow_policy=DROP_OLDEST):
+        if overflow_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.buffer = np.zeros(capacity_samples, dtype=np.int16)  # Preallocated once
+        self.capacity = capacity_samples
+        self.sample_rate = sample_rate
+        self.overflow_policy = overflow_policy
+        self.read_pos = 0  # Total samples read (positions are absolute, indices wrap)
+        self.write_pos = 0  # Total samples written
+        self.data_ready = threading.Condition()
+        self.overruns = 0  # Writes that did not fit
+        self.samples_dropped = 0
+        self.last_write_time = 0.0  # perf_counter() of the latest audio callback
+
+    def write(self, data):
+        """Copy a block of raw int16 audio into the ring without allocating"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        with self.data_ready:
+            free = self.capacity - (self.write_pos - self.read_pos)
+            if len(samples) > free:
+                self.overruns += 1
+                if self.overflow_policy == DROP_NEWEST:
+                    self.samples_dropped += len(samples) - free
+                    samples = samples[:free]
+                else:
+                    if len(samples) > self.capacity:
+                        # The start of an oversized block never makes it into the ring
+                        self.samples_dropped += len(samples) - self.capacity
+                        samples = samples[-self.capacity:]
+                    overflow = len(samples) - free
+                    self.samples_dropped += overflow
+                    self.read_pos += overflow
+
+            count = len(samples)
+            if count:
+                start = self.write_pos % self.capacity
+                first = min(count, self.capacity - start)
+                self.buffer[start:start + first] = samples[:first]
+                self.buffer[:count - first] = samples[first:]
+                self.write_pos += count
+                self.last_write_time = time.perf_counter()
+                self.data_ready.notify()
+
+    def read(self, num_samples, timeout=None):
+        """Wait for a block of samples and return it as bytes, or None on timeout"""
+        with self.data_ready:
+            if not self.data_ready.wait_for(lambda: self.write_pos - self.read_pos >= num_samples, timeout):
+                return None
+            start = self.read_pos % self.capacity
+            first = min(num_samples, self.capacity - start)
+            if first == num_samples:
+                data = self.buffer[start:start + num_samples].tobytes()
+            else:
+                data = self.buffer[start:].tobytes() + self.buffer[:num_samples - first].tobytes()
+            self.read_pos += num_samples
+            return data
+
+    def capture_time(self):
+        """Estimate when the end of the last block read was captured"""
+        with self.data_ready:
+            return self.last_write_time - (self.write_pos - self.read_pos) / self.sample_rate
+
+    def clear(self):
+        """Discard all unread audio"""
+        with self.data_ready:
+            self.read_pos = self.write_pos
+
+    def backlog_samples(self):
+        """Number of samples waiting to be read"""
+        with self.data_ready:
+            return self.write_pos - self.read_pos
+
+    def backlog_ms(self):
+        """Unread audio in milliseconds"""
+        return self.backlog_samples() * 1000.0 / self.sample_rate
+
+    def get_stats(self):
+        """Return overrun and backlog metrics"""
+        return {
+            "overruns": self.overruns,
+            "samples_dropped": self.samples_dropped,
+            "backlog_ms": self.backlog_ms(),
+        }
+
+class AudioHistory:
+    """The last few seconds of decoded audio as an int16 ring, with utterance boundaries marked
+
+    Positions are absolute sample counts, so an utterance can be checked for having been
+    overwritten before it's copied out.
+    """
+
+    def __init__(self, capacity_samples, max_utterances=32):
+        self.buffer = np.zeros(capacity_samples, dtype=np.int16)  # Preallocated once
+        self.capacity = capacity_samples
+        self.write_pos = 0  # Total samples written
+        self.utterances = deque(maxlen=max_utterances)  # [start, end or None while open, text]
+        self.lock = threading.Lock()
+
+    def start_utterance(self):
+        """Mark the next audio written as the start of an utterance (an unfinished one is discarded)"""
+        with self.lock:
+            if self.utterances and self.utterances[-1][1] is None:
+                self.utterances.pop()
+            self.utterances.append([self.write_pos, None, None])
+
+    def end_utterance(self, text):
+        """Close the open utterance with the text it was recognized as"""
+        with self.lock:
+            if self.utterances and self.utterances[-1][1] is None:
+                self.utterances[-1][1] = self.write_pos
+                self.utterances[-1][2] = text
+
+    def write(self, data):
+        """Copy a block of raw int16 audio into the ring, overwriting the oldest"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        with self.lock:
+            self.write_pos += len(samples)
+            samples = samples[-self.capacity:]  # Only the end of an oversized block survives
+            count = len(samples)
+            start = (self.write_pos - count) % self.capacity
+            first = min(count, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.buffer[:count - first] = samples[first:]
+
+    def last_utterance(self, exclude=()):
+        """Return (audio bytes, text) of the newest finished utterance whose text isn't in exclude
+
+        None if there is none, or if its audio has already been overwritten.
+        """
+        with self.lock:
+            for start, end, text in reversed(self.utterances):
+                if end is None or text in exclude:
+                    continue
+                if start < self.write_pos - self.capacity:
+                    return None
+                first = start % self.capacity
+                count = end - start
+                if first + count <= self.capacity:
+                    data = self.buffer[first:first + count].tobytes()
+                else:
+                    data = self.buffer[first:].tobytes() + self.buffer[:first + count - self.capacity].tobytes()
+                return data, text
+        return None
+
+class SharedAudioRing:
+    """Single-producer/single-consumer int16 ring in shared memory for passing audio to another process
+
+    The writer only advances the write position and the reader only advances the read position,
+    so overflow always drops the newest audio.
+    """
+
+    HEADER_SLOTS = 5  # write_pos, read_pos, overruns, samples_dropped, last write time (ns)
+
+    def __init__(self, capacity_samples, data_ready, sample_rate=16000, name=None):
+        header_bytes = self.HEADER_SLOTS * 8
+        self.owner = name is None  # The creating process unlinks the segment
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=header_bytes + capacity_samples * 2
+        )
+        self.header = np.ndarray((self.HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        self.buffer = np.ndarray((capacity_samples,), dtype=np.int16, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+        self.name = self.shm.name
+        self.capacity = capacity_samples
+        self.sample_rate = sample_rate
+        self.data_ready = data_ready  # multiprocessing.Event set by the writer
+
+    def write(self, data):
+        """Copy a block of raw int16 audio into the ring (producer side)"""
+        if self.header is None:
+            return  # Closed while the audio stream was still running
+        samples = np.frombuffer(data, dtype=np.int16)
+        write_pos = int(self.header[0])
+        free = self.capacity - (write_pos - int(self.header[1]))
+        if len(samples) > free:
+            self.header[2] += 1
+            self.header[3] += len(samples) - free
+            samples = samples[:free]
+
+        count = len(samples)
+        if count:
+            start = write_pos % self.capacity
+            first = min(count, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.buffer[:count - first] = samples[first:]
+            # Publish the samples only after they are in place
+            self.header[4] = time.perf_counter_ns()
+            self.header[0] = write_pos + count
+            self.data_ready.set()
+
+    def read(self, num_samples, timeout=None):
+        """Wait for a block of samples and return it as bytes, or None on timeout (consumer side)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while int(self.header[0]) - int(self.header[1]) < num_samples:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if self.data_ready.wait(remaining):
+                # Re-check the positions after clearing so a write between wait and clear isn't missed
+                self.data_ready.clear()
+
+        read_pos = int(self.header[1])
+        start = read_pos % self.capacity
+        first = min(num_samples, self.capacity - start)
+        if first == num_samples:
+            data = self.buffer[start:start + num_samples].tobytes()
+        else:
+            data = self.buffer[start:].tobytes() + self.buffer[:num_samples - first].tobytes()
+        self.header[1] = read_pos + num_samples
+        return data
+
+    def capture_time(self):
+        """Estimate when the end of the last block read was captured (perf_counter is system-wide)"""
+        return int(self.header[4]) / 1e9 - self.backlog_samples() / self.sample_rate
+
+    def clear(self):
+        """Discard all unread audio (consumer side)"""
+        self.header[1] = self.header[0]
+
+    def backlog_samples(self):
+        """Number of samples waiting to be read"""
+        return int(self.header[0]) - int(self.header[1])
+
+    def backlog_ms(self):
+        """Unread audio in milliseconds"""
+        return self.backlog_samples() * 1000.0 / self.sample_rate
+
+    def get_stats(self):
+        """Return overrun and backlog metrics"""
+        return {
+            "overruns": int(self.header[2]),
+            "samples_dropped": int(self.header[3]),
+            "backlog_ms": self.backlog_ms(),
+        }
+
+    def close(self):
+        """Detach from the shared memory, removing it if this process created it"""
+        # The numpy views must go before the segment can be closed
+        self.header = None
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,157 @@
+"""Microphone capture for GAIA
+
+The input device is opened at its native sample rate and converted to 16 kHz by the polyphase
+resampler before the audio reaches the ring buffer, so the host audio stack doesn't resample.
+INPUT_DEVICE picks a device by (part of) its name. If the stream stops, or stops delivering
+audio for INPUT_STALL_SECONDS, GAIA moves to the next working input device.
+"""
+
+import threading
+import time
+
+import numpy as np
+import sounddevice as sd
+
+import config
+from speech import audio_callback, speak, URGENT
+from resampler import PolyphaseResampler
+
+SAMPLE_RATE = 16000  # Rate the recognizer expects
+MONITOR_INTERVAL = 0.5  # Seconds between stream health checks
+
+# Globals
+stream = None
+stream_device = None  # PortAudio index of the open device
+stream_lock = threading.Lock()  # Held while the stream is being replaced
+resampler = None  # None when the device already runs at 16 kHz
+capture_rate = SAMPLE_RATE
+last_callback_time = 0.0  # perf_counter() of the latest audio callback
+monitor_thread = None
+input_running = False
+input_stats = {"device": None, "sample_rate": None, "failovers": 0, "resample_seconds": 0.0, "audio_seconds": 0.0}
+
+def input_devices():
+    """Input devices in the order to try them: INPUT_DEVICE matches, then the default, then the rest"""
+    devices = [(index, info) for index, info in enumerate(sd.query_devices()) if info["max_input_channels"] > 0]
+    default = sd.default.device[0]
+    wanted = (config.INPUT_DEVICE or "").lower()
+    if wanted and not any(wanted in info["name"].lower() for _, info in devices):
+        print(f"No input device matches '{config.INPUT_DEVICE}', using the default")
+
+    def rank(device):
+        index, info = device
+        if wanted and wanted in info["name"].lower():
+            return 0
+        return 1 if index == default else 2
+    return sorted(devices, key=rank)
+
+def on_audio(indata, frames, time_info, status):
+    """Stream callback: resample to 16 kHz and pass the block on to the audio ring"""
+    global last_callback_time
+    last_callback_time = time.perf_counter()
+    if resampler is None:
+        audio_callback(indata, frames, time_info, status)
+        return
+    samples = resampler.process(np.frombuffer(indata, dtype=np.int16))
+    input_stats["resample_seconds"] += time.perf_counter() - last_callback_time
+    input_stats["audio_seconds"] += frames / capture_rate
+    audio_callback(samples, len(samples), time_info, status)
+
+def open_stream(index, info):
+    """Open and start a device at its native rate; returns False if it can't be opened"""
+    global stream, stream_device, resampler, capture_rate, last_callback_time
+    rate = int(config.INPUT_SAMPLE_RATE or info["default_samplerate"])
+    resampler = PolyphaseResampler(rate, SAMPLE_RATE) if rate != SAMPLE_RATE else None
+    capture_rate = rate
+    try:
+        new_stream = sd.RawInputStream(
+            device=index,
+            samplerate=rate,
+            blocksize=round(config.BLOCK_SIZE * rate / SAMPLE_RATE),
+            dtype='int16',
+            channels=1,
+            callback=on_audio
+        )
+        last_callback_time = time.perf_counter()
+        new_stream.start()
+    except Exception as e:
+        print(f"Could not open input device '{info['name']}' at {rate} Hz: {e}")
+        return False
+    stream, stream_device = new_stream, index
+    input_stats["device"] = info["name"]
+    input_stats["sample_rate"] = rate
+    print(f"Listening on '{info['name']}' at {rate} Hz" + (" (resampled to 16 kHz)" if resampler else ""))
+    return True
+
+def close_stream():
+    global stream
+    if stream is None:
+        return
+    try:
+        stream.close()
+    except Exception as e:
+        print(f"Error closing input stream: {e}")
+    stream = None
+
+def failover(reason):
+    """Replace a failed stream with the next working input device"""
+    global last_callback_time
+    with stream_lock:
+        print(f"Input stream {reason}, switching devices")
+        failed = stream_device
+        close_stream()
+        # Try the other devices first; the failed one may come back later
+        devices = input_devices()
+        devices.sort(key=lambda device: device[0] == failed)
+        for index, info in devices:
+            if open_stream(index, info):
+                input_stats["failovers"] += 1
+                speak(f"Microphone switched to {info['name']}", priority=URGENT, key="microphone")
+                return
+        last_callback_time = time.perf_counter()  # Wait a full stall period before trying again
+        print("No working input device, retrying")
+
+def input_monitor():
+    """Watch the stream and fail over when it stops or goes quiet"""
+    while input_running:
+        time.sleep(MONITOR_INTERVAL)
+        if not input_running:
+            break
+        stalled = time.perf_counter() - last_callback_time > config.INPUT_STALL_SECONDS
+        # With no stream open, the stall timer paces the retries
+        if not stalled and (stream is None or stream.active):
+            continue
+        try:
+            failover("stalled" if stream is not None and stream.active else "stopped")
+        except Exception as e:
+            print(f"Error in input monitor: {e}")
+
+def start_audio_input():
+    """Open the preferred input device and start watching it"""
+    global input_running, monitor_thread
+    with stream_lock:
+        if not any(open_stream(index, info) for index, info in input_devices()):
+            raise RuntimeError("No working input device")
+    if config.INPUT_FAILOVER:
+        input_running = True
+        monitor_thread = threading.Thread(target=input_monitor, daemon=True)
+        monitor_thread.start()
+
+def get_input_stats():
+    """Return the active device, its rate, failovers and the resampler's CPU cost"""
+    stats = dict(input_stats)
+    audio_seconds = stats.pop("audio_seconds")
+    resample_seconds = stats.pop("resample_seconds")
+    if audio_seconds:
+        stats["resample_ms_per_s"] = round(resample_seconds * 1000 / audio_seconds, 3)
+    return stats
+
+def stop_audio_input():
+    """Stop watching and close the input stream"""
+    global input_running
+    input_running = False
+    if monitor_thread:
+        monitor_thread.join(timeout=1.0)
+    with stream_lock:
+        close_stream()
+    print(f"Audio input: {get_input_stats()}")
@@ -0,0 +1,104 @@
+"""Persistent command executor for GAIA
+
+Commands that inject input run one at a time, in the order they were spoken, on a single
+FIFO lane. Commands that don't touch the keyboard or mouse run on a small parallel pool.
+"""
+
+import queue
+import threading
+
+import config
+
+# Globals
+input_lane = queue.Queue(maxsize=config.EXECUTOR_QUEUE_SIZE)  # Ordered, input-injecting commands
+pool_queue = queue.Queue(maxsize=config.EXECUTOR_QUEUE_SIZE)  # Commands safe to run concurrently
+executor_threads = []
+executor_running = False
+metrics_lock = threading.Lock()
+metrics = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "cancelled": 0,
+    "dropped": 0,
+    "max_input_depth": 0,
+    "max_pool_depth": 0,
+}
+
+def start_executor():
+    """Start the input lane worker and the parallel pool workers"""
+    global executor_running
+
+    executor_running = True
+    workers = [input_lane] + [pool_queue] * config.EXECUTOR_POOL_SIZE
+    for work_queue in workers:
+        thread = threading.Thread(target=executor_worker, args=(work_queue,), daemon=True)
+        thread.start()
+        executor_threads.append(thread)
+
+def executor_worker(work_queue):
+    """Run queued commands until the executor stops"""
+    while executor_running:
+        try:
+            function, args = work_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        try:
+            function(*args)
+            outcome = "completed"
+        except Exception as e:
+            print(f"Error running command: {e}")
+            outcome = "failed"
+        with metrics_lock:
+            metrics[outcome] += 1
+
+def submit(function, args=(), concurrent=False):
+    """Queue a command; returns False if its lane is full and the command was dropped"""
+    work_queue = pool_queue if concurrent else input_lane
+    try:
+        work_queue.put_nowait((function, args))
+    except queue.Full:
+        with metrics_lock:
+            metrics["dropped"] += 1
+        print(f"Command queue full, dropping command {args[0] if args else function.__name__}")
+        return False
+
+    depth_key = "max_pool_depth" if concurrent else "max_input_depth"
+    with metrics_lock:
+        metrics["submitted"] += 1
+        metrics[depth_key] = max(metrics[depth_key], work_queue.qsize())
+    return True
+
+def cancel_all():
+    """Drop every queued command that hasn't started yet; returns how many were cancelled"""
+    cancelled = 0
+    for work_queue in (input_lane, pool_queue):
+        while True:
+            try:
+                work_queue.get_nowait()
+                cancelled += 1
+            except queue.Empty:
+                break
+    if cancelled:
+        print(f"Cancelled {cancelled} queued commands")
+    with metrics_lock:
+        metrics["cancelled"] += cancelled
+    return cancelled
+
+def get_metrics():
+    """Return queue depths and command counters"""
+    with metrics_lock:
+        snapshot = dict(metrics)
+    snapshot["input_depth"] = input_lane.qsize()
+    snapshot["pool_depth"] = pool_queue.qsize()
+    return snapshot
+
+def shutdown_executor():
+    """Stop the executor threads, dropping queued commands"""
+    global executor_running
+    cancel_all()
+    executor_running = False
+    for thread in executor_threads:
+        thread.join(timeout=1.0)
+    executor_threads.clear()
@@ -1,58 +1,27 @@
 """Command handling system for GAIA"""
 
-import re
 import time
-import pyautogui
-import pyperclip
 
+import config
+import tracing
+import input_backend
+from text_injection import inject_text
+from dictation import start_transcript, finish_dictation
 from speech import speak
 from input_commands import (
     start_key_hold, stop_key_hold, adjust_key_speed
 )
 from spot_manager import (
-    add_spot, delete_spot, reset_spots, go_to_spot, list_spots, get_spots
+    add_spot, delete_spot, reset_spots, go_to_spot, list_spots, get_spots, find_spot
 )
 from app_launcher import go_to_target
 from ui_manager import visualize_spots
 from window_manager import (
     minimize_window, maximize_window, toggle_fullscreen, close_window
 )
-
-# --- Number Handling Utilities ---
-WORD_TO_NUM = {
-    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-    'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
-    'twenty one': 21, 'twenty two': 22, 'twenty three': 23, 'twenty four': 24, 'twenty five': 25, 'twenty six': 26, 'twenty seven': 27, 'twenty eight': 28, 'twenty nine': 29, 'thirty': 30,
-    'thirty one': 31, 'thirty two': 32, 'thirty three': 33, 'thirty four': 34, 'thirty five': 35, 'thirty six': 36, 'thirty seven': 37, 'thirty eight': 38, 'thirty nine': 39, 'forty': 40,
-    'forty one': 41, 'forty two': 42, 'forty three': 43, 'forty four': 44, 'forty five': 45, 'forty six': 46, 'forty seven': 47, 'forty eight': 48, 'forty nine': 49, 'fifty': 50,
-    'fifty one': 51, 'fifty two': 52, 'fifty three': 53, 'fifty four': 54, 'fifty five': 55, 'fifty six': 56, 'fifty seven': 57, 'fifty eight': 58, 'fifty nine': 59, 'sixty': 60,
-    'sixty one': 61, 'sixty two': 62, 'sixty three': 63, 'sixty four': 64, 'sixty five': 65, 'sixty six': 66, 'sixty seven': 67, 'sixty eight': 68, 'sixty nine': 69, 'seventy': 70,
-    'seventy one': 71, 'seventy two': 72, 'seventy three': 73, 'seventy four': 74, 'seventy five': 75, 'seventy six': 76, 'seventy seven': 77, 'seventy eight': 78, 'seventy nine': 79, 'eighty': 80,
-    'eighty one': 81, 'eighty two': 82, 'eighty three': 83, 'eighty four': 84, 'eighty five': 85, 'eighty six': 86, 'eighty seven': 87, 'eighty eight': 88, 'eighty nine': 89, 'ninety': 90,
-    'ninety one': 91, 'ninety two': 92, 'ninety three': 93, 'ninety four': 94, 'ninety five': 95, 'ninety six': 96, 'ninety seven': 97, 'ninety eight': 98, 'ninety nine': 99, 'hundred': 100
-}
-
-def parse_number(text):
-    """Converts digit string or number word (up to 100) to integer."""
-    text = text.lower().strip()
-    try:
-        num = int(text)
-        if 1 <= num <= 100:
-            return num
-        else:
-            return None
-    except ValueError:
-        return WORD_TO_NUM.get(text)
-
-# --- Regex Patterns ---
-number_words_pattern_100 = '|'.join(WORD_TO_NUM.keys())
-number_pattern_100 = rf'([1-9]|[1-9]\d|100|{number_words_pattern_100})'
-up_down_regex = re.compile(rf'^{number_pattern_100}\s+(up|down)(\s+enter)?$', re.IGNORECASE)
-
-tab_number_words = {k: v for k, v in WORD_TO_NUM.items() if v <= 10}
-tab_number_words_pattern = '|'.join(tab_number_words.keys())
-tab_number_pattern = rf'([1-9]|10|{tab_number_words_pattern})'
-tab_regex = re.compile(rf'^(next|previous)\s+{tab_number_pattern}\s+tabs?(\s+enter)?$', re.IGNORECASE)
+from command_registry import CommandRegistry
+from fuzzy_index import FuzzyIndex
+from number_parser import NUMBER_PATTERN, parse_number
 
 # --- State Variables ---
 # Confirmation state
@@ -63,12 +32,13 @@ last_held_key = None
 # Dictation state
 is_dictating = False
 dictation_buffer = "" # Still useful for potential full transcript logging if needed later
-dictation_word_chunk = [] # Holds words for incremental pasting
 dictation_start_time = 0
 last_speech_time = 0
-last_paste_time = 0 # Time the last chunk was pasted
 DICTATION_MAX_DURATION = 600 # 10 minutes
 DICTATION_INACTIVITY_TIMEOUT = 30 # 30 seconds
+# Sleep state
+is_sleeping = False
+last_command_time = time.time()  # When the last command ran; drives auto-sleep
 
 # --- Helper Functions ---
 
@@ -98,446 +68,429 @@ def register_confirmation(callback):
 
 def start_dictation_mode():
     """Activates dictation mode."""
-    global is_dictating, dictation_buffer, dictation_word_chunk, dictation_start_time, last_speech_time, last_paste_time
+    global is_dictating, dictation_buffer, dictation_start_time, last_speech_time
     if is_dictating:
         speak("Already in dictation mode.")
         return
+    start_transcript() # Ready before the first partial result arrives
     is_dictating = True
     dictation_buffer = "" # Reset buffer
-    dictation_word_chunk = [] # Reset word chunk list
     now = time.time()
     dictation_start_time = now
     last_speech_time = now # Initialize last speech time
-    last_paste_time = now # Initialize last paste time
     speak("Starting dictation.")
     print("--- Dictation Started ---")
 
 def stop_dictation_mode(reason="command"):
-    """Deactivates dictation mode and pastes any remaining words."""
-    global is_dictating, dictation_buffer, dictation_word_chunk
+    """Deactivates dictation mode and types the rest of the utterance in progress."""
+    global is_dictating, dictation_buffer
     if not is_dictating:
         return # Not dictating, nothing to stop
 
     is_dictating = False
 
-    # Paste any remaining words before clearing
-    if dictation_word_chunk:
-        try:
-            remaining_text = " ".join(dictation_word_chunk)
-            pyperclip.copy(remaining_text)
-            pyautogui.hotkey('ctrl', 'v')
-            # Optionally add a space if needed, but often not desired at the very end
-            # pyautogui.press('space')
-            print(f"Pasted final remaining chunk: '{remaining_text}'")
-            time.sleep(0.05) # Brief pause after final paste
-        except Exception as paste_err:
-            print(f"Error pasting final dictation chunk: {paste_err}")
-
-    dictation_word_chunk = [] # Clear the chunk
+    try:
+        finish_dictation()
+    except Exception as type_err:
+        print(f"Error typing final dictation words: {type_err}")
+
     dictation_buffer = "" # Clear the buffer
 
     feedback = f"Dictation stopped due to {reason}."
     print(f"--- Dictation Stopped ({reason}) ---")
     speak(feedback)
 
-# --- Main Command Handler ---
+def go_to_sleep(reason="command"):
+    """Stop full decoding; only the wake phrase is listened for until wake_up()"""
+    global is_sleeping
+    if is_sleeping:
+        return
+    if is_dictating:
+        stop_dictation_mode(reason="sleep")
+    is_sleeping = True
+    print(f"--- Sleeping ({reason}) ---")
+    speak(f"Going to sleep. Say {config.WAKE_PHRASE} to resume.")
+
+def wake_up():
+    """Resume full command recognition"""
+    global is_sleeping, last_command_time
+    if not is_sleeping:
+        speak("Already awake.")
+        return
+    is_sleeping = False
+    last_command_time = time.time()
+    print("--- Awake ---")
+    speak("Awake.")
+
+def retry_command(announce=False):
+    """Re-decode the last utterance with the re-decode model and run the command it turns out to be
+
+    The re-decode runs where the audio history and models live: here, or in the decoder process,
+    which reports back through report_retry().
+    """
+    if config.DECODER_PROCESS:
+        from decoder_process import request_redecode  # decoder_process imports this module
+        request_redecode(announce)
+        return
+    from recognition import redecode_last_utterance  # recognition imports this module
+    report_retry(redecode_last_utterance(), announce)
+
+def report_retry(result, announce=False):
+    """Announce a re-decoded utterance and queue the command it turned out to be"""
+    from recognition import get_result_queue
+    if result is None:
+        speak("Nothing to try again.")
+        return
+    heard, command = result
+    print(f"Re-decoded '{heard}' as '{command}'")
+    if announce:
+        speak(f"I heard {command}." if command else "I still couldn't make that out.")
+    known = command in CONFIRMATION_WORDS or registry.resolve(command) or resolve_misheard(command)
+    if command and command not in RETRY_PHRASES and known:
+        # Dispatched like a spoken command, so input still runs in order on the input lane
+        get_result_queue().put((command, None))
+    elif not announce:
+        speak("Still didn't catch that.")
+
+# --- Command Actions ---
+
+def press_key(key):
+    """Press a single key"""
+    input_backend.press(key)
+
+def press_hotkey(*keys):
+    """Press a key combination"""
+    input_backend.hotkey(*keys)
+
+def click_mouse(clicks=1):
+    """Left click at the current cursor position"""
+    input_backend.click(clicks=clicks)
+
+def right_click():
+    input_backend.click(button='right')
+
+def double_click():
+    input_backend.click(clicks=2)
+
+def faster_command():
+    # One message per change, so a newer value replaces the one still waiting to be spoken
+    speak(f"Speed {adjust_key_speed(faster=True):.1f}", key="speed")
+
+def slower_command():
+    speak(f"Speed {adjust_key_speed(faster=False):.1f}", key="speed")
+
+def stop_command():
+    """Release any held key and undo the overshoot of the last repeat"""
+    global last_held_key
+    if stop_key_hold():
+        print("Stopped ongoing action")
+        if last_held_key == 'down':
+            input_backend.press('up')
+        elif last_held_key == 'up':
+            input_backend.press('down')
+        elif last_held_key == 'left':
+            input_backend.press('right')
+        elif last_held_key == 'right':
+            input_backend.press('left')
+        last_held_key = None
+
+def click_spot(name):
+    x, y = get_spots()[name]
+    input_backend.send([("move", x, y), ("click", "left", 1)])
+
+def double_click_spot(name):
+    x, y = get_spots()[name]
+    input_backend.send([("move", x, y), ("click", "left", 2)])
+
+def parse_spot_name(text):
+    """Accept the text only if it names (or sounds like) a saved spot"""
+    name = find_spot(text.strip()) if text.strip() else None
+    return (name,) if name else None
+
+def parse_text(text):
+    return (text.strip(),)
+
+def up_down_command(number_str, direction, enter):
+    count = parse_number(number_str)
+
+    if count and 1 <= count <= config.MAX_REPEAT_COUNT:
+        events = [("press", direction)] * count
+        if enter:
+            events.append(("press", 'enter'))
+        input_backend.send(events)
+
+        print(f"Pressed {direction} {count} times{' plus Enter' if enter else ''}")
+    else:
+        print(f"Invalid number or range for up/down: {number_str}")
 
-def handle_command(command):
-    """Process a voice command"""
-    global last_held_key, is_dictating
+def parse_up_down(match):
+    # The pattern accepts any run of number words; only real numbers match
+    if parse_number(match.group('ud_count')) is None:
+        return None
+    return (match.group('ud_count'), match.group('ud_direction').lower(), match.group('ud_enter') is not None)
 
-    command = command.lower().strip()
-    print(f"Heard: {command}")
-    
-    # --- Regular Command Handling (if not dictating) ---
-    if waiting_for_confirmation:
-        if handle_confirmation(command):
-            return
-    
-    # Check for "start dictation" command
-    if command == "start dictation":
-        start_dictation_mode()
-        return True # Command handled
-
-    if command == "faster":
-        adjust_key_speed(faster=True, factor=2.0)
-        speak("Increasing speed")
-        return True
-        
-    if command == "slower":
-        adjust_key_speed(faster=False, factor=2.0)
-        speak("Decreasing speed")
-        return True
-    
-    if command == "stop":
-        if stop_key_hold():
-            print("Stopped ongoing action")
-            if last_held_key == 'down':
-                pyautogui.press('up')
-            elif last_held_key == 'up':
-                pyautogui.press('down')
-            elif last_held_key == 'left':
-                pyautogui.press('right')
-            elif last_held_key == 'right':
-                pyautogui.press('left')
-            last_held_key = None
-        return True
-    
-    if command == "mode":
-        pyautogui.hotkey('ctrl', '.')
-        return True
-        
-    if command == "microphone":
-        pyautogui.hotkey('alt', 'n')
-        return True
-        
-    if command == "context":
-        pyautogui.hotkey('ctrl', '/')
-        return True
-        
-    if command == "screenshot":
-        pyautogui.hotkey('win', 'shift', 's')
-        return True
-    
-    if command == "minimize window":
-        minimize_window()
-        return True
-        
-    if command == "maximize window":
-        maximize_window()
-        return True
-        
-    if command == "fullscreen":
-        toggle_fullscreen()
-        return True
-        
-    if command == "close window":
-        close_window()
-        return True
-    
-    if command == "new tab":
-        pyautogui.hotkey('ctrl', 't')
-        return True
-        
-    if command == "close tab":
-        pyautogui.hotkey('ctrl', 'w')
-        return True
-        
-    if command == "reopen tab":
-        pyautogui.hotkey('ctrl', 'shift', 't')
-        return True
-    
-    if command == "save":
-        pyautogui.hotkey('ctrl', 's')
-        return True
-        
-    if command == "copy":
-        pyautogui.hotkey('ctrl', 'c')
-        return True
-        
-    if command == "paste":
-        pyautogui.hotkey('ctrl', 'v')
-        return True
-        
-    if command == "select all":
-        pyautogui.hotkey('ctrl', 'a')
-        return True
-    
-    if command == "undo":
-        pyautogui.hotkey('ctrl', 'z')
-        return True
-    
-    if command == "redo":
-        pyautogui.hotkey('ctrl', 'shift', 'z')
-        return True
-    
-    if command == "zoom":
-        pyautogui.hotkey('ctrl', '+')
-        return True
-    
-    if command == "zoom out":
-        pyautogui.hotkey('ctrl', '-')
-        return True
-    
-    if command == "previous":
-        pyautogui.hotkey('alt', 'left')
-        return True
-    
-    if command == "next":
-        pyautogui.hotkey('alt', 'right')
-        return True
-    
-    if command in get_spots():
-        x, y = get_spots()[command]
-        pyautogui.moveTo(x, y)
-        pyautogui.click()
-        return True
-            
-    if command.startswith("double click ") and len(command) > 12:
-        name = command[12:].strip()
-        if name in get_spots():
-            x, y = get_spots()[name]
-            pyautogui.moveTo(x, y)
-            pyautogui.doubleClick()
-            return True
-    
-    if command == "click" or command == "left click":
-        pyautogui.click()
-        return True
-    
-    if command == "right click":
-        pyautogui.rightClick()
-        return True
-        
-    if command == "double click":
-        pyautogui.doubleClick()
-        return True
-    
-    if command == "triple click":
-        pyautogui.click(clicks=3)
-        return True
-    
-    up_down_match = up_down_regex.match(command)
-    if up_down_match:
-        number_str = up_down_match.group(1)
-        direction = up_down_match.group(2).lower()
-        has_enter = up_down_match.group(3) is not None
+def hold_arrow_command(key):
+    global last_held_key
+    last_held_key = key
+    start_key_hold(key)
 
-        count = parse_number(number_str)
+def hold_page_command(key, feedback):
+    start_key_hold(key, use_page_timing=True)
+    speak(feedback)
 
-        if count and 1 <= count <= 100:
-            for _ in range(count):
-                pyautogui.press(direction)
-                time.sleep(0.01)
+def select_command(key, feedback):
+    start_key_hold(key, with_shift=True)
+    speak(feedback)
 
-            if has_enter:
-                pyautogui.press('enter')
+def tab_switch_command(direction, number_str, enter):
+    count = parse_number(number_str)
 
-            print(f"Pressed {direction} {count} times{' plus Enter' if has_enter else ''}")
-            return True
+    if count and 1 <= count <= config.MAX_TAB_COUNT:
+        hotkey = ('ctrl', 'tab') if direction == 'next' else ('ctrl', 'shift', 'tab')
+        events = [("hotkey", hotkey)] * count
+        if enter:
+            events.append(("press", 'enter'))
+        input_backend.send(events)
+
+        print(f"Switched {direction} {count} tabs{' plus Enter' if enter else ''}")
+    else:
+        print(f"Invalid number or range for tab navigation: {number_str}")
+
+def parse_tab_switch(match):
+    if parse_number(match.group('tab_count')) is None:
+        return None
+    return (match.group('tab_direction').lower(), match.group('tab_count'), match.group('tab_enter') is not None)
+
+def look_for_command(search_term):
+    if search_term:
+        input_backend.hotkey('ctrl', 'f') # Press Ctrl+F to open find
+        time.sleep(0.2) # Wait a moment for the find bar/dialog to appear
+        inject_text(search_term)
+        print(f"Looking for: '{search_term}'")
+    else:
+        speak("Please specify what you want to look for.")
+
+def type_command(text_to_type):
+    if text_to_type:
+        inject_text(text_to_type)
+        print(f"Typing: {text_to_type}")
+
+def search_bar_command():
+    input_backend.hotkey('ctrl', 'l')
+    time.sleep(0.1)
+    input_backend.press('f6')
+    time.sleep(0.1)
+    input_backend.hotkey('ctrl', 'f')
+    speak("Activated search bar")
+    print("Activated search bar")
+
+def save_all_code_command():
+    input_backend.hotkey('ctrl', 'k')
+    time.sleep(0.1)
+    input_backend.press('s')
+    print("Saving all files in VS Code")
+
+def goto_line_command(line_text):
+    try:
+        line_number = parse_number(line_text)
+        if line_number:
+            input_backend.hotkey('ctrl', 'g')
+            time.sleep(0.2)
+            input_backend.write(str(line_number))
+            input_backend.press('enter')
+            print(f"Going to line {line_number}")
         else:
-            print(f"Invalid number or range for up/down: {number_str}")
-            return True
+            speak("Invalid line number")
+    except Exception as e:
+        print(f"Error going to line: {e}")
 
-    if command == "left":
-        pyautogui.press('left')
-        return True
-        
-    if command == "right":
-        pyautogui.press('right')
-        return True
-    
-    if command == "p up":
-        pyautogui.press('pageup')
-        return True
-        
-    if command == "p down":
-        pyautogui.press('pagedown')
-        return True
-    
-    if command == "enter":
-        pyautogui.press('enter')
-        return True
-        
-    if command == "delete":
-        pyautogui.press('delete')
-        return True
-        
-    if command == "escape":
-        pyautogui.press('escape')
-        return True
-        
-    if command == "tab":
-        pyautogui.press('tab')
-        return True
-        
-    if command == "space":
-        pyautogui.press('space')
-        return True
+def reset_spots_command():
+    reset_spots()
+    speak("All spots have been deleted.")
 
-    if command == "next edit":
-        pyautogui.hotkey('alt', 'f5')
-        return True
-        
-    if command == "previous edit":
-        pyautogui.hotkey('shift', 'alt', 'f5')
-        return True
-    
-    if command == "press down":
-        last_held_key = 'down'
-        start_key_hold('down')
-        return True
-        
-    if command == "press up":
-        last_held_key = 'up'
-        start_key_hold('up')
-        return True
-    
-    if command == "press left":
-        last_held_key = 'left'
-        start_key_hold('left')
-        return True
-    
-    if command == "press right":
-        last_held_key = 'right'
-        start_key_hold('right')
-        return True
-
-    if command == "press page down":
-        start_key_hold('pagedown', use_page_timing=True, page_interval=10.0)
-        speak("Scrolling down slowly")
-        return True
-        
-    if command == "press page up":
-        start_key_hold('pageup', use_page_timing=True, page_interval=10.0)
-        speak("Scrolling up slowly")
-        return True
-    
-    if command == "select from":
-        start_key_hold('down', with_shift=True)
-        speak("Selecting downward")
-        return True
-        
-    if command == "select until":
-        start_key_hold('up', with_shift=True)
-        speak("Selecting upward")
-        return True
-    
-    if command == "next tab":
-        pyautogui.hotkey('ctrl', 'tab')
-        return True
-        
-    if command == "previous tab":
-        pyautogui.hotkey('ctrl', 'shift', 'tab')
-        return True
+def visualize_marks_command():
+    visualize_spots(get_spots(), adjust_for_titlebar=True)
+    speak("Showing marks")
 
-    tab_match = tab_regex.match(command)
-    if tab_match:
-        direction = tab_match.group(1).lower()
-        number_str = tab_match.group(2)
-        has_enter = tab_match.group(3) is not None
+def mark_command(name):
+    if not name:
+        speak("Please specify a name for the mark")
+        return
 
-        count = parse_number(number_str)
+    if name in config.protected_names:
+        speak(f"'{name}' is a protected name.")
+    else:
+        add_spot(name)
 
-        if count and 1 <= count <= 10:
-            hotkey = ('ctrl', 'tab') if direction == 'next' else ('ctrl', 'shift', 'tab')
-            for _ in range(count):
-                pyautogui.hotkey(*hotkey)
-                time.sleep(0.05)
+def latency_report_command():
+    if tracing.dump_report(config.LATENCY_REPORT_FILE):
+        speak("Latency report saved")
+    else:
+        speak("Could not save latency report")
+
+def exit_command():
+    if tracing.exit_report_path:
+        tracing.dump_report(tracing.exit_report_path)
+    speak("Goodbye.")
+    import os
+    os._exit(0)
+
+# --- Command Registry ---
+
+def build_registry():
+    """Register every command in the order handle_command checks them"""
+    registry = CommandRegistry()
+    exact = registry.register_exact
+
+    exact("start dictation", start_dictation_mode, concurrent=True)
+    exact("go to sleep", go_to_sleep, concurrent=True)
+    exact(config.WAKE_PHRASE, wake_up, concurrent=True)
+    # The re-decode can take a while, so it doesn't hold up the input lane
+    exact("try again", retry_command, concurrent=True)
+    exact("what did you hear", retry_command, args=(True,), concurrent=True)
+    exact("faster", faster_command, concurrent=True)
+    exact("slower", slower_command, concurrent=True)
+    exact("stop", stop_command)
+    exact("mode", press_hotkey, args=('ctrl', '.'))
+    exact("microphone", press_hotkey, args=('alt', 'n'))
+    exact("context", press_hotkey, args=('ctrl', '/'))
+    exact("screenshot", press_hotkey, args=('win', 'shift', 's'))
+    exact("minimize window", minimize_window)
+    exact("maximize window", maximize_window)
+    exact("fullscreen", toggle_fullscreen)
+    exact("close window", close_window)
+    exact("new tab", press_hotkey, args=('ctrl', 't'))
+    exact("close tab", press_hotkey, args=('ctrl', 'w'))
+    exact("reopen tab", press_hotkey, args=('ctrl', 'shift', 't'))
+    exact("save", press_hotkey, args=('ctrl', 's'))
+    exact("copy", press_hotkey, args=('ctrl', 'c'))
+    exact("paste", press_hotkey, args=('ctrl', 'v'))
+    exact("select all", press_hotkey, args=('ctrl', 'a'))
+    exact("undo", press_hotkey, args=('ctrl', 'z'))
+    exact("redo", press_hotkey, args=('ctrl', 'shift', 'z'))
+    exact("zoom", press_hotkey, args=('ctrl', '+'))
+    exact("zoom out", press_hotkey, args=('ctrl', '-'))
+    exact("previous", press_hotkey, args=('alt', 'left'))
+    exact("next", press_hotkey, args=('alt', 'right'))
+
+    registry.register_lookup("<spot>", lambda command: command in get_spots(), click_spot)
+    registry.register_prefix("double click ", double_click_spot, parse_spot_name, name="double click <spot>")
+
+    exact(["click", "left click"], click_mouse)
+    exact("right click", right_click)
+    exact("double click", double_click)
+    exact("triple click", click_mouse, args=(3,))
+
+    registry.register_pattern(
+        "<number> up/down",
+        rf'(?P<ud_count>{NUMBER_PATTERN})\s+(?P<ud_direction>up|down)(?P<ud_enter>\s+enter)?',
+        up_down_command, parse_up_down
+    )
+
+    exact("left", press_key, args=('left',))
+    exact("right", press_key, args=('right',))
+    exact("p up", press_key, args=('pageup',))
+    exact("p down", press_key, args=('pagedown',))
+    exact("enter", press_key, args=('enter',))
+    exact("delete", press_key, args=('delete',))
+    exact("escape", press_key, args=('escape',))
+    exact("tab", press_key, args=('tab',))
+    exact("space", press_key, args=('space',))
+    exact("next edit", press_hotkey, args=('alt', 'f5'))
+    exact("previous edit", press_hotkey, args=('shift', 'alt', 'f5'))
+    exact("press down", hold_arrow_command, args=('down',))
+    exact("press up", hold_arrow_command, args=('up',))
+    exact("press left", hold_arrow_command, args=('left',))
+    exact("press right", hold_arrow_command, args=('right',))
+    exact("press page down", hold_page_command, args=('pagedown', "Scrolling down slowly"))
+    exact("press page up", hold_page_command, args=('pageup', "Scrolling up slowly"))
+    exact("select from", select_command, args=('down', "Selecting downward"))
+    exact("select until", select_command, args=('up', "Selecting upward"))
+    exact("next tab", press_hotkey, args=('ctrl', 'tab'))
+    exact("previous tab", press_hotkey, args=('ctrl', 'shift', 'tab'))
+
+    registry.register_pattern(
+        "next/previous <number> tabs",
+        rf'(?P<tab_direction>next|previous)\s+(?P<tab_count>{NUMBER_PATTERN})\s+tabs?(?P<tab_enter>\s+enter)?',
+        tab_switch_command, parse_tab_switch
+    )
+
+    registry.register_prefix("look for ", look_for_command, parse_text)
+    registry.register_prefix("type ", type_command, parse_text)
+    exact("search bar", search_bar_command)
+    exact("save all code", save_all_code_command)
+    registry.register_prefix("goto line ", goto_line_command, parse_text, name="goto line <number>")
+    exact("file down", press_hotkey, args=('alt', 'down'))
+    exact("file up", press_hotkey, args=('alt', 'up'))
+    exact("list spots", list_spots, concurrent=True)
+    exact("reset spots", reset_spots_command, concurrent=True)
+    exact("visualize marks", visualize_marks_command, concurrent=True)
+    registry.register_prefix("mark delete ", delete_spot, parse_text, name="mark delete <spot>", concurrent=True)
+    registry.register_prefix("unmark ", delete_spot, parse_text, name="unmark <spot>", concurrent=True)
+    registry.register_prefix("mark ", mark_command, parse_text, name="mark <name>")
+    exact("latency report", latency_report_command, concurrent=True)
+    exact(["exit", "quit"], exit_command)
+    return registry
+
+registry = build_registry()
+
+# --- Command Vocabulary ---
+CONFIRMATION_WORDS = ["yes", "no"]
+# Fixed phrases matched exactly by handle_command (used to build the command grammar)
+FIXED_COMMANDS = CONFIRMATION_WORDS + registry.exact_phrases()
+# Prefixes of commands that take a spot name or free text after them
+FREE_TEXT_PREFIXES = registry.prefix_phrases()
+# Prefixes whose argument must be an existing spot name
+SPOT_COMMAND_PREFIXES = ["double click", "unmark", "mark delete"]
+# Commands that re-decode the previous utterance (and are skipped when looking for it)
+RETRY_PHRASES = ["try again", "what did you hear"]
+# Commands that only run when heard exactly, never as the correction of a misheard phrase
+DESTRUCTIVE_COMMANDS = ["exit", "quit", "reset spots", "close window", "close tab"]
+# Fixed phrases for misheard-command lookups
+command_index = FuzzyIndex(phrase for phrase in registry.exact_phrases() if phrase not in DESTRUCTIVE_COMMANDS)
+
+def command_label(command):
+    """Return the name a command's latency is recorded under (parameters collapsed)"""
+    command = command.lower().strip()
+    if command in CONFIRMATION_WORDS:
+        return command
+    resolved = registry.resolve(command)
+    return resolved[0].name if resolved else "<unrecognized>"
 
-            if has_enter:
-                pyautogui.press('enter')
+def is_concurrent_command(command):
+    """Check if a command can run alongside others because it injects no input"""
+    if waiting_for_confirmation:
+        return False
+    resolved = registry.resolve(command.lower().strip())
+    return resolved is not None and resolved[0].concurrent
 
-            print(f"Switched {direction} {count} tabs{' plus Enter' if has_enter else ''}")
-            return True
-        else:
-            print(f"Invalid number or range for tab navigation: {number_str}")
-            return True
-
-    if command.startswith("look for "):
-        search_term = command[9:].strip() # Get text after "look for "
-        if search_term:
-            pyperclip.copy(search_term)
-            pyautogui.hotkey('ctrl', 'f') # Press Ctrl+F to open find
-            time.sleep(0.2) # Wait a moment for the find bar/dialog to appear
-            pyautogui.hotkey('ctrl', 'v') # Paste the search term
-            print(f"Looking for: '{search_term}'")
-        else:
-            speak("Please specify what you want to look for.")
-        return True
-
-    if command.startswith("type "):
-        text_to_type = command[5:].strip()
-        if text_to_type:
-            pyperclip.copy(text_to_type)
-            pyautogui.hotkey('ctrl', 'v')
-            print(f"Typing: {text_to_type}")
-        return True
-    
-    if command == "search bar":
-        pyautogui.hotkey('ctrl', 'l')
-        time.sleep(0.1)
-        pyautogui.press('f6')
-        time.sleep(0.1)
-        pyautogui.hotkey('ctrl', 'f')
-        speak("Activated search bar")
-        print("Activated search bar")
-        return True
-    
-    if command == "save all code":
-        pyautogui.hotkey('ctrl', 'k')
-        time.sleep(0.1)
-        pyautogui.press('s')
-        print("Saving all files in VS Code")
-        return True
-    
-    if command.startswith("goto line "):
-        try:
-            line_number = command[10:].strip()
-            if line_number.isdigit():
-                pyautogui.hotkey('ctrl', 'g')
-                time.sleep(0.2)
-                pyautogui.write(line_number)
-                pyautogui.press('enter')
-                print(f"Going to line {line_number}")
-            else:
-                speak("Invalid line number")
-        except Exception as e:
-            print(f"Error going to line: {e}")
-        return True
-    
-    if command == "file down":
-        pyautogui.hotkey('alt', 'down')
-        return True
-        
-    if command == "file up":
-        pyautogui.hotkey('alt', 'up')
-        return True
-    
-    if command == "list spots":
-        list_spots()
-        return True
-    
-    if command == "reset spots":
-        reset_spots()
-        speak("All spots have been deleted.")
-        return True
-    
-    if command == "visualize marks":
-        visualize_spots(get_spots(), adjust_for_titlebar=True)
-        speak("Showing marks")
-        return True
-        
-    if command.startswith("mark delete "):
-        name = command[12:].strip()
-        delete_spot(name)
-        return True
-    
-    if command.startswith("unmark "):
-        name = command[7:].strip()
-        delete_spot(name)
-        return True
-        
-    if command.startswith("mark "):
-        name = command[5:].strip()
-        if not name:
-            speak("Please specify a name for the mark")
-            return True
-        
-        try:
-            from config import protected_names
-        except ImportError:
-            print("Warning: protected_names not found in config, using defaults")
-        
-        if name in protected_names:
-            speak(f"'{name}' is a protected name.")
-        else:
-            add_spot(name)
-        return True
-    
-    if command in {"exit", "quit"}:
-        speak("Goodbye.")
-        import os
-        os._exit(0)
+def resolve_misheard(command):
+    """Resolve an unrecognized command as the spot or fixed command it most likely was"""
+    name = find_spot(command) or command_index.closest(command)
+    if name is None:
+        return None
+    print(f"Heard '{command}' as '{name}'")
+    return registry.resolve(name)
+
+# --- Main Command Handler ---
+
+def handle_command(command):
+    """Process a voice command"""
+    global last_command_time
+    command = command.lower().strip()
+    print(f"Heard: {command}")
     
-    return False
+    # --- Regular Command Handling (if not dictating) ---
+    if waiting_for_confirmation:
+        if handle_confirmation(command):
+            return
+
+    resolved = registry.resolve(command) or resolve_misheard(command)
+    if resolved is None:
+        return False
+
+    entry, args = resolved
+    last_command_time = time.time()
+    tracing.mark("match")
+    entry.action(*args)
+    return True
@@ -0,0 +1,154 @@
+"""Table-driven command registry for GAIA
+
+Commands are resolved through a dict for exact phrases, a character trie for prefix
+commands ("type ", "mark ", ...), dynamic lookups (spot names) and one combined regex
+for parameterized patterns. Every entry keeps the precedence it was registered with,
+so the result is the same as checking the commands one by one in registration order.
+"""
+
+import re
+
+EXACT = "exact"
+PREFIX = "prefix"
+PATTERN = "pattern"
+LOOKUP = "lookup"
+
+class CommandEntry:
+    """A registered command: how it is matched, what it runs and with which arguments"""
+
+    def __init__(self, name, kind, action, rank, args=(), parse=None, key=None, concurrent=False):
+        self.name = name  # Label used in logs and latency reports
+        self.kind = kind
+        self.action = action
+        self.rank = rank  # Registration order; lower wins
+        self.args = args  # Fixed arguments passed to the action
+        self.parse = parse  # Turns the matched text into extra arguments, or None to fall through
+        self.key = key  # Phrase, prefix, pattern or lookup function
+        self.concurrent = concurrent  # Safe to run alongside other commands (no input injection)
+
+    def bind(self, value):
+        """Return the full argument tuple for a match, or None if the entry rejects it"""
+        if self.parse is None:
+            return self.args
+        extra = self.parse(value)
+        if extra is None:
+            return None
+        return self.args + tuple(extra)
+
+class PrefixTrie:
+    """Character trie mapping command prefixes to entries"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix, entry):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(entry)
+
+    def matches(self, text):
+        """Yield (entry, remainder) for every registered prefix of text"""
+        node = self.root
+        for index, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                return
+            for entry in node.get(None, ()):
+                yield entry, text[index + 1:]
+
+class CommandRegistry:
+    """Resolves a spoken command to its entry and arguments"""
+
+    def __init__(self):
+        self.entries = []
+        self.exact = {}
+        self.prefixes = PrefixTrie()
+        self.lookups = []
+        self.patterns = []
+        self.pattern_regex = None  # All patterns compiled into one alternation, in precedence order
+
+    def add(self, entry):
+        self.entries.append(entry)
+        return entry
+
+    def register_exact(self, phrases, action, args=(), name=None, concurrent=False):
+        """Register one or more fixed phrases that run action(*args)"""
+        if isinstance(phrases, str):
+            phrases = [phrases]
+        entry = self.add(CommandEntry(
+            name or phrases[0], EXACT, action, len(self.entries), args=args, key=tuple(phrases), concurrent=concurrent
+        ))
+        for phrase in phrases:
+            self.exact.setdefault(phrase, entry)
+        return entry
+
+    def register_prefix(self, prefix, action, parse, args=(), name=None, concurrent=False):
+        """Register a command made of a prefix and the text after it"""
+        entry = self.add(CommandEntry(
+            name or f"{prefix.strip()} <text>", PREFIX, action, len(self.entries),
+            args=args, parse=parse, key=prefix, concurrent=concurrent
+        ))
+        self.prefixes.insert(prefix, entry)
+        return entry
+
+    def register_lookup(self, name, contains, action, concurrent=False):
+        """Register a dynamic set of phrases (e.g. spot names) checked with contains(command)"""
+        entry = self.add(CommandEntry(
+            name, LOOKUP, action, len(self.entries), parse=lambda command: (command,),
+            key=contains, concurrent=concurrent
+        ))
+        self.lookups.append(entry)
+        return entry
+
+    def register_pattern(self, name, pattern, action, parse, args=(), concurrent=False):
+        """Register a parameterized command; the pattern must use uniquely named groups"""
+        entry = self.add(CommandEntry(
+            name, PATTERN, action, len(self.entries), args=args, parse=parse, key=pattern, concurrent=concurrent
+        ))
+        self.patterns.append(entry)
+        self.pattern_regex = None
+        return entry
+
+    def compile_patterns(self):
+        """Combine every pattern into a single regex with one named group per entry"""
+        alternatives = [f"(?P<_p{index}>{entry.key})" for index, entry in enumerate(self.patterns)]
+        self.pattern_regex = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def candidates(self, command):
+        """Return every (entry, value) that could match, unsorted"""
+        found = []
+        entry = self.exact.get(command)
+        if entry is not None:
+            found.append((entry, command))
+        for entry, remainder in self.prefixes.matches(command):
+            found.append((entry, remainder))
+        for entry in self.lookups:
+            if entry.key(command):
+                found.append((entry, command))
+
+        if self.pattern_regex is None and self.patterns:
+            self.compile_patterns()
+        if self.pattern_regex is not None:
+            match = self.pattern_regex.fullmatch(command)
+            if match:
+                found.append((self.patterns[int(match.lastgroup[2:])], match))
+        return found
+
+    def resolve(self, command):
+        """Return (entry, args) for the highest-precedence entry that accepts the command, or None"""
+        found = self.candidates(command)
+        found.sort(key=lambda candidate: candidate[0].rank)
+        for entry, value in found:
+            args = entry.bind(value)
+            if args is not None:
+                return entry, args
+        return None
+
+    def exact_phrases(self):
+        """All fixed phrases, in precedence order"""
+        return [phrase for entry in self.entries if entry.kind == EXACT for phrase in entry.key]
+
+    def prefix_phrases(self):
+        """All prefixes of free-text commands, without the trailing space"""
+        return [entry.key.strip() for entry in self.entries if entry.kind == PREFIX]
@@ -25,7 +25,55 @@ BASE_PATH = get_base_path()
 # Expect the model dir to be bundled at the root, or exist alongside src/
 MODEL_DIR_NAME = "vosk-model-small-en-us-0.15"
 MODEL_PATH = os.path.join(BASE_PATH, MODEL_DIR_NAME)
+# Models by name; names without an entry use the command model. Add e.g.
+# "dictation": os.path.join(BASE_PATH, "vosk-model-en-us-0.22") for a larger dictation model
+MODEL_PATHS = {"command": MODEL_PATH}
+DICTATION_MODEL = "dictation"  # Model used for dictation and free-form re-decoding
+PRELOAD_MODELS = ["dictation"]  # Loaded in the background once the command model is ready
+MODEL_MEMORY_BUDGET_MB = 4096  # Least recently used models are evicted once loaded models exceed this
+REDECODE_MODEL = "dictation"  # Model "try again" re-decodes the last utterance with (open vocabulary, preloaded)
+AUDIO_HISTORY_SECONDS = 30.0  # Decoded audio kept so the last utterance can be re-decoded
 BLOCK_SIZE = 4000  # Reduced for better responsiveness
+AUDIO_BUFFER_SECONDS = 3.0  # Unread microphone audio kept before the overflow policy applies
+AUDIO_OVERFLOW_POLICY = "drop_oldest"  # "drop_oldest" keeps the freshest audio, "drop_newest" keeps the backlog
+USE_COMMAND_GRAMMAR = True  # Limit command mode to the command/spot vocabulary (dictation stays free-form)
+EARLY_COMMAND_DISPATCH = False  # Run unambiguous commands as soon as a partial result matches them
+COMMAND_ALTERNATIVES = 5  # N-best hypotheses requested from the command recognizer for rescoring
+RESCORE_MIN_CONFIDENCE = 0.2  # Commands scoring below this are rejected instead of run
+RESCORE_EDIT_PENALTY = 0.5  # Score multiplier per word corrected to a command word one edit away
+RESCORE_CONFIDENCE_SCALE = 1.0  # Scale applied to Vosk alternative confidences before normalizing
+RESCORE_MAX_VARIANTS = 16  # Corrected word combinations tried per hypothesis
+FUZZY_MAX_DISTANCE = 1  # Phonetic key edits allowed when matching a misheard name
+FUZZY_MAX_RATIO = 0.34  # Spelling edits allowed, as a fraction of the longer name's length
+WAKE_PHRASE = "wake up"  # The only phrase recognized while asleep
+AUTO_SLEEP_SECONDS = 900  # Go to sleep after this long without commands or dictation (0 disables)
+LOG_UTTERANCE_TIMING = False  # Print per-utterance partial/dispatch/final timing
+LATENCY_TRACING = True  # Record per-utterance stage latencies into per-command histograms
+DECODER_PROCESS = False  # Run the Vosk model in a child process fed through shared memory
+DECODER_RESTART_DELAY = 1.0  # Seconds to wait before restarting a crashed decoder process
+DECODER_MAX_RESTARTS = 5  # Give up after this many decoder process crashes
+
+# --- Voice Activity Gate ---
+VAD_ENABLED = True  # Skip decoding of silent blocks
+VAD_FRAME_MS = 10  # Frame length used for energy measurement
+VAD_THRESHOLD_RATIO = 3.0  # Speech must be this many times louder than the noise floor
+VAD_MIN_RMS = 150.0  # Absolute minimum RMS treated as speech
+VAD_FLOOR_ADAPT_RATE = 0.1  # Noise floor tracking rate during silence
+VAD_FLOOR_SPEECH_ADAPT_RATE = 0.005  # Noise floor tracking rate during speech
+VAD_PRE_ROLL_BLOCKS = 2  # Silent blocks replayed before a speech onset
+VAD_HANGOVER_BLOCKS = 3  # Blocks still decoded after speech stops
+
+# --- Echo Suppression ---
+ECHO_SUPPRESSION = True  # Drop microphone audio captured while GAIA is speaking
+ECHO_TAIL = 0.3  # Seconds after playback still treated as echo (output latency and room reverb)
+ECHO_CANCELLATION = False  # Subtract cached-phrase playback from the microphone instead of dropping it
+ECHO_MAX_DELAY = 0.25  # Largest speaker-to-microphone delay the canceller searches
+
+# --- Audio Input ---
+INPUT_DEVICE = None  # Part of the input device's name (e.g. "USB Headset"); None uses the default device
+INPUT_SAMPLE_RATE = None  # Capture rate; None opens the device at its native rate and resamples to 16 kHz
+INPUT_FAILOVER = True  # Switch to another input device when the stream stops or goes quiet
+INPUT_STALL_SECONDS = 2.0  # Time without audio callbacks before the stream counts as failed
 
 # --- User Data ---
 # Use a standard user data directory for spots.json
@@ -33,11 +81,17 @@ USER_DATA_DIR = user_data_dir(APP_NAME, APP_AUTHOR)
 if not os.path.exists(USER_DATA_DIR):
     os.makedirs(USER_DATA_DIR)  # Create the directory if it doesn't exist
 SPOTS_FILE = os.path.join(USER_DATA_DIR, "spots.json")
+LATENCY_REPORT_FILE = os.path.join(USER_DATA_DIR, "latency_report.json")  # Overridden by --latency-report
+REPLACEMENTS_FILE = os.path.join(USER_DATA_DIR, "replacements.json")  # Dictation: {"spoken phrase": "typed text"}
+SPEECH_CACHE_DIR = os.path.join(USER_DATA_DIR, "speech_cache")  # Rendered TTS phrases, one folder per voice setting
 
 # --- Speech Settings ---
 VOICE_GENDER = "female"  # "male" or "female"
 SPEECH_RATE = 1.0  # Multiplier for default speech rate (e.g., 1.0 is normal, 1.5 is faster)
 SPEECH_VOLUME = 1.0  # Multiplier for default volume (0.0 to 1.0+)
+SPEECH_TTL = 5.0  # Seconds a queued message may wait before it's dropped as stale
+SPEECH_CACHE_ENABLED = True  # Play phrases rendered earlier instead of synthesizing them again
+SPEECH_CACHE_MAX_ENTRIES = 200  # Rendered phrases kept on disk (least recently used are evicted)
 
 # --- UI Settings ---
 LABEL_DURATION_MS = 2000  # How long labels stay on screen in milliseconds
@@ -51,6 +105,21 @@ protected_names = [
 
 # --- Input Settings ---
 INPUT_TIMEOUT_SECONDS = 5  # Timeout for waiting for voice commands
+INPUT_BACKEND = "auto"  # "auto" (XTest on X11, otherwise pyautogui), "pyautogui", "xtest" or "recording"
+INPUT_PAUSE = 0.0  # pyautogui's implicit sleep after every call
+INPUT_FAILSAFE = True  # pyautogui aborts when the cursor is in a screen corner
+XTEST_REMAP_DELAY = 0.02  # Wait after borrowing keycodes for characters missing from the layout
+TEXT_TYPE_MAX_CHARS = 40  # Shorter text is typed as key events, longer text is pasted
+CLIPBOARD_OWNER = "auto"  # "auto" (in-process X11 owner on Linux, otherwise pyperclip), "x11" or "pyperclip"
+CLIPBOARD_RESTORE_DELAY = 0.5  # Seconds after a paste before the previous clipboard text is restored
+
+# Dictation
+DICTATION_STABILITY_INITIAL = 0.4  # Seconds a partial-result word must stay unchanged before it's typed
+DICTATION_STABILITY_MIN = 0.2  # The threshold shrinks toward this while finals confirm typed words
+DICTATION_STABILITY_MAX = 1.5  # and grows toward this while finals have to correct them
+DICTATION_RETRY_DELAY = 0.2  # Wait before retrying dictation text that failed to type
+DICTATION_FLUSH_TIMEOUT = 2.0  # How long stopping dictation waits for queued text to be typed
+DICTATION_NUMBER_MIN = 10  # Spoken numbers from this value up are typed as digits
 
 # Key press speed settings
 KEY_PRESS_INTERVAL = 0.1  # Base interval between key presses in seconds
@@ -60,6 +129,12 @@ SPEED_INCREMENT = 2.0  # Increased for more noticeable changes
 MIN_SPEED_MULTIPLIER = 0.05  # Allow very slow speeds (1 keypress every ~5 seconds)
 PAGE_KEY_PRESS_INTERVAL = 0.5  # Slower base interval for page up/down (seconds)
 PAGE_KEY_RELEASE_INTERVAL = 0.5  # Slower base interval for release
+MAX_REPEAT_COUNT = 500  # Largest "<number> up/down" count (the command grammar spells out 1-100 and round hundreds)
+MAX_TAB_COUNT = 10  # Largest "next/previous <number> tabs" count
+
+# Command execution
+EXECUTOR_QUEUE_SIZE = 16  # Commands allowed to wait per lane before new ones are dropped
+EXECUTOR_POOL_SIZE = 2  # Workers for commands that don't inject input
 
 # Window management
 CLOSE_CONFIRMATION_TIMEOUT = 5  # Seconds to wait for confirmation before canceling
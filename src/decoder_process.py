@@ -0,0 +1,203 @@
+"""Out-of-process speech decoding for GAIA
+
+The Vosk model and recognizers run in a child process so decoding doesn't compete for the GIL
+with Tk, TTS and input injection. Audio goes to the child through a shared-memory ring and
+only small JSON results come back.
+"""
+
+import json
+import multiprocessing
+import queue
+import threading
+import time
+
+import config
+import command_handler
+import speech
+import recognition
+import echo_control
+from audio_buffer import SharedAudioRing
+from spot_manager import add_spot_listener, get_spots
+from tracing import Trace, start_trace
+
+# Globals (main process)
+ring = None  # Shared audio ring written by the audio callback
+data_ready = None
+control_queue = None  # Mode, spot, playback and re-decode messages sent to the child
+child_results = None  # JSON results sent back by the child
+decoder = None  # The child process
+supervisor_thread = None
+supervisor_running = False
+restart_count = 0
+sent_dictating = None  # Last dictation state sent to the child
+sent_sleeping = None  # Last sleep state sent to the child
+
+class JsonResultQueue:
+    """Result queue stand-in used in the child that sends recognized text back as JSON"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def put(self, item):
+        text, trace = item
+        if trace == recognition.PARTIAL:
+            self.target.put(json.dumps({"text": text, "partial": True}))
+            return
+        stamps = trace.stamps if trace is not None else {}
+        self.target.put(json.dumps({"text": text, "stamps": stamps}))
+
+def decoder_main(ring_name, capacity, ready_event, controls, results):
+    """Child process entry point: run the recognition stage on the shared audio ring"""
+    import spot_manager
+
+    shared_ring = SharedAudioRing(capacity, ready_event, name=ring_name)
+    speech.audio_buffer = shared_ring
+    recognition.result_queue = JsonResultQueue(results)
+    recognition.start_recognition(speech.initialize_recognizer())
+
+    try:
+        while True:
+            kind, value = controls.get()
+            if kind == "stop":
+                break
+            if kind == "dictating":
+                command_handler.is_dictating = value
+            elif kind == "sleeping":
+                command_handler.is_sleeping = value
+            elif kind == "spots":
+                spot_manager.spots = {name: tuple(pos) for name, pos in value.items()}
+                spot_manager.notify_spot_listeners("load")
+            elif kind == "playback":
+                echo_control.mirror_playback(*value)
+            elif kind == "redecode":
+                # Off the control loop, so mode and spot updates don't wait for the re-decode
+                threading.Thread(target=send_redecode, args=(value, results), daemon=True).start()
+    finally:
+        recognition.stop_recognition()
+        shared_ring.close()
+
+def send_redecode(announce, results):
+    """Re-decode the last utterance from the child's audio history and send the outcome back"""
+    try:
+        outcome = recognition.redecode_last_utterance()
+    except Exception as e:
+        print(f"Error re-decoding the last utterance: {e}")
+        outcome = None
+    results.put(json.dumps({"retry": outcome, "announce": announce}))
+
+def request_redecode(announce):
+    """Ask the child to re-decode the last utterance; the outcome comes back as a result message"""
+    if control_queue is not None:
+        control_queue.put(("redecode", announce))
+
+def send_playback(event, interval):
+    """Send GAIA's speech playback to the child, which checks the microphone blocks for echo"""
+    if control_queue is not None:
+        start, end, reference = interval
+        # The reference PCM is only needed once, when playback starts
+        control_queue.put(("playback", (event, start, end, reference if event == "started" else None)))
+
+def send_spots(event=None, name=None):
+    """Send the current spots to the child so it can rebuild its grammar"""
+    if control_queue is not None:
+        control_queue.put(("spots", {name: list(pos) for name, pos in get_spots().items()}))
+
+def spawn_decoder():
+    """Start (or restart) the child process and bring it up to date"""
+    global decoder, sent_dictating, sent_sleeping
+
+    context = multiprocessing.get_context("spawn")
+    decoder = context.Process(
+        target=decoder_main,
+        args=(ring.name, ring.capacity, data_ready, control_queue, child_results),
+        daemon=True
+    )
+    decoder.start()
+    sent_dictating = sent_sleeping = None
+    send_spots()
+    print(f"Decoder process started (pid {decoder.pid})")
+
+def forward_result(message):
+    """Hand a message from the child to the dispatch stage"""
+    text = message.get("text", "")
+    if "retry" in message:
+        command_handler.report_retry(message["retry"], message["announce"])
+    elif message.get("partial"):
+        recognition.result_queue.put((text, recognition.PARTIAL))
+    else:
+        # perf_counter is system-wide, so the child's stamps line up with ours
+        trace = Trace(message.get("stamps")) if start_trace() is not None else None
+        recognition.result_queue.put((text, trace))
+
+def supervisor_worker():
+    """Forward results from the child, keep its mode in sync and restart it if it dies"""
+    global restart_count, sent_dictating, sent_sleeping
+
+    while supervisor_running:
+        try:
+            forward_result(json.loads(child_results.get(timeout=0.1)))
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"Error reading decoder result: {e}")
+
+        if not supervisor_running:
+            break
+
+        if not decoder.is_alive():
+            if restart_count >= config.DECODER_MAX_RESTARTS:
+                print("Decoder process keeps crashing, giving up")
+                break
+            restart_count += 1
+            print(f"Decoder process exited with code {decoder.exitcode}, restarting ({restart_count})")
+            time.sleep(config.DECODER_RESTART_DELAY)
+            spawn_decoder()
+
+        if command_handler.is_dictating != sent_dictating:
+            sent_dictating = command_handler.is_dictating
+            control_queue.put(("dictating", sent_dictating))
+        if command_handler.is_sleeping != sent_sleeping:
+            sent_sleeping = command_handler.is_sleeping
+            control_queue.put(("sleeping", sent_sleeping))
+
+def start_decoder_process():
+    """Route microphone audio to a decoder child process instead of the in-process recognizer"""
+    global ring, data_ready, control_queue, child_results, supervisor_thread, supervisor_running
+
+    context = multiprocessing.get_context("spawn")
+    data_ready = context.Event()
+    control_queue = context.Queue()
+    child_results = context.Queue()
+    ring = SharedAudioRing(int(config.AUDIO_BUFFER_SECONDS * 16000), data_ready)
+
+    # The audio callback writes straight into shared memory from now on
+    speech.audio_buffer = ring
+    add_spot_listener(send_spots)
+    echo_control.add_playback_listener(send_playback)
+    speech.add_shutdown_hook(stop_decoder_process)
+
+    spawn_decoder()
+    supervisor_running = True
+    supervisor_thread = threading.Thread(target=supervisor_worker, daemon=True)
+    supervisor_thread.start()
+
+def stop_decoder_process():
+    """Stop the child process and release the shared memory"""
+    global supervisor_running, ring
+
+    if ring is None:
+        return
+    supervisor_running = False
+    if supervisor_thread:
+        supervisor_thread.join(timeout=1.0)
+
+    control_queue.put(("stop", None))
+    decoder.join(timeout=2.0)
+    if decoder.is_alive():
+        print("Decoder process did not stop, terminating it")
+        decoder.terminate()
+        decoder.join(timeout=1.0)
+
+    ring.close()
+    ring = None
+    print("Decoder process stopped")
@@ -0,0 +1,260 @@
+"""Streaming dictation for GAIA
+
+Words are typed from partial results as soon as they stop changing, instead of waiting for
+the final result and a quiet period. When the final result disagrees with what was already
+typed, only the differing tail is backspaced and retyped. The time a word must stay unchanged
+adapts: it grows when finals keep correcting typed words and shrinks while they don't.
+Words pass through the dictation formatter (spoken punctuation, capitalization, numbers)
+before they are typed.
+
+Typing happens on a single output worker fed by a queue of edits, so dispatch never waits on
+input injection. Edits that queue up while one is being typed are merged into one, and an
+edit that fails to type is retried rather than dropped.
+"""
+
+import queue
+import threading
+import time
+
+import config
+import input_backend
+from text_injection import inject_text
+from formatter import DictationFormatter, build_phrase_table
+
+STOP_PHRASE = "stop dictation"  # Never typed from a partial result, it ends dictation
+THRESHOLD_GROWTH = 1.5  # Applied when a final result had to correct typed text
+THRESHOLD_DECAY = 0.9  # Applied when a final result matched what was typed
+
+# Globals
+transcript = None  # StreamingTranscript of the utterance in progress
+transcript_lock = threading.Lock()
+output_queue = queue.Queue()  # (backspaces, text) edits waiting to be typed
+output_thread = None
+output_running = False
+output_done = threading.Condition()
+outstanding = 0  # Edits queued or being typed, guarded by output_done
+output_stats = {"edits": 0, "coalesced": 0, "failures": 0, "max_depth": 0}
+
+def common_prefix_length(a, b):
+    """Length of the common prefix of two sequences"""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+class StreamingTranscript:
+    """Tracks one utterance's partial results and decides what to type and how to fix it"""
+
+    def __init__(self, threshold, formatter):
+        self.threshold = threshold  # Seconds a word must stay unchanged before it's typed
+        self.formatter = formatter  # Formatter state at the start of the utterance
+        self.reset_utterance()
+
+    def reset_utterance(self):
+        self.words = []  # Words of the latest partial result
+        self.since = []  # since[i]: when words[:i + 1] last changed
+        self.typed = ""  # Text typed so far for this utterance
+        self.live = self.formatter.copy()  # Formatter state after the words typed so far
+        self.consumed = 0  # Words already fed to the live formatter
+        self.revised = False  # A partial changed a word that was already fed
+
+    def update(self, text, now):
+        """Record a new partial result"""
+        words = text.split()
+        keep = common_prefix_length(self.words, words)
+        self.since = self.since[:keep] + [now] * (len(words) - keep)
+        self.words = words
+        if keep < self.consumed:
+            self.revised = True
+
+    def stable_count(self, now):
+        """Number of leading words that have been unchanged for the threshold"""
+        if len(self.words) <= 2 and STOP_PHRASE.startswith(" ".join(self.words)):
+            return 0
+        count = 0
+        # The last word of a partial is still being decoded, so it's never stable
+        while count < len(self.words) - 1 and now - self.since[count] >= self.threshold:
+            count += 1
+        return count
+
+    def advance(self, now):
+        """Format newly stable words and return the (backspaces, text) edit to type them, or None"""
+        count = self.stable_count(now)
+        # Revised words are left for the final result to fix, only extend what was typed
+        if self.revised or count <= self.consumed:
+            return None
+        text = self.live.feed(self.words[self.consumed:count])
+        self.consumed = count
+        if not text:
+            return None
+        self.typed += text
+        return 0, text
+
+    def finish(self, text):
+        """Return the minimal (backspaces, text) edit turning the typed text into the final result"""
+        formatter = self.formatter.copy()
+        target = formatter.feed(text.split())
+        keep = common_prefix_length(self.typed, target)
+        # Formatting state (held-back words, capitalization) carries into the next utterance
+        self.formatter = formatter
+        return len(self.typed) - keep, target[keep:]
+
+def merge_edits(first, second):
+    """Combine two edits into one that has the same effect"""
+    backspaces, text = first
+    more_backspaces, more_text = second
+    if more_backspaces <= len(text):
+        return backspaces, text[:len(text) - more_backspaces] + more_text
+    return backspaces + more_backspaces - len(text), more_text
+
+def queue_edit(edit):
+    """Hand an edit to the output worker"""
+    global outstanding
+    with output_done:
+        outstanding += 1
+    output_queue.put(edit)
+    output_stats["max_depth"] = max(output_stats["max_depth"], output_queue.qsize())
+
+def output_worker():
+    """Single consumer that types queued edits in order"""
+    global outstanding
+    pending = None
+    merged = 0  # Queued edits folded into pending
+
+    while output_running:
+        if pending is None:
+            try:
+                pending = output_queue.get(timeout=0.1)
+                merged = 1
+            except queue.Empty:
+                continue
+
+        # Everything that queued up while the last edit was typed goes out as one edit
+        while True:
+            try:
+                pending = merge_edits(pending, output_queue.get_nowait())
+                merged += 1
+                output_stats["coalesced"] += 1
+            except queue.Empty:
+                break
+
+        try:
+            backspaces, text = pending
+            if backspaces:
+                input_backend.press('backspace', presses=backspaces)
+                pending = (0, text)  # Don't repeat the backspaces if typing fails
+            if text:
+                inject_text(text)
+            pending = None
+        except Exception as e:
+            output_stats["failures"] += 1
+            print(f"Error typing dictation, retrying: {e}")
+            time.sleep(config.DICTATION_RETRY_DELAY)
+            continue
+
+        output_stats["edits"] += 1
+        with output_done:
+            outstanding -= merged
+            output_done.notify_all()
+
+def flush_output(timeout):
+    """Wait until every queued edit has been typed; returns False on timeout"""
+    with output_done:
+        return output_done.wait_for(lambda: outstanding == 0, timeout)
+
+def start_output():
+    """Start the dictation output worker"""
+    global output_thread, output_running
+    output_running = True
+    output_thread = threading.Thread(target=output_worker, daemon=True)
+    output_thread.start()
+
+def stop_output():
+    """Type what is still queued, then stop the output worker"""
+    global output_running
+    if not output_running:
+        return
+    if not flush_output(config.DICTATION_FLUSH_TIMEOUT):
+        print(f"Dictation output still has {outstanding} untyped edits at shutdown")
+    output_running = False
+    if output_thread:
+        output_thread.join(timeout=1.0)
+
+def get_output_stats():
+    """Return the output worker's edit, coalescing and failure counters"""
+    stats = dict(output_stats)
+    stats["depth"] = output_queue.qsize()
+    return stats
+
+def start_transcript():
+    """Reset streaming state at the start of dictation"""
+    global transcript
+    with transcript_lock:
+        transcript = StreamingTranscript(
+            config.DICTATION_STABILITY_INITIAL, DictationFormatter(build_phrase_table())
+        )
+
+def on_partial(text, now=None):
+    """Record a partial result and type any words that are already stable"""
+    now = time.perf_counter() if now is None else now
+    with transcript_lock:
+        if transcript is None:
+            return
+        transcript.update(text, now)
+        type_stable(now)
+
+def tick(now=None):
+    """Type words that became stable since the last partial result"""
+    now = time.perf_counter() if now is None else now
+    with transcript_lock:
+        if transcript is not None:
+            type_stable(now)
+
+def type_stable(now):
+    edit = transcript.advance(now)
+    if edit is not None:
+        queue_edit(edit)
+
+def on_final(text):
+    """Fix the typed tail to match the final result and adapt the stability threshold"""
+    with transcript_lock:
+        if transcript is None:
+            return
+        finish_locked(text)
+
+def finish_locked(text):
+    edit = transcript.finish(text)
+    backspaces, new_text = edit
+    if transcript.typed:
+        if backspaces:
+            transcript.threshold = min(config.DICTATION_STABILITY_MAX, transcript.threshold * THRESHOLD_GROWTH)
+            print(f"Corrected {backspaces} typed characters, stability threshold now {transcript.threshold:.2f}s")
+        else:
+            transcript.threshold = max(config.DICTATION_STABILITY_MIN, transcript.threshold * THRESHOLD_DECAY)
+    if backspaces or new_text:
+        queue_edit(edit)
+    transcript.reset_utterance()
+
+def discard_utterance():
+    """Remove anything typed for the current utterance (it was a command)"""
+    with transcript_lock:
+        if transcript is not None:
+            finish_locked("")
+
+def finish_dictation():
+    """Type the rest of the utterance in progress, stop streaming and wait for the output"""
+    global transcript
+    with transcript_lock:
+        if transcript is None:
+            return
+        if transcript.words or transcript.typed:
+            finish_locked(" ".join(transcript.words))
+        held_back = transcript.formatter.flush()
+        if held_back:
+            queue_edit((0, held_back))
+        transcript = None
+    if not flush_output(config.DICTATION_FLUSH_TIMEOUT):
+        # The worker keeps retrying, so the text still goes out once typing works again
+        print("Dictation output not flushed yet, it will be typed when input recovers")
@@ -0,0 +1,155 @@
+"""Self-echo suppression for GAIA
+
+The speech worker records when GAIA is playing speech, and the recognition stage checks each
+microphone block against those intervals (plus ECHO_TAIL for output latency and reverb), so
+GAIA doesn't decode its own voice. Blocks captured during playback are dropped. When the
+playback is a cached phrase, GAIA knows the exact PCM it is playing, and with
+ECHO_CANCELLATION on that reference is subtracted from the microphone instead, so the
+operator can still talk over it. With DECODER_PROCESS the intervals are mirrored into the
+decoder process, where the blocks are checked.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import config
+
+SAMPLE_RATE = 16000  # Rate of the microphone blocks and of the stored references
+
+# Globals
+playback_intervals = deque(maxlen=32)  # [start, end or None while playing, 16 kHz reference or None]
+intervals_lock = threading.Lock()
+playback_listeners = []  # Callbacks notified when playback starts or finishes
+echo_stats = {"blocks_suppressed": 0, "seconds_suppressed": 0.0, "blocks_cancelled": 0, "reduction_db": 0.0}
+
+def to_reference(audio):
+    """Convert rendered phrase audio (pcm, rate, channels, width) to mono float32 at 16 kHz"""
+    pcm, rate, channels, width = audio
+    if width == 1:
+        samples = np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128.0
+        samples *= 256.0
+    else:
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(pcm, dtype=dtype).astype(np.float32)
+        if width == 4:
+            samples /= 65536.0
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        positions = np.arange(0, len(samples) * SAMPLE_RATE / rate) * rate / SAMPLE_RATE
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+def add_playback_listener(callback):
+    """Register a callback(event, interval) run when playback starts ("started") or ends ("finished")"""
+    playback_listeners.append(callback)
+
+def notify_playback_listeners(event, interval):
+    """Tell registered listeners that playback started or finished"""
+    for callback in playback_listeners:
+        try:
+            callback(event, interval)
+        except Exception as e:
+            print(f"Error in playback listener: {e}")
+
+def playback_started(audio=None):
+    """Record that GAIA started speaking; audio is the cached PCM being played, if any"""
+    reference = None
+    if audio is not None and config.ECHO_CANCELLATION:
+        reference = to_reference(audio)
+    interval = [time.perf_counter(), None, reference]
+    with intervals_lock:
+        playback_intervals.append(interval)
+    notify_playback_listeners("started", interval)
+    return interval
+
+def playback_finished(interval):
+    """Record that the playback started by playback_started() ended"""
+    with intervals_lock:
+        interval[1] = time.perf_counter()
+    notify_playback_listeners("finished", interval)
+
+def mirror_playback(event, start, end, reference):
+    """Apply a playback event recorded in another process (perf_counter is system-wide)"""
+    with intervals_lock:
+        if event == "started":
+            playback_intervals.append([start, end, reference])
+            return
+        for interval in reversed(playback_intervals):
+            if interval[0] == start:
+                interval[1] = end
+                break
+
+def is_speaking():
+    """Whether GAIA is playing speech right now"""
+    with intervals_lock:
+        return bool(playback_intervals) and playback_intervals[-1][1] is None
+
+def overlapping(start, end):
+    """Return the playback interval that audio captured between start and end overlaps, or None"""
+    with intervals_lock:
+        for interval in reversed(playback_intervals):
+            played_from, played_to, _ = interval
+            if end >= played_from and (played_to is None or start <= played_to + config.ECHO_TAIL):
+                return interval
+    return None
+
+def cancel_echo(samples, start, interval):
+    """Subtract the best-aligned, best-scaled reference segment from a block; None if there's no reference"""
+    reference = interval[2]
+    count = len(samples)
+    max_lag = int(config.ECHO_MAX_DELAY * SAMPLE_RATE)
+    offset = int((start - interval[0]) * SAMPLE_RATE)
+
+    # Reference audio that could be in this block: from offset - max_lag to offset + count
+    window = np.zeros(count + max_lag, dtype=np.float32)
+    first, last = offset - max_lag, offset + count
+    available = reference[max(0, first):max(0, min(len(reference), last))]
+    if len(available) == 0:
+        return None
+    window[max(0, -first):max(0, -first) + len(available)] = available
+
+    # Cross-correlate through the FFT to find the speaker-to-microphone delay
+    mic = samples.astype(np.float32)
+    size = 1 << (len(window) + count - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(window, size) * np.conj(np.fft.rfft(mic, size)), size)[:max_lag + 1]
+    shift = int(np.argmax(correlation))
+    segment = window[shift:shift + count]
+    energy = float(np.dot(segment, segment))
+    if energy < 1.0:
+        return None
+    gain = float(np.dot(mic, segment)) / energy
+    residual = mic - gain * segment
+
+    before = float(np.dot(mic, mic)) + 1e-9
+    after = float(np.dot(residual, residual)) + 1e-9
+    echo_stats["blocks_cancelled"] += 1
+    # Running mean of the echo reduction achieved, in dB
+    echo_stats["reduction_db"] += (10 * np.log10(before / after) - echo_stats["reduction_db"]) / echo_stats["blocks_cancelled"]
+    return np.clip(residual, -32768, 32767).astype(np.int16)
+
+def filter_block(data, end):
+    """Return a microphone block captured up to end with GAIA's speech removed, or None to drop it"""
+    duration = len(data) / 2 / SAMPLE_RATE
+    start = end - duration
+    interval = overlapping(start, end)
+    if interval is None:
+        return data
+
+    if interval[2] is not None:
+        cleaned = cancel_echo(np.frombuffer(data, dtype=np.int16), start, interval)
+        if cleaned is not None:
+            return cleaned.tobytes()
+
+    echo_stats["blocks_suppressed"] += 1
+    echo_stats["seconds_suppressed"] += duration
+    return None
+
+def get_stats():
+    """Return how much microphone audio was dropped or echo-cancelled"""
+    stats = dict(echo_stats)
+    stats["seconds_suppressed"] = round(stats["seconds_suppressed"], 2)
+    stats["reduction_db"] = round(float(stats["reduction_db"]), 1)
+    return stats
@@ -0,0 +1,163 @@
+"""Spoken punctuation and formatting for GAIA dictation
+
+A single-pass transformer from recognized words to typed text. Spoken punctuation, line
+breaks, capitalization commands and the operator's own replacements are looked up in one
+phrase trie; numbers are read by the number parser. Words that could still grow into a
+longer phrase ("new" before "line", "twenty" before "one") are held back, including across
+chunk boundaries, so the formatter can be fed an utterance at a time.
+"""
+
+import json
+import os
+
+import config
+from number_parser import AND, NUMBER_WORDS, read_number
+
+# Phrase kinds
+WORD = "word"
+PUNCTUATION = "punctuation"
+BREAK = "break"
+CAP = "cap"
+ALL_CAPS = "all_caps"
+NUMBER = "number"
+
+NUMBER_STARTS = NUMBER_WORDS - {AND, "oh"}  # "oh" and "and" are words unless inside a number
+
+SPOKEN_PUNCTUATION = {
+    "comma": ",", "period": ".", "full stop": ".", "question mark": "?",
+    "exclamation mark": "!", "colon": ":", "semicolon": ";",
+}
+SPOKEN_BREAKS = {"new line": "\n", "new paragraph": "\n\n"}
+CASE_COMMANDS = {"cap": CAP, "all caps": ALL_CAPS}
+DEFAULT_REPLACEMENTS = {"i": "I"}
+SENTENCE_END = ".?!"
+
+def load_replacements(path=None):
+    """Load the operator's spoken phrase -> text replacements"""
+    path = path or config.REPLACEMENTS_FILE
+    replacements = dict(DEFAULT_REPLACEMENTS)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                replacements.update({phrase.lower(): text for phrase, text in json.load(f).items()})
+        except Exception as e:
+            print(f"Error loading replacements from {path}: {e}")
+    return replacements
+
+def build_phrase_table(replacements=None):
+    """Build the phrase trie: token -> child node, with the phrase's (kind, value) under None"""
+    root = {}
+
+    def add(phrase, entry):
+        node = root
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node[None] = entry
+
+    for phrase, mark in SPOKEN_PUNCTUATION.items():
+        add(phrase, (PUNCTUATION, mark))
+    for phrase, text in SPOKEN_BREAKS.items():
+        add(phrase, (BREAK, text))
+    for phrase, kind in CASE_COMMANDS.items():
+        add(phrase, (kind, None))
+    # The operator's replacements win over the built-in phrases
+    for phrase, text in (replacements if replacements is not None else load_replacements()).items():
+        add(phrase, (WORD, text))
+    return root
+
+class DictationFormatter:
+    """Streaming spoken-words-to-text transformer; state carries over between feed() calls"""
+
+    def __init__(self, table, number_min=None):
+        self.table = table
+        self.number_min = config.DICTATION_NUMBER_MIN if number_min is None else number_min
+        self.pending = []  # Tokens that may still be the start of a longer phrase
+        self.need_space = False  # Whether the next word needs a leading space
+        self.sentence_start = False  # Capitalize the next word (after . ? ! or a new paragraph)
+        self.cap_next = False
+        self.upper_next = False
+
+    def copy(self):
+        clone = DictationFormatter.__new__(DictationFormatter)
+        clone.__dict__.update(self.__dict__)
+        clone.pending = list(self.pending)
+        return clone
+
+    def feed(self, tokens):
+        """Format more words and return the text that is ready to type"""
+        out = []
+        for token in tokens:
+            self.pending.append(token.lower())
+            self.resolve(out, final=False)
+        return "".join(out)
+
+    def flush(self):
+        """Return the text of held-back words, e.g. when dictation stops"""
+        out = []
+        self.resolve(out, final=True)
+        return "".join(out)
+
+    def resolve(self, out, final):
+        """Emit every pending phrase that can no longer grow"""
+        while self.pending:
+            if self.pending[0] in NUMBER_STARTS and self.pending[0] not in self.table:
+                # Replacements win over numbers; otherwise read the number the words spell
+                value, length = read_number(self.pending, digits=False)
+                if not final and (length == len(self.pending) or self.pending[length:] == [AND]):
+                    return  # The number may continue ("twenty" before "one")
+                self.emit(out, (NUMBER, value), self.pending[:length])
+                del self.pending[:length]
+                continue
+
+            node = self.table
+            match_length, match = 0, None
+            for length, token in enumerate(self.pending, 1):
+                node = node.get(token)
+                if node is None:
+                    break
+                if None in node:
+                    match_length, match = length, node[None]
+            else:
+                if not final and len(node) > (None in node):
+                    return  # The whole pending run is a prefix of a longer phrase
+
+            if match is None:
+                self.emit_word(self.pending[0], out)
+                match_length = 1
+            else:
+                self.emit(out, match, self.pending[:match_length])
+            del self.pending[:match_length]
+
+    def emit(self, out, entry, tokens):
+        kind, value = entry
+        if kind == WORD:
+            self.emit_word(value, out)
+        elif kind == PUNCTUATION:
+            out.append(value)
+            self.need_space = True
+            if value in SENTENCE_END:
+                self.sentence_start = True
+        elif kind == BREAK:
+            out.append(value)
+            self.need_space = False
+            self.sentence_start = self.sentence_start or value == "\n\n"
+        elif kind == CAP:
+            self.cap_next = True
+        elif kind == ALL_CAPS:
+            self.upper_next = True
+        elif kind == NUMBER:
+            if value >= self.number_min:
+                self.emit_word(str(value), out)
+            else:
+                for token in tokens:
+                    self.emit_word(token, out)
+
+    def emit_word(self, text, out):
+        """Append a word with its leading space and any pending capitalization"""
+        if self.upper_next:
+            text = text.upper()
+        elif self.cap_next or self.sentence_start:
+            text = text[:1].upper() + text[1:]
+        self.upper_next = self.cap_next = self.sentence_start = False
+        out.append((" " if self.need_space else "") + text)
+        self.need_space = True
@@ -0,0 +1,180 @@
+"""Fuzzy name lookup for GAIA
+
+Spot names, websites, apps and command phrases are looked up through a FuzzyIndex: every name
+is reduced to a phonetic key (sound-alike spellings share a key) and the keys are stored in a
+BK-tree, so "closest name within distance k" only compares the query against a small part of
+the index. Candidates within the key distance are ranked by the edit distance of their actual
+spelling, and a match is only accepted if the spelling is close too.
+"""
+
+import re
+import threading
+
+import config
+
+# Rewrites applied in order to build a phonetic key
+PHONETIC_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r"[^a-z0-9]", ""),
+    (r"^[kgp]n", "n"),
+    (r"^wr", "r"),
+    (r"^x", "s"),
+    (r"ph", "f"),
+    (r"[cs]h", "x"),
+    (r"th", "0"),
+    (r"ck", "k"),
+    (r"c(?=[eiy])", "s"),
+    (r"[cqg]", "k"),
+    (r"x", "ks"),
+    (r"b", "p"),
+    (r"d", "t"),
+    (r"v", "f"),
+    (r"z", "s"),
+    (r"(?<=.)[aeiouyhw]", ""),
+    (r"(.)\1+", r"\1"),
+)]
+
+def normalize(name):
+    """Lowercase letters and digits only, so "you tube" and "youtube" compare equal"""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+def phonetic_key(name):
+    """Reduce a name to a key shared by names that sound alike"""
+    key = name.lower()
+    for pattern, replacement in PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    return key
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance; stops early and returns limit + 1 once it must exceed limit"""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class BKTree:
+    """Burkhard-Keller tree of strings under edit distance"""
+
+    def __init__(self):
+        self.root = None  # [key, {distance: child node}]
+        self.size = 0
+        self.visits = 0  # Distance computations made by searches, for benchmarks
+
+    def add(self, key):
+        if self.root is None:
+            self.root = [key, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(key, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [key, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """Return [(distance, key)] for every stored key within max_distance"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_key, children = stack.pop()
+            self.visits += 1
+            distance = edit_distance(key, node_key)
+            if distance <= max_distance:
+                found.append((distance, node_key))
+            # Triangle inequality: only children at distance d +- max_distance can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+class FuzzyIndex:
+    """Names indexed by phonetic key for closest-match lookups; safe to update while in use"""
+
+    def __init__(self, names=()):
+        self.lock = threading.Lock()
+        self.build(names)
+
+    def build(self, names):
+        """Replace the indexed names"""
+        with self.lock:
+            self.tree = BKTree()
+            self.by_key = {}  # phonetic key -> names with that key
+            for name in names:
+                self.add_locked(name)
+
+    def add(self, name):
+        with self.lock:
+            self.add_locked(name)
+
+    def add_locked(self, name):
+        key = phonetic_key(name)
+        if key not in self.by_key:
+            self.by_key[key] = set()
+            self.tree.add(key)
+        self.by_key[key].add(name)
+
+    def remove(self, name):
+        with self.lock:
+            key = phonetic_key(name)
+            names = self.by_key.get(key)
+            if names is None:
+                return
+            names.discard(name)
+            if names:
+                return
+            # The key stays in the tree as a dead node; rebuild once they outnumber live keys
+            del self.by_key[key]
+            if self.tree.size > 2 * len(self.by_key) + 64:
+                self.tree = BKTree()
+                for live_key in self.by_key:
+                    self.tree.add(live_key)
+
+    def __len__(self):
+        return sum(len(names) for names in self.by_key.values())
+
+    def matches(self, query, max_distance=None):
+        """Return [(key distance, spelling distance, name)] for close names, best first"""
+        max_distance = config.FUZZY_MAX_DISTANCE if max_distance is None else max_distance
+        spelling = normalize(query)
+        found = []
+        with self.lock:
+            for key_distance, key in self.tree.search(phonetic_key(query), max_distance):
+                for name in self.by_key.get(key, ()):
+                    target = normalize(name)
+                    limit = int(max(len(spelling), len(target)) * config.FUZZY_MAX_RATIO)
+                    distance = edit_distance(spelling, target, limit)
+                    if distance <= limit:
+                        found.append((key_distance, distance, name))
+        found.sort()
+        return found
+
+    def closest(self, query, max_distance=None):
+        """Return the single best name for the query, or None if there is none or it's a tie"""
+        found = self.matches(query, max_distance)
+        if not found:
+            return None
+        best = found[0]
+        for other in found[1:]:
+            if other[:2] != best[:2]:
+                break
+            if best[1] > 0 and normalize(other[2]) != normalize(best[2]):
+                return None  # Two different names are equally close; don't guess
+        return best[2]
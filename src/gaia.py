@@ -3,33 +3,146 @@ GAIA - Generalized Audio Interface Assistant
 A voice control system for computer interaction.
 """
 
+import argparse
+import multiprocessing
 import os
 import time
-import sounddevice as sd
 import threading
-import json
 import queue
-import pyautogui
-import pyperclip
 
 # Import from other modules
 import config
 from speech import (
-    initialize_speech, speak, audio_callback, initialize_recognizer, get_audio_queue
+    initialize_speech, speak, initialize_recognizer
 )
+from audio_input import start_audio_input, stop_audio_input
+from recognition import start_recognition, stop_recognition, get_result_queue, PARTIAL
+from decoder_process import start_decoder_process
 from ui_manager import initialize_ui
 from spot_manager import load_spots
 # Import command_handler module itself to access its state directly
 import command_handler
 # Explicitly import functions needed
-from command_handler import handle_command, stop_dictation_mode
+from command_handler import handle_command, stop_dictation_mode, command_label, is_concurrent_command
+from command_executor import start_executor, submit, cancel_all, get_metrics, shutdown_executor
+import tracing
+import dictation
+from text_injection import get_stats as get_text_stats, shutdown_text_injection
+
+# Dispatch state
+dispatch_thread = None
+dispatch_running = False
+
+def handle_dictation_result(recognized_text, trace, now):
+    """Route a partial or final result while in dictation mode"""
+    command_handler.last_speech_time = now # Update last speech time
+
+    if trace == PARTIAL:
+        # Type words as soon as they stop changing
+        dictation.on_partial(recognized_text)
+        return
+
+    print(f"Dictation heard: '{recognized_text}'")
+    if recognized_text.lower() == "stop dictation":
+        dictation.discard_utterance()
+        stop_dictation_mode(reason="command")
+        return
+
+    # Fix whatever the partial results typed so it matches the final text
+    dictation.on_final(recognized_text)
+
+def run_command(command_text, trace):
+    """Run a command on the calling thread and record its latency trace"""
+    tracing.set_current(trace)
+    try:
+        handle_command(command_text)
+    finally:
+        tracing.finish(trace, command_label(command_text))
+        tracing.set_current(None)
 
-# Define the paste interval here (or load from config if preferred)
-DICTATION_PASTE_INTERVAL = 1.5 # Seconds
+def dispatch_worker():
+    """Dedicated thread that routes recognized utterances to dictation or command handling"""
+    result_queue = get_result_queue()
 
-def main():
+    while dispatch_running:
+        try:
+            recognized_text, trace = result_queue.get(timeout=0.05)
+        except queue.Empty:
+            recognized_text = trace = None
+
+        now = time.time() # Get current time once per cycle
+
+        try:
+            # --- Dictation Mode Logic ---
+            if command_handler.is_dictating:
+                # Check timeouts first
+                if now - command_handler.dictation_start_time > command_handler.DICTATION_MAX_DURATION:
+                    print("Dictation stopped due to max duration timeout.")
+                    stop_dictation_mode(reason="timeout_max_duration")
+                    continue
+                # Check inactivity timeout based on last speech time
+                if command_handler.last_speech_time > 0 and now - command_handler.last_speech_time > command_handler.DICTATION_INACTIVITY_TIMEOUT:
+                    print("Dictation stopped due to inactivity timeout.")
+                    stop_dictation_mode(reason="timeout_inactivity")
+                    continue
+
+                if recognized_text is not None:
+                    handle_dictation_result(recognized_text, trace, now)
+
+                # --- Stability-based Typing ---
+                if command_handler.is_dictating:
+                    dictation.tick()
+                continue
+
+            # --- Sleep ---
+            if command_handler.is_sleeping:
+                if recognized_text and recognized_text.lower().strip() == config.WAKE_PHRASE:
+                    submit(run_command, (recognized_text, trace), concurrent=True)
+                continue
+            last_active = max(command_handler.last_command_time, command_handler.last_speech_time)
+            if config.AUTO_SLEEP_SECONDS and not recognized_text and now - last_active > config.AUTO_SLEEP_SECONDS:
+                command_handler.go_to_sleep(reason="inactivity")
+                continue
+
+            # --- Regular Command Processing (Not Dictating) ---
+            if recognized_text and trace != PARTIAL:
+                if recognized_text.lower().strip() == "stop":
+                    # "stop" must not wait behind queued commands
+                    cancel_all()
+                submit(run_command, (recognized_text, trace), concurrent=is_concurrent_command(recognized_text))
+        except Exception as e:
+            print(f"Error in dispatch worker: {e}")
+
+def start_dispatch():
+    """Start the dispatch worker thread"""
+    global dispatch_thread, dispatch_running
+
+    start_executor()
+    dictation.start_output()
+    dispatch_running = True
+    dispatch_thread = threading.Thread(target=dispatch_worker, daemon=True)
+    dispatch_thread.start()
+
+def shutdown_dispatch():
+    """Stop the dispatch worker thread"""
+    global dispatch_running
+    dispatch_running = False
+    if dispatch_thread:
+        dispatch_thread.join(timeout=1.0)
+    shutdown_executor()
+    dictation.stop_output()
+    shutdown_text_injection()
+    print(f"Command executor: {get_metrics()}")
+    print(f"Dictation output: {dictation.get_output_stats()}")
+    print(f"Text injection: {get_text_stats()}")
+
+def main(latency_report=None):
     """Main entry point for GAIA"""
 
+    if latency_report:
+        config.LATENCY_REPORT_FILE = latency_report
+        tracing.exit_report_path = latency_report
+
     # Check for the speech recognition model
     if not os.path.exists(config.MODEL_PATH):
         print(f"Download a Vosk model and extract it to: {config.MODEL_PATH}")
@@ -38,8 +151,8 @@ def main():
     # Initialize speech synthesis
     initialize_speech()
     
-    # Initialize the speech recognition
-    recognizer = initialize_recognizer()
+    # Initialize the speech recognition (in a child process if configured)
+    recognizer = None if config.DECODER_PROCESS else initialize_recognizer()
     
     # Load saved spots
     load_spots()
@@ -51,130 +164,40 @@ def main():
     time.sleep(1)
     
     # Start the audio stream
-    with sd.RawInputStream(
-        samplerate=16000, 
-        blocksize=config.BLOCK_SIZE, 
-        dtype='int16',
-        channels=1, 
-        callback=audio_callback
-    ):
-        speak("Voice control activated.")
-
-        # Start main loop
-        try:
-            # Update tkinter root occasionally to process events and audio
-            def update_tk_and_process_audio():
-                # Process tkinter events
-                root.update_idletasks()
-                root.update()
-
-                now = time.time() # Get current time once per update cycle
-
-                # --- Dictation Mode Logic ---
-                if command_handler.is_dictating:
-                    # Check timeouts first
-                    if now - command_handler.dictation_start_time > command_handler.DICTATION_MAX_DURATION:
-                        print("Dictation stopped due to max duration timeout.")
-                        stop_dictation_mode(reason="timeout_max_duration")
-                        # Schedule next check and return
-                        root.after(10, update_tk_and_process_audio)
-                        return
-                    # Check inactivity timeout based on last speech time
-                    if command_handler.last_speech_time > 0 and now - command_handler.last_speech_time > command_handler.DICTATION_INACTIVITY_TIMEOUT:
-                        print("Dictation stopped due to inactivity timeout.")
-                        stop_dictation_mode(reason="timeout_inactivity")
-                        # Schedule next check and return
-                        root.after(10, update_tk_and_process_audio)
-                        return
-
-                    # Process audio for dictation
-                    try:
-                        audio_queue = get_audio_queue()
-                        data = audio_queue.get_nowait()
-                        if recognizer.AcceptWaveform(data):
-                            result = json.loads(recognizer.Result())
-                            if "text" in result and result["text"]:
-                                recognized_text = result["text"].strip()
-                                print(f"Dictation heard: '{recognized_text}'")
-                                command_handler.last_speech_time = now # Update last speech time
-
-                                if recognized_text.lower() == "stop dictation":
-                                    stop_dictation_mode(reason="command")
-                                    # Don't process further this cycle if stopped
-                                    root.after(10, update_tk_and_process_audio)
-                                    return
-                                else:
-                                    words = recognized_text.split()
-                                    if words:
-                                        command_handler.dictation_word_chunk.extend(words)
-                                        # No immediate pasting here, handled by time check below
-
-                    except queue.Empty:
-                        pass # No new audio data
-
-                    # --- Time-based Pasting Logic ---
-                    # Check if there are words and enough time has passed since the last activity (speech or paste)
-                    if command_handler.dictation_word_chunk and \
-                       (now - max(command_handler.last_speech_time, command_handler.last_paste_time) > DICTATION_PASTE_INTERVAL):
-
-                        chunk_to_paste = " ".join(command_handler.dictation_word_chunk)
-                        command_handler.dictation_word_chunk = [] # Clear chunk *after* copying
-
-                        try:
-                            # Copy only the words, no trailing space yet
-                            pyperclip.copy(chunk_to_paste)
-                            # Paste the words
-                            pyautogui.hotkey('ctrl', 'v')
-                            # Wait briefly for paste to complete
-                            time.sleep(0.05)
-                            # Explicitly type a space after the pasted chunk
-                            pyautogui.press('space')
-                            print(f"Pasted chunk: '{chunk_to_paste}' + space")
-                            command_handler.last_paste_time = now # Update last paste time
-                            # Optional small delay after space
-                            time.sleep(0.05)
-                        except Exception as paste_err:
-                            print(f"Error pasting dictation chunk: {paste_err}")
-                            # If paste fails, consider putting words back? For now, they are lost.
-                            # command_handler.dictation_word_chunk = chunk_to_paste.split() # Option to restore
-
-                    # Schedule the next update regardless of pasting
-                    root.after(10, update_tk_and_process_audio)
-                    return # End dictation processing for this cycle
-
-                # --- Regular Command Processing (Not Dictating) ---
-                try:
-                    audio_queue = get_audio_queue()
-                    data = audio_queue.get_nowait()
-                    if recognizer.AcceptWaveform(data):
-                        result = json.loads(recognizer.Result())
-                        if "text" in result and result["text"]:
-                            command_text = result["text"]
-                            threading.Thread(
-                                target=handle_command,
-                                args=(command_text,),
-                                daemon=True
-                            ).start()
-                except queue.Empty:
-                    pass
-
-                # Schedule the next update
-                root.after(10, update_tk_and_process_audio)
-
-            # Start the update loop
-            update_tk_and_process_audio()
-            
-            # Start tkinter main loop
-            root.mainloop()
-            
-        except Exception as e:
-            print(f"Error in main loop: {e}")
-        finally:
-            from ui_manager import shutdown_ui
-            from speech import shutdown_speech
-            
-            shutdown_speech()
-            shutdown_ui()
+    start_audio_input()
+    speak("Voice control activated.")
+
+    # Start main loop
+    try:
+        # Recognition and dispatch run on their own threads so the Tk loop only handles UI events
+        if config.DECODER_PROCESS:
+            start_decoder_process()
+        else:
+            start_recognition(recognizer)
+        start_dispatch()
+
+        # Start tkinter main loop
+        root.mainloop()
+
+    except Exception as e:
+        print(f"Error in main loop: {e}")
+    finally:
+        from ui_manager import shutdown_ui
+        from speech import shutdown_speech
+
+        stop_audio_input()
+        stop_recognition()
+        shutdown_dispatch()
+        if latency_report:
+            tracing.dump_report(latency_report)
+        shutdown_speech()
+        shutdown_ui()
 
 if __name__ == "__main__":
-    main()
+    # In the PyInstaller build the decoder child re-runs this exe; hand it over before GAIA starts
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="GAIA voice control")
+    parser.add_argument("--latency-report", metavar="PATH",
+                        help="Write per-command latency percentiles to PATH on exit (and on 'latency report')")
+    args = parser.parse_args()
+    main(latency_report=args.latency_report)
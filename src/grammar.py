@@ -0,0 +1,65 @@
+"""Command grammar construction for GAIA"""
+
+import config
+from command_handler import FIXED_COMMANDS, FREE_TEXT_PREFIXES, SPOT_COMMAND_PREFIXES
+from number_parser import number_to_words
+from spot_manager import get_spots
+
+UNKNOWN_WORD = "[unk]"  # Vosk token for speech outside the grammar
+# Counts spelled out in the grammar: every count to 100, then round hundreds. Other counts up to
+# MAX_REPEAT_COUNT ("two hundred fifty", "one two") come back as [unk] and are re-decoded
+GRAMMAR_COUNTS = [*range(1, 101), *range(200, 1000, 100)]
+DIRECTIONS = ("up", "down")
+
+def build_command_grammar(include_spots=True):
+    """Build the list of phrases the command-mode recognizer may produce"""
+    phrases = set(FIXED_COMMANDS)
+
+    # Parameterized commands ("five down", "next three tabs enter", ...)
+    for count in GRAMMAR_COUNTS:
+        if count > config.MAX_REPEAT_COUNT:
+            break
+        number = number_to_words(count)
+        for direction in DIRECTIONS:
+            phrases.add(f"{number} {direction}")
+            phrases.add(f"{number} {direction} enter")
+    for direction in DIRECTIONS:
+        phrases.add(f"{UNKNOWN_WORD} {direction}")
+        phrases.add(f"{UNKNOWN_WORD} {direction} enter")
+    for count in range(1, config.MAX_TAB_COUNT + 1):
+        number = number_to_words(count)
+        for direction in ("next", "previous"):
+            for tabs in ("tab", "tabs"):
+                phrases.add(f"{direction} {number} {tabs}")
+                phrases.add(f"{direction} {number} {tabs} enter")
+
+    # Spot names and the commands that take one
+    for name in (get_spots() if include_spots else ()):
+        phrases.add(name)
+        for prefix in SPOT_COMMAND_PREFIXES:
+            phrases.add(f"{prefix} {name}")
+
+    # Free text after these prefixes comes back as [unk] and is re-decoded without the grammar
+    phrases.update(FREE_TEXT_PREFIXES)
+    phrases.add(UNKNOWN_WORD)
+    return sorted(phrases)
+
+def needs_free_form_decode(text):
+    """Check if a grammar result is a free-text command or count whose words fell outside the grammar"""
+    if UNKNOWN_WORD not in text:
+        return False
+    words = text.split()
+    if words[0] == UNKNOWN_WORD and words[1:2] and words[1] in DIRECTIONS:
+        return True  # A count the grammar doesn't spell out ("two hundred fifty down")
+    return any(text == prefix or text.startswith(prefix + " ") for prefix in FREE_TEXT_PREFIXES)
+
+def build_early_dispatch_phrases(grammar):
+    """Find the phrases that are complete commands and not the start of any longer phrase"""
+    # Phrases with [unk] in them still have words to re-decode
+    phrases = {phrase for phrase in grammar if UNKNOWN_WORD not in phrase} - set(FREE_TEXT_PREFIXES)
+    prefixes = set()
+    for phrase in grammar:
+        words = phrase.split()
+        for i in range(1, len(words)):
+            prefixes.add(" ".join(words[:i]))
+    return frozenset(phrases - prefixes)
@@ -0,0 +1,491 @@
+"""Input injection backends for GAIA
+
+All keyboard and mouse output goes through one backend. A command describes its input as a
+list of events and sends it in one call, so repeated keys ("five down", "next three tabs")
+are a single batch instead of N round trips with sleeps in between.
+
+Events are tuples:
+    ("press", key)            press and release a key
+    ("hotkey", (key, ...))    press keys in order, release them in reverse
+    ("key_down", key)
+    ("key_up", key)
+    ("click", button, clicks) click at the current cursor position
+    ("move", x, y)            move the cursor
+    ("scroll", amount)        positive scrolls up, negative down
+    ("write", text)           type text
+"""
+
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import config
+import tracing
+
+# Globals
+backend = None  # Active backend, created on first use
+backend_lock = threading.Lock()
+
+class InputBackend(ABC):
+    """Base backend: sends a batch by running each event in order
+
+    A backend that leaves out any of the event methods can't be instantiated.
+    """
+
+    name = "base"
+
+    def send(self, events):
+        for kind, *args in events:
+            getattr(self, kind)(*args)
+
+    @abstractmethod
+    def press(self, key):
+        ...
+
+    @abstractmethod
+    def hotkey(self, keys):
+        ...
+
+    @abstractmethod
+    def key_down(self, key):
+        ...
+
+    @abstractmethod
+    def key_up(self, key):
+        ...
+
+    @abstractmethod
+    def click(self, button, clicks):
+        ...
+
+    @abstractmethod
+    def move(self, x, y):
+        ...
+
+    def move_to(self, x, y, duration=0.0):
+        """Move the cursor, gliding over duration seconds if given"""
+        if duration <= 0:
+            self.send([("move", x, y)])
+            return
+        start_x, start_y = self.position()
+        steps = max(1, int(duration * 60))
+        for step in range(1, steps + 1):
+            fraction = step / steps
+            self.send([("move", round(start_x + (x - start_x) * fraction), round(start_y + (y - start_y) * fraction))])
+            time.sleep(duration / steps)
+
+    @abstractmethod
+    def scroll(self, amount):
+        ...
+
+    @abstractmethod
+    def write(self, text):
+        ...
+
+    def can_type(self, text):
+        """Whether write() can type every character of text"""
+        return all(0x20 <= ord(char) < 0x7f or char == '\n' for char in text)
+
+    @abstractmethod
+    def position(self):
+        ...
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_UNICODE = 0x0004
+    VK_RETURN = 0x0D
+
+    class KEYBDINPUT(ctypes.Structure):
+        _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                    ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                    ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+    class INPUT_UNION(ctypes.Union):
+        _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+    class INPUT(ctypes.Structure):
+        _fields_ = [("type", wintypes.DWORD), ("union", INPUT_UNION)]
+
+def send_unicode_input(text):
+    """Type text on Windows with one SendInput call of KEYEVENTF_UNICODE events"""
+    inputs = []
+    for char in text:
+        if char == '\n':
+            keys = [(VK_RETURN, 0, 0)]
+        else:
+            encoded = char.encode("utf-16-le")
+            # Characters outside the BMP are sent as their two UTF-16 surrogates
+            keys = [(0, int.from_bytes(encoded[i:i + 2], "little"), KEYEVENTF_UNICODE) for i in range(0, len(encoded), 2)]
+        for vk, scan, flags in keys:
+            for up in (0, KEYEVENTF_KEYUP):
+                event = INPUT(type=1)  # INPUT_KEYBOARD
+                event.union.ki = KEYBDINPUT(wVk=vk, wScan=scan, dwFlags=flags | up)
+                inputs.append(event)
+    array = (INPUT * len(inputs))(*inputs)
+    sent = ctypes.windll.user32.SendInput(len(inputs), array, ctypes.sizeof(INPUT))
+    if sent != len(inputs):
+        raise OSError(f"SendInput injected {sent} of {len(inputs)} events")
+
+class PyAutoGUIBackend(InputBackend):
+    """pyautogui with its implicit pause removed; runs of key presses go out in one call"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        pyautogui.PAUSE = config.INPUT_PAUSE
+        pyautogui.FAILSAFE = config.INPUT_FAILSAFE
+        self.pyautogui = pyautogui
+
+    def send(self, events):
+        # Consecutive presses become one pyautogui.press(list) call, so one failsafe check per run
+        pending = []
+        for kind, *args in events:
+            if kind == "press":
+                pending.append(args[0])
+                continue
+            if pending:
+                self.pyautogui.press(pending)
+                pending = []
+            getattr(self, kind)(*args)
+        if pending:
+            self.pyautogui.press(pending)
+
+    def press(self, key):
+        self.pyautogui.press(key)
+
+    def hotkey(self, keys):
+        self.pyautogui.hotkey(*keys)
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(key)
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(key)
+
+    def click(self, button, clicks):
+        self.pyautogui.click(clicks=clicks, button=button)
+
+    def move(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def move_to(self, x, y, duration=0.0):
+        self.pyautogui.moveTo(x, y, duration=duration)
+
+    def scroll(self, amount):
+        self.pyautogui.scroll(amount)
+
+    def write(self, text):
+        if sys.platform == "win32":
+            send_unicode_input(text)
+        else:
+            self.pyautogui.write(text)
+
+    def can_type(self, text):
+        return sys.platform == "win32" or super().can_type(text)
+
+    def position(self):
+        return tuple(self.pyautogui.position())
+
+class XTestBackend(InputBackend):
+    """X11 XTest backend: a whole batch is queued as raw events and flushed with one round trip"""
+
+    name = "xtest"
+
+    # pyautogui key names -> X keysym names
+    KEY_NAMES = {
+        'enter': 'Return', 'return': 'Return', '\n': 'Return', 'tab': 'Tab', '\t': 'Tab',
+        'space': 'space', ' ': 'space', 'backspace': 'BackSpace', 'delete': 'Delete', 'del': 'Delete',
+        'esc': 'Escape', 'escape': 'Escape', 'insert': 'Insert', 'home': 'Home', 'end': 'End',
+        'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+        'pageup': 'Prior', 'pgup': 'Prior', 'pagedown': 'Next', 'pgdn': 'Next',
+        'ctrl': 'Control_L', 'ctrlleft': 'Control_L', 'ctrlright': 'Control_R',
+        'shift': 'Shift_L', 'shiftleft': 'Shift_L', 'shiftright': 'Shift_R',
+        'alt': 'Alt_L', 'altleft': 'Alt_L', 'altright': 'Alt_R',
+        'win': 'Super_L', 'winleft': 'Super_L', 'winright': 'Super_R',
+    }
+    BUTTONS = {'left': 1, 'middle': 2, 'right': 3}
+
+    def __init__(self):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display()
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError("X server has no XTEST extension")
+        self.keycodes = {}  # key name or character -> (keycode, needs shift)
+        self.shift_keycode = self.display.keysym_to_keycode(XK.string_to_keysym('Shift_L'))
+        self.lock = threading.Lock()
+
+        # Unused keycodes are borrowed to type characters the layout doesn't have
+        first = self.display.display.info.min_keycode
+        count = self.display.display.info.max_keycode - first + 1
+        mapping = self.display.get_keyboard_mapping(first, count)
+        self.spare_keycodes = [first + index for index, syms in enumerate(mapping) if not any(syms)]
+        self.borrowed = {}  # spare keycode -> character currently mapped to it
+        self.next_spare = 0
+
+    def keysym_for(self, key):
+        """Return the X keysym for a pyautogui key name or a single character"""
+        name = self.KEY_NAMES.get(key)
+        if name is None and len(key) > 1:
+            name = key.upper() if key[0] == 'f' and key[1:].isdigit() else key
+        if name is not None:
+            return self.XK.string_to_keysym(name)
+        code = ord(key)
+        # Latin-1 characters are their own keysym, everything else uses the Unicode range
+        return code if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff else 0x01000000 + code
+
+    def keycode_for(self, key):
+        """Return (keycode, needs shift) for a key, cached"""
+        cached = self.keycodes.get(key)
+        if cached is not None:
+            return cached
+        keysym = self.keysym_for(key)
+        keycode = self.display.keysym_to_keycode(keysym) if keysym else 0
+        if not keycode:
+            if len(key) != 1 or not self.spare_keycodes:
+                raise ValueError(f"No keycode for key {key!r}")
+            return None
+        shifted = self.display.keycode_to_keysym(keycode, 0) != keysym
+        self.keycodes[key] = (keycode, shifted)
+        return keycode, shifted
+
+    def key_events(self, key, down=True, up=True):
+        """Raw (event type, detail) pairs for one key, adding shift where the layout needs it"""
+        if self.keycode_for(key) is None:
+            self.borrow_keycodes(key)
+        keycode, shifted = self.keycodes[key]
+        raw = []
+        if down:
+            if shifted:
+                raw.append((self.X.KeyPress, self.shift_keycode))
+            raw.append((self.X.KeyPress, keycode))
+        if up:
+            raw.append((self.X.KeyRelease, keycode))
+            if shifted:
+                raw.append((self.X.KeyRelease, self.shift_keycode))
+        return raw
+
+    def send(self, events):
+        X = self.X
+        with self.lock:
+            for kind, *args in events:
+                if kind == "press":
+                    raw = self.key_events(args[0])
+                elif kind == "hotkey":
+                    keys = args[0]
+                    raw = [pair for key in keys for pair in self.key_events(key, up=False)]
+                    raw += [pair for key in reversed(keys) for pair in self.key_events(key, down=False)]
+                elif kind == "key_down":
+                    raw = self.key_events(args[0], up=False)
+                elif kind == "key_up":
+                    raw = self.key_events(args[0], down=False)
+                elif kind == "click":
+                    button, clicks = args
+                    raw = [(X.ButtonPress, self.BUTTONS[button]), (X.ButtonRelease, self.BUTTONS[button])] * clicks
+                elif kind == "scroll":
+                    button = 4 if args[0] > 0 else 5
+                    raw = [(X.ButtonPress, button), (X.ButtonRelease, button)] * abs(args[0])
+                elif kind == "write":
+                    self.borrow_keycodes(args[0])
+                    raw = [pair for char in args[0] for pair in self.key_events(char)]
+                elif kind == "move":
+                    self.xtest.fake_input(self.display, X.MotionNotify, x=args[0], y=args[1])
+                    continue
+                else:
+                    raise ValueError(f"Unknown input event {kind!r}")
+                for event_type, detail in raw:
+                    self.xtest.fake_input(self.display, event_type, detail)
+            self.display.sync()
+
+    def borrow_keycodes(self, text):
+        """Map characters missing from the layout onto spare keycodes, one remap for the whole text"""
+        missing = []
+        for char in dict.fromkeys(text):
+            if char not in self.keycodes and self.keycode_for(char) is None:
+                missing.append(char)
+        if not missing:
+            return
+        if len(missing) > len(self.spare_keycodes):
+            raise ValueError(f"Too many characters missing from the keyboard layout ({len(missing)})")
+
+        for char in missing:
+            keycode = self.spare_keycodes[self.next_spare]
+            self.next_spare = (self.next_spare + 1) % len(self.spare_keycodes)
+            old_char = self.borrowed.pop(keycode, None)
+            if old_char is not None:
+                self.keycodes.pop(old_char, None)
+            keysym = self.keysym_for(char)
+            self.display.change_keyboard_mapping(keycode, [(keysym, keysym)])
+            self.borrowed[keycode] = char
+            self.keycodes[char] = (keycode, False)
+        self.display.sync()
+        # Clients pick up the new mapping from a MappingNotify; give them time before typing
+        time.sleep(config.XTEST_REMAP_DELAY)
+
+    def can_type(self, text):
+        return bool(self.spare_keycodes) or super().can_type(text)
+
+    def press(self, key):
+        self.send([("press", key)])
+
+    def hotkey(self, keys):
+        self.send([("hotkey", keys)])
+
+    def key_down(self, key):
+        self.send([("key_down", key)])
+
+    def key_up(self, key):
+        self.send([("key_up", key)])
+
+    def click(self, button, clicks):
+        self.send([("click", button, clicks)])
+
+    def move(self, x, y):
+        self.send([("move", x, y)])
+
+    def scroll(self, amount):
+        self.send([("scroll", amount)])
+
+    def write(self, text):
+        self.send([("write", text)])
+
+    def position(self):
+        with self.lock:
+            pointer = self.display.screen().root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+class RecordingBackend(InputBackend):
+    """Backend that records every event with a timestamp instead of injecting it"""
+
+    name = "recording"
+
+    def __init__(self):
+        self.events = []  # (timestamp, kind, args)
+        self.lock = threading.Lock()
+        self.cursor = (0, 0)
+
+    def send(self, events):
+        now = time.perf_counter()
+        with self.lock:
+            for kind, *args in events:
+                self.events.append((now, kind, tuple(args)))
+                if kind == "move":
+                    self.cursor = (args[0], args[1])
+
+    def press(self, key):
+        self.send([("press", key)])
+
+    def hotkey(self, keys):
+        self.send([("hotkey", keys)])
+
+    def key_down(self, key):
+        self.send([("key_down", key)])
+
+    def key_up(self, key):
+        self.send([("key_up", key)])
+
+    def click(self, button, clicks):
+        self.send([("click", button, clicks)])
+
+    def move(self, x, y):
+        self.send([("move", x, y)])
+
+    def move_to(self, x, y, duration=0.0):
+        self.send([("move", x, y)])
+
+    def scroll(self, amount):
+        self.send([("scroll", amount)])
+
+    def write(self, text):
+        self.send([("write", text)])
+
+    def can_type(self, text):
+        return True
+
+    def position(self):
+        return self.cursor
+
+    def events_since(self, since):
+        """Return the recorded events at or after a timestamp"""
+        with self.lock:
+            return [event for event in self.events if event[0] >= since]
+
+def create_backend(name):
+    """Create a backend by name; "auto" uses XTest on X11 when python-xlib is available"""
+    if name == "recording":
+        return RecordingBackend()
+    if name == "xtest" or (name == "auto" and sys.platform.startswith("linux") and os.environ.get("DISPLAY")):
+        try:
+            return XTestBackend()
+        except Exception as e:
+            if name == "xtest":
+                raise
+            print(f"XTest input backend unavailable ({e}), using pyautogui")
+    return PyAutoGUIBackend()
+
+def get_backend():
+    """Return the active backend, creating it on first use"""
+    global backend
+    if backend is None:
+        with backend_lock:
+            if backend is None:
+                backend = create_backend(config.INPUT_BACKEND)
+                print(f"Input backend: {backend.name}")
+    return backend
+
+def set_backend(new_backend):
+    """Replace the active backend (used by the replay harness)"""
+    global backend
+    with backend_lock:
+        backend = new_backend
+
+# --- Input API used by commands ---
+
+def send(events):
+    """Send a batch of input events in one call"""
+    if events:
+        tracing.mark_input()
+        get_backend().send(events)
+
+def press(key, presses=1):
+    send([("press", key)] * presses)
+
+def hotkey(*keys):
+    send([("hotkey", keys)])
+
+def key_down(key):
+    send([("key_down", key)])
+
+def key_up(key):
+    send([("key_up", key)])
+
+def click(clicks=1, button="left"):
+    send([("click", button, clicks)])
+
+def move_to(x, y, duration=0.0):
+    tracing.mark_input()
+    get_backend().move_to(x, y, duration)
+
+def scroll(amount):
+    send([("scroll", amount)])
+
+def write(text):
+    send([("write", text)])
+
+def position():
+    return get_backend().position()
+
+def can_type(text):
+    return get_backend().can_type(text)
@@ -1,9 +1,8 @@
 """Keyboard, mouse, and selection commands for GAIA"""
 
-import pyautogui
+import input_backend
 import threading
 import time
-from speech import speak
 import config
 
 # Globals
@@ -42,9 +41,9 @@ def smooth_scroll(direction, use_page_timing=False):
             
             # Scroll smoothly
             if direction == 'down':
-                pyautogui.scroll(-scroll_amount)  # Negative for down
+                input_backend.scroll(-scroll_amount)  # Negative for down
             else:  # up
-                pyautogui.scroll(scroll_amount)   # Positive for up
+                input_backend.scroll(scroll_amount)   # Positive for up
                 
             time.sleep(current_interval)
     except Exception as e:
@@ -81,7 +80,7 @@ def hold_key(key, use_page_timing=False, with_shift=False):
     try:
         # If selection mode, press and hold shift first
         if with_shift:
-            pyautogui.keyDown('shift')
+            input_backend.key_down('shift')
             print("Shift key pressed - selection active")
             
         while key_hold_active:
@@ -91,38 +90,37 @@ def hold_key(key, use_page_timing=False, with_shift=False):
                 current_release_interval = base_release_interval / KEY_SPEED_MULTIPLIER
             
             # Press and release the key at current speed
-            pyautogui.keyDown(key)
+            input_backend.key_down(key)
             time.sleep(current_press_interval)
-            pyautogui.keyUp(key)
+            input_backend.key_up(key)
             time.sleep(current_release_interval)
     except Exception as e:
         print(f"Error holding key: {e}")
     finally:
         try:
             # Ensure keys are released
-            pyautogui.keyUp(key)
+            input_backend.key_up(key)
             # Release shift if we were in selection mode
             if with_shift:
-                pyautogui.keyUp('shift')
+                input_backend.key_up('shift')
                 print("Shift key released - selection complete")
         except:
             pass
         print(f"Stopped holding key: {key}")
 
 def adjust_key_speed(faster=True):
-    """Adjust the key repeat speed (faster or slower)"""
+    """Adjust the key repeat speed (faster or slower) and return the new multiplier"""
     global KEY_SPEED_MULTIPLIER
     
     with key_speed_lock:
         if faster:
             KEY_SPEED_MULTIPLIER += config.SPEED_INCREMENT
             print(f"Increased speed to {KEY_SPEED_MULTIPLIER:.2f}x")
-            speak(f"Speed {KEY_SPEED_MULTIPLIER:.1f}")
         else:
             # Allow for much slower speeds
             KEY_SPEED_MULTIPLIER = max(config.MIN_SPEED_MULTIPLIER, KEY_SPEED_MULTIPLIER - config.SPEED_INCREMENT)
             print(f"Decreased speed to {KEY_SPEED_MULTIPLIER:.2f}x")
-            speak(f"Speed {KEY_SPEED_MULTIPLIER:.1f}")
+        return KEY_SPEED_MULTIPLIER
 
 def stop_key_hold():
     """Stop any ongoing key hold operation"""
@@ -0,0 +1,185 @@
+"""Vosk model pool for GAIA
+
+Each model in MODEL_PATHS is loaded once and shared by every recognizer built on it. The
+command model is loaded first so GAIA can take commands straight away, and the others (a
+larger dictation model, a second language) are loaded on a background thread ahead of time
+or on first use. Once the loaded models' resident size exceeds MODEL_MEMORY_BUDGET_MB the
+least recently used ones are dropped; the command model is never evicted.
+"""
+
+import ctypes
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from vosk import Model
+
+COMMAND_MODEL = "command"
+
+def resident_bytes():
+    """Resident memory of this process, or None where it can't be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+def directory_bytes(path):
+    """Size of a model directory on disk, the fallback estimate of its resident size"""
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+class ModelPool:
+    """Loaded Vosk models by name, in least recently used order"""
+
+    def __init__(self, paths, budget_bytes):
+        self.paths = dict(paths)  # model name -> model directory
+        self.budget_bytes = budget_bytes
+        self.models = OrderedDict()  # model name -> loaded Model, least recently used first
+        self.info = {}  # model name -> {"load_seconds", "resident_bytes", "loads", "uses"}
+        self.loading = {}  # model name -> Event set when its load finishes
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()  # One load at a time, so the resident size deltas stay apart
+        self.failed = set()  # Models whose background load failed, not retried
+        self.evictions = 0
+
+    def resolve(self, name):
+        """Name of the model that serves name; roles without their own model use the command model"""
+        return name if name in self.paths else COMMAND_MODEL
+
+    def is_loaded(self, name):
+        with self.lock:
+            return self.resolve(name) in self.models
+
+    def get(self, name):
+        """Return the model for name, loading it (or waiting for a background load) if needed"""
+        name = self.resolve(name)
+        while True:
+            with self.lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    self.info[name]["uses"] += 1
+                    return self.models[name]
+                event = self.loading.get(name)
+            if event is None:
+                return self.load(name)
+            event.wait()
+
+    def load(self, name):
+        with self.load_lock:
+            with self.lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    self.info[name]["uses"] += 1
+                    return self.models[name]
+                event = self.loading[name] = threading.Event()
+            try:
+                path = self.paths[name]
+                print(f"Loading model '{name}' from {path}")
+                before = resident_bytes()
+                started = time.perf_counter()
+                model = Model(path)
+                seconds = time.perf_counter() - started
+                after = resident_bytes()
+                size = after - before if before is not None and after is not None else 0
+                if size <= 0:
+                    size = directory_bytes(path)
+                with self.lock:
+                    info = self.info.setdefault(name, {"loads": 0, "uses": 0})
+                    info.update(load_seconds=seconds, resident_bytes=size)
+                    info["loads"] += 1
+                    info["uses"] += 1
+                    self.models[name] = model
+                    self.evict_locked(keep=name)
+                print(f"Loaded model '{name}' in {seconds:.1f}s ({size / 2**20:.0f} MB)")
+                return model
+            finally:
+                with self.lock:
+                    del self.loading[name]
+                event.set()
+
+    def preload(self, names):
+        """Load models on a background thread so they are ready before they're needed"""
+        with self.lock:
+            names = [
+                name for name in dict.fromkeys(self.resolve(name) for name in names)
+                if name not in self.models and name not in self.loading and name not in self.failed
+            ]
+        if not names:
+            return None
+        thread = threading.Thread(target=self.preload_worker, args=(names,), daemon=True)
+        thread.start()
+        return thread
+
+    def preload_worker(self, names):
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                self.failed.add(name)
+                print(f"Error preloading model '{name}': {e}")
+
+    def resident_locked(self):
+        return sum(self.info[name]["resident_bytes"] for name in self.models)
+
+    def evict_locked(self, keep=None):
+        """Drop least recently used models until the loaded ones fit the memory budget"""
+        for name in list(self.models):
+            if self.resident_locked() <= self.budget_bytes:
+                break
+            if name in (keep, COMMAND_MODEL):
+                continue
+            # Recognizers built on it keep it alive until they are dropped
+            del self.models[name]
+            self.evictions += 1
+            print(f"Evicted model '{name}' to stay within the memory budget")
+
+    def release(self):
+        """Drop every loaded model except the command model"""
+        with self.lock:
+            for name in list(self.models):
+                if name != COMMAND_MODEL:
+                    del self.models[name]
+
+    def get_stats(self):
+        """Return load time and resident size per model, and the pool's total against its budget"""
+        with self.lock:
+            models = {
+                name: {
+                    "loaded": name in self.models,
+                    "load_seconds": round(info["load_seconds"], 2),
+                    "resident_mb": round(info["resident_bytes"] / 2**20, 1),
+                    "loads": info["loads"],
+                    "uses": info["uses"],
+                }
+                for name, info in self.info.items()
+            }
+            return {
+                "models": models,
+                "resident_mb": round(self.resident_locked() / 2**20, 1),
+                "budget_mb": round(self.budget_bytes / 2**20, 1),
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,128 @@
+"""Spoken number parsing for GAIA
+
+Numbers are read compositionally from a handful of words instead of an enumerated table:
+units, teens, tens, "hundred" and "thousand" ("four hundred and twelve"), plus digit-by-digit
+forms ("four one two", "one oh five"). A single left-to-right pass over the tokens tracks
+the value and which word may come next, so parsing is O(tokens).
+"""
+
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+HUNDRED = "hundred"
+THOUSAND = "thousand"
+AND = "and"
+DIGIT_WORDS = dict(UNITS, oh=0)  # Words allowed in digit-by-digit numbers
+
+NUMBER_WORDS = frozenset(UNITS) | frozenset(TEENS) | frozenset(TENS) | {HUNDRED, THOUSAND, AND, "oh"}
+
+# Regex for a number in a command pattern: digits, or a run of number words checked by parse_number
+NUMBER_WORD_PATTERN = "|".join(sorted(NUMBER_WORDS - {AND}, key=len, reverse=True))
+NUMBER_PATTERN = rf"(?:\d+|(?:{NUMBER_WORD_PATTERN})(?:\s+(?:{NUMBER_WORD_PATTERN}|{AND}))*)"
+
+def read_digits(tokens, start):
+    """Read a digit-by-digit number; returns (value, end) or (None, start)"""
+    end = start
+    while end < len(tokens) and tokens[end] in DIGIT_WORDS:
+        end += 1
+    # A lone digit word is a compositional number, and "oh" only counts among other digits
+    if end - start < 2:
+        return None, start
+    return int("".join(str(DIGIT_WORDS[token]) for token in tokens[start:end])), end
+
+def read_compositional(tokens, start):
+    """Read "four hundred and twelve" style numbers; returns (value, end) or (None, start)"""
+    total = 0  # Completed thousands
+    current = 0  # Value below a thousand being built
+    previous = None  # Kind of the last word read
+    value, end = None, start  # Longest prefix read so far that is a complete number
+
+    for index in range(start, len(tokens)):
+        token = tokens[index]
+        if token == "zero":
+            # Only a number on its own; "zero five" is read as digits
+            if index == start:
+                value, end = 0, index + 1
+            break
+        if token in UNITS:
+            if previous not in (None, "tens", HUNDRED, THOUSAND, AND):
+                break
+            current += UNITS[token]
+            previous = "unit"
+        elif token in TEENS:
+            if previous not in (None, HUNDRED, THOUSAND, AND):
+                break
+            current += TEENS[token]
+            previous = "teen"
+        elif token in TENS:
+            if previous not in (None, HUNDRED, THOUSAND, AND):
+                break
+            current += TENS[token]
+            previous = "tens"
+        elif token == HUNDRED:
+            if previous not in (None, "unit") or current >= 10:
+                break
+            current = (current or 1) * 100
+            previous = HUNDRED
+        elif token == THOUSAND:
+            if total or previous in (THOUSAND, AND):
+                break
+            total = (current or 1) * 1000
+            current = 0
+            previous = THOUSAND
+        elif token == AND:
+            if previous not in (HUNDRED, THOUSAND):
+                break
+            previous = AND
+            continue  # Not a complete number until the next word arrives
+        else:
+            break
+        value, end = total + current, index + 1
+    return value, end
+
+def read_number(tokens, start=0, digits=True):
+    """Read the longest number starting at tokens[start]; returns (value, end) or (None, start)
+
+    With digits=False only compositional numbers are read, so "one two three" stays words.
+    """
+    if digits:
+        value, end = read_digits(tokens, start)
+        if value is not None:
+            return value, end
+    return read_compositional(tokens, start)
+
+def parse_number(text):
+    """Convert a digit string or spoken number to an integer, or None if it isn't one"""
+    tokens = text.lower().split()
+    if len(tokens) == 1 and tokens[0].isdigit():
+        return int(tokens[0])
+    value, end = read_number(tokens)
+    return value if tokens and end == len(tokens) else None
+
+def number_to_words(number):
+    """Spell out 0 <= number < 1,000,000 the way it is usually spoken ("four hundred twelve")"""
+    if number == 0:
+        return "zero"
+    names = {value: word for word, value in {**UNITS, **TEENS, **TENS}.items()}
+    words = []
+    thousands, rest = divmod(number, 1000)
+    if thousands:
+        words += [number_to_words(thousands), THOUSAND]
+    hundreds, rest = divmod(rest, 100)
+    if hundreds:
+        words += [names[hundreds], HUNDRED]
+    if rest >= 20:
+        words.append(names[rest - rest % 10])
+        rest %= 10
+    if rest:
+        words.append(names[rest])
+    return " ".join(words)
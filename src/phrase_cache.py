@@ -0,0 +1,155 @@
+"""Pre-rendered speech for GAIA
+
+Most spoken feedback is a small set of fixed phrases. Each phrase is rendered to a WAV file
+once with the TTS engine and then played straight from PCM through sounddevice, skipping
+synthesis. Files live under SPEECH_CACHE_DIR in a folder per voice/rate/volume, so changing
+the voice settings starts a fresh cache, and the least recently used files are evicted once
+there are more than SPEECH_CACHE_MAX_ENTRIES.
+"""
+
+import hashlib
+import os
+import threading
+import wave
+from collections import OrderedDict
+
+import sounddevice as sd
+
+# Rendered on first run so the usual feedback never waits for synthesis
+COMMON_PHRASES = [
+    "Voice control activated.",
+    "Increasing speed",
+    "Decreasing speed",
+    "Showing marks",
+    "Scrolling down slowly",
+    "Scrolling up slowly",
+    "Selecting downward",
+    "Selecting upward",
+    "Starting dictation.",
+    "Activated search bar",
+    "Are you sure you want to close this window?",
+    "All spots have been deleted.",
+    "Goodbye.",
+]
+PLAYBACK_CHUNK_SECONDS = 0.05  # Playback checks for an interrupt between chunks
+RENDER_PREFIX = "render-"  # Files still being written by the TTS engine
+SAMPLE_TYPES = {1: "uint8", 2: "int16", 4: "int32"}  # WAV sample width -> sounddevice dtype
+
+def voice_key(voice, rate, volume):
+    """Name of the cache folder for one voice/rate/volume setting"""
+    return hashlib.sha1(f"{voice}|{rate}|{volume}".encode("utf-8")).hexdigest()[:12]
+
+def phrase_file_name(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16] + ".wav"
+
+class PhraseCache:
+    """LRU cache of rendered phrases on disk, with their PCM loaded on first use"""
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # file name -> (pcm, rate, channels, width) or None until loaded
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "rendered": 0, "evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+
+        # File modification times carry the LRU order across runs
+        names = [name for name in os.listdir(directory) if name.endswith(".wav")]
+        for name in names:
+            if name.startswith(RENDER_PREFIX):
+                os.remove(os.path.join(directory, name))
+        names = [name for name in names if not name.startswith(RENDER_PREFIX)]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+        with self.lock:
+            for name in names:
+                self.entries[name] = None
+            self.evict_locked()
+
+    def __contains__(self, text):
+        with self.lock:
+            return phrase_file_name(text) in self.entries
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def get(self, text):
+        """Return the rendered audio for text, or None on a miss"""
+        name = phrase_file_name(text)
+        path = os.path.join(self.directory, name)
+        with self.lock:
+            if name not in self.entries:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(name)
+            audio = self.entries[name]
+        if audio is None:
+            try:
+                audio = self.load(path)
+            except Exception as e:
+                print(f"Dropping unreadable cached phrase {name}: {e}")
+                with self.lock:
+                    self.entries.pop(name, None)
+                    self.stats["misses"] += 1
+                self.remove_file(path)
+                return None
+        with self.lock:
+            if name in self.entries:
+                self.entries[name] = audio
+            self.stats["hits"] += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return audio
+
+    def load(self, path):
+        with wave.open(path, "rb") as f:
+            width = f.getsampwidth()
+            if width not in SAMPLE_TYPES:
+                raise ValueError(f"unsupported sample width {width}")
+            return f.readframes(f.getnframes()), f.getframerate(), f.getnchannels(), width
+
+    def render(self, engine, text):
+        """Render text to the cache with the TTS engine (call on the engine's thread)"""
+        name = phrase_file_name(text)
+        path = os.path.join(self.directory, name)
+        partial = os.path.join(self.directory, RENDER_PREFIX + name)
+        try:
+            engine.save_to_file(text, partial)
+            engine.runAndWait()
+            audio = self.load(partial)
+            os.replace(partial, path)
+        except Exception as e:
+            print(f"Could not render phrase '{text}': {e}")
+            self.remove_file(partial)
+            return False
+        with self.lock:
+            self.entries[name] = audio
+            self.entries.move_to_end(name)
+            self.stats["rendered"] += 1
+            self.evict_locked()
+        return True
+
+    def evict_locked(self):
+        while len(self.entries) > self.max_entries:
+            name, _ = self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+            self.remove_file(os.path.join(self.directory, name))
+
+    def remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def play(audio, should_stop):
+    """Play rendered audio; returns False if should_stop() cut it off"""
+    pcm, rate, channels, width = audio
+    chunk = int(rate * PLAYBACK_CHUNK_SECONDS) * channels * width
+    with sd.RawOutputStream(samplerate=rate, channels=channels, dtype=SAMPLE_TYPES[width]) as stream:
+        for start in range(0, len(pcm), chunk):
+            if should_stop():
+                return False
+            stream.write(pcm[start:start + chunk])
+    return True
@@ -0,0 +1,359 @@
+"""Speech recognition pipeline stage for GAIA"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+import config
+import command_handler
+from audio_buffer import AudioHistory
+from speech import get_audio_buffer, create_recognizer, get_model_pool, preload_models
+from spot_manager import add_spot_listener
+from grammar import (
+    build_command_grammar, build_early_dispatch_phrases, needs_free_form_decode, UNKNOWN_WORD
+)
+from vad import VoiceActivityGate
+from tracing import start_trace
+import rescoring
+import echo_control
+from model_pool import COMMAND_MODEL
+
+MAX_UTTERANCE_BLOCKS = 120  # Audio kept for free-form re-decoding (~30s at the default block size)
+PARTIAL = "partial"  # Trace slot of result queue items that are dictation partial results
+
+# Globals
+result_queue = queue.Queue()  # (text, trace) of finished utterances, and (text, PARTIAL) while dictating
+recognition_thread = None
+recognition_running = False
+free_form_recognizer = None  # Open-vocabulary recognizer used for dictation
+free_form_model = None  # Pool model the free-form recognizer was built on
+command_recognizer = None  # Grammar-limited recognizer used for commands
+wake_recognizer = None  # Wake-phrase-only recognizer used while asleep (the others are released)
+grammar_dirty = False  # Set when spots change so the command grammar gets rebuilt
+early_phrases = frozenset()  # Commands that may run from a partial result
+vad_gate = None  # Skips decoding of silent blocks when enabled
+utterance_blocks = deque(maxlen=MAX_UTTERANCE_BLOCKS)  # Audio of the utterance in progress
+audio_history = AudioHistory(int(config.AUDIO_HISTORY_SECONDS * 16000))  # Recent utterances, for "try again"
+
+# Per-utterance state (only touched by the recognition thread)
+dictating = False
+sleeping = False
+early_text = None  # Command already dispatched from a partial result of this utterance
+heard_at = None  # When the utterance first produced a partial result
+dispatched_at = None
+last_partial = ""  # Latest partial result sent while dictating
+captured_at = None  # perf_counter() capture time of the latest block read
+onset_at = None  # perf_counter() time the VAD gate opened for this utterance
+
+def start_recognition(recognizer):
+    """Start the recognition worker thread"""
+    global recognition_thread, recognition_running, free_form_recognizer, free_form_model, command_recognizer, vad_gate
+
+    free_form_recognizer = recognizer  # Moves to the dictation model by update_mode() once it's loaded
+    free_form_model = COMMAND_MODEL
+    command_recognizer = build_command_recognizer()
+    vad_gate = VoiceActivityGate() if config.VAD_ENABLED else None
+    add_spot_listener(on_spots_changed)
+    rescoring.index.build(build_command_grammar(include_spots=False))
+    add_spot_listener(rescoring.index.sync_spots)
+
+    recognition_running = True
+    recognition_thread = threading.Thread(target=recognition_worker, daemon=True)
+    recognition_thread.start()
+
+def build_command_recognizer():
+    """Create the recognizer used in command mode"""
+    global early_phrases
+    grammar = build_command_grammar()
+    early_phrases = build_early_dispatch_phrases(grammar)
+    if not config.USE_COMMAND_GRAMMAR:
+        # A separate open-vocabulary recognizer, so only command results come back as n-best
+        return create_recognizer(alternatives=config.COMMAND_ALTERNATIVES)
+    print(f"Command grammar built with {len(grammar)} phrases")
+    return create_recognizer(grammar, alternatives=config.COMMAND_ALTERNATIVES)
+
+def create_free_form_recognizer():
+    """Build the free-form recognizer on the dictation model once it's loaded; None until then"""
+    global free_form_model
+    pool = get_model_pool()
+    model_name = pool.resolve(config.DICTATION_MODEL)
+    if model_name == free_form_model:
+        return None
+    if not pool.is_loaded(model_name):
+        pool.preload([model_name])  # Load it in the background and switch over when it's ready
+        if free_form_model is not None:
+            return None
+        model_name = COMMAND_MODEL
+    free_form_model = model_name
+    return create_recognizer(model_name=model_name)
+
+def on_spots_changed(event, name):
+    """Mark the command grammar for rebuilding when spots are added, deleted or reset"""
+    global grammar_dirty
+    grammar_dirty = True
+
+def decode_free_form(blocks):
+    """Re-decode an utterance's audio with the open-vocabulary recognizer"""
+    for data in blocks:
+        free_form_recognizer.AcceptWaveform(data)
+    result = json.loads(free_form_recognizer.FinalResult())
+    return result.get("text", "").strip()
+
+def redecode_last_utterance():
+    """Decode the last utterance again on REDECODE_MODEL without the command grammar
+
+    Runs on the caller's thread with its own recognizer, so decoding carries on meanwhile.
+    Returns (text first heard, command now heard), or None if there is no utterance left to re-decode.
+    """
+    utterance = audio_history.last_utterance(exclude=command_handler.RETRY_PHRASES)
+    if utterance is None:
+        return None
+    audio, heard = utterance
+    recognizer = create_recognizer(alternatives=config.COMMAND_ALTERNATIVES, model_name=config.REDECODE_MODEL)
+    block_bytes = config.BLOCK_SIZE * 2
+    for start in range(0, len(audio), block_bytes):
+        recognizer.AcceptWaveform(audio[start:start + block_bytes])
+    return heard, rescoring.rescore(json.loads(recognizer.FinalResult()))
+
+def log_utterance_timing(text, heard, dispatched, final):
+    """Print per-utterance timing so the early dispatch savings can be measured"""
+    if heard is None:
+        return
+    dispatch_delay = dispatched - heard
+    final_delay = final - heard
+    print(f"Utterance timing '{text}': dispatched after {dispatch_delay:.3f}s, "
+          f"final after {final_delay:.3f}s (saved {final_delay - dispatch_delay:.3f}s)")
+
+def current_recognizer():
+    """Return the recognizer for the current mode"""
+    if sleeping:
+        return wake_recognizer
+    return free_form_recognizer if dictating else command_recognizer
+
+def update_sleep():
+    """Swap the full recognizers for the wake-phrase recognizer, or back"""
+    global sleeping, free_form_recognizer, command_recognizer, wake_recognizer, grammar_dirty
+    global dictating, early_text, heard_at, free_form_model
+
+    utterance_blocks.clear()
+    early_text = heard_at = None
+    if vad_gate is not None:
+        vad_gate.reset()
+    if command_handler.is_sleeping:
+        wake_recognizer = create_recognizer([config.WAKE_PHRASE, UNKNOWN_WORD])
+        # Drop the large decoders (grammar graph, lattices) and every model but the command model
+        free_form_recognizer = command_recognizer = None
+        free_form_model = None
+        get_model_pool().release()
+        sleeping = True
+        dictating = False  # Sleep always ends dictation
+        print("Recognizer asleep, listening for the wake phrase only")
+    else:
+        preload_models()  # Released while asleep
+        free_form_recognizer = create_free_form_recognizer()
+        command_recognizer = build_command_recognizer()
+        grammar_dirty = False
+        wake_recognizer = None
+        sleeping = False
+        print("Recognizer awake")
+
+def update_mode():
+    """Switch recognizers when dictation or sleep starts or stops, and rebuild a stale grammar between utterances"""
+    global dictating, command_recognizer, free_form_recognizer, grammar_dirty, early_text, heard_at, last_partial
+
+    if command_handler.is_sleeping != sleeping:
+        update_sleep()
+    if sleeping:
+        return
+
+    if command_handler.is_dictating != dictating:
+        current_recognizer().Reset()
+        dictating = command_handler.is_dictating
+        utterance_blocks.clear()
+        early_text = heard_at = None
+        last_partial = ""
+        print(f"Recognizer switched to {'dictation' if dictating else 'command'} mode")
+
+    # Rebuild the grammar between utterances so a half-decoded phrase is not lost
+    if grammar_dirty and not utterance_blocks:
+        grammar_dirty = False
+        command_recognizer = build_command_recognizer()
+
+    # Move dictation onto the dictation model once its background load has finished
+    if free_form_model != get_model_pool().resolve(config.DICTATION_MODEL) and not utterance_blocks:
+        recognizer = create_free_form_recognizer()
+        if recognizer is not None:
+            free_form_recognizer = recognizer
+            print(f"Free-form recognizer now uses the '{free_form_model}' model")
+
+def make_trace():
+    """Start the latency trace of an utterance whose result is ready"""
+    trace = start_trace()
+    if trace is not None:
+        if captured_at is not None:
+            trace.stamp("audio", captured_at)
+        if onset_at is not None:
+            trace.stamp("vad_onset", onset_at)
+        trace.stamp("final")
+    return trace
+
+def finish_utterance(recognizer, result):
+    """Handle a final recognizer result and queue the text for dispatch"""
+    global early_text, heard_at, onset_at, last_partial
+
+    if recognizer is command_recognizer:
+        # Pick the best valid command from the n-best alternatives, or reject the utterance
+        text = rescoring.rescore(result)
+    else:
+        text = result.get("text", "").strip()
+    final_at = time.time()
+
+    if recognizer is wake_recognizer and text != config.WAKE_PHRASE:
+        text = ""
+
+    if recognizer is command_recognizer and UNKNOWN_WORD in text:
+        if needs_free_form_decode(text):
+            text = decode_free_form(utterance_blocks)
+        else:
+            print(f"Ignored out-of-grammar speech: {text}")
+            text = ""
+
+    audio_history.end_utterance(text)
+    utterance_blocks.clear()
+    if early_text is not None:
+        # The action already ran from the partial result, so don't run it twice
+        if text != early_text:
+            print(f"Final result '{text}' differs from early dispatch '{early_text}'")
+        log_utterance_timing(early_text, heard_at, dispatched_at, final_at)
+    elif text or last_partial:
+        # While dictating, an empty final still has to undo what the partials typed
+        result_queue.put((text, make_trace()))
+        log_utterance_timing(text, heard_at, final_at, final_at)
+    early_text = heard_at = onset_at = None
+    last_partial = ""
+
+def discard_utterance(recognizer):
+    """Drop the utterance in progress without dispatching it, so a cut-off command doesn't run as its prefix"""
+    global early_text, heard_at, onset_at, last_partial
+    recognizer.Reset()
+    utterance_blocks.clear()
+    early_text = heard_at = onset_at = None
+    last_partial = ""
+
+def check_partial(recognizer):
+    """Track the utterance start and dispatch unambiguous commands from the partial result"""
+    global early_text, heard_at, dispatched_at
+
+    partial = json.loads(recognizer.PartialResult()).get("partial", "").strip()
+    if partial and heard_at is None:
+        heard_at = time.time()
+    if config.EARLY_COMMAND_DISPATCH and partial in early_phrases:
+        early_text = partial
+        dispatched_at = time.time()
+        result_queue.put((partial, make_trace()))
+        print(f"Early dispatch from partial result: {partial}")
+
+def send_partial(recognizer):
+    """Queue the dictation partial result when it changed, so stable words can be typed early"""
+    global last_partial
+
+    partial = json.loads(recognizer.PartialResult()).get("partial", "").strip()
+    if partial != last_partial:
+        last_partial = partial
+        result_queue.put((partial, PARTIAL))
+
+def decode_block(data):
+    """Feed one block of audio to the current recognizer"""
+    recognizer = current_recognizer()
+    if not utterance_blocks:
+        audio_history.start_utterance()
+    utterance_blocks.append(data)
+    audio_history.write(data)
+
+    if recognizer.AcceptWaveform(data):
+        finish_utterance(recognizer, json.loads(recognizer.Result()))
+    elif dictating:
+        send_partial(recognizer)
+    elif (config.EARLY_COMMAND_DISPATCH or config.LOG_UTTERANCE_TIMING) and early_text is None:
+        check_partial(recognizer)
+
+def recognition_worker():
+    """Dedicated thread that feeds every audio block to the recognizer as soon as it arrives"""
+    audio_buffer = get_audio_buffer()
+
+    global captured_at, onset_at
+
+    while recognition_running:
+        # Block until a full block of audio arrives, with timeout to check recognition_running periodically
+        data = audio_buffer.read(config.BLOCK_SIZE, timeout=0.1)
+        if data is None:
+            continue
+
+        try:
+            captured_at = audio_buffer.capture_time()
+            update_mode()
+
+            if config.ECHO_SUPPRESSION:
+                data = echo_control.filter_block(data, captured_at)
+                if data is None:
+                    # GAIA is talking over the operator, so the utterance in progress is cut off
+                    if utterance_blocks:
+                        recognizer = current_recognizer()
+                        if dictating and last_partial:
+                            # Its words are already typed; finalize them rather than leave them hanging
+                            finish_utterance(recognizer, json.loads(recognizer.FinalResult()))
+                        else:
+                            discard_utterance(recognizer)
+                    if vad_gate is not None:
+                        vad_gate.reset()
+                    continue
+
+            if vad_gate is None:
+                decode_block(data)
+                continue
+
+            was_active = vad_gate.active
+            blocks, ended = vad_gate.process(data)
+            if vad_gate.active and not was_active:
+                onset_at = time.perf_counter()
+            for block in blocks:
+                decode_block(block)
+            if ended and utterance_blocks:
+                # The gate closed before the recognizer endpointed, so flush what it has
+                recognizer = current_recognizer()
+                finish_utterance(recognizer, json.loads(recognizer.FinalResult()))
+        except Exception as e:
+            print(f"Error in recognition worker: {e}")
+
+def get_vad_stats():
+    """Return the voice activity gate's skipped/decoded block counters"""
+    if vad_gate is None:
+        return None
+    return vad_gate.get_stats()
+
+def get_audio_stats():
+    """Return the audio buffer's overrun and backlog metrics"""
+    return get_audio_buffer().get_stats()
+
+def stop_recognition():
+    """Stop the recognition worker thread"""
+    global recognition_running
+    recognition_running = False
+    if recognition_thread:
+        recognition_thread.join(timeout=1.0)
+    stats = get_vad_stats()
+    if stats:
+        print(f"VAD: {stats['blocks_skipped']} blocks skipped, {stats['blocks_decoded']} blocks decoded")
+    audio_stats = get_audio_stats()
+    print(f"Audio buffer: {audio_stats['overruns']} overruns, {audio_stats['samples_dropped']} samples dropped")
+    print(f"Rescoring: {rescoring.get_stats()}")
+    print(f"Echo suppression: {echo_control.get_stats()}")
+    model_pool = get_model_pool()
+    if model_pool is not None:  # With DECODER_PROCESS the models live in the child
+        print(f"Models: {model_pool.get_stats()}")
+
+def get_result_queue():
+    """Access to the queue of recognized utterances"""
+    return result_queue
@@ -0,0 +1,333 @@
+"""
+Offline replay harness for GAIA.
+Feeds WAV files through the recognition and dispatch pipeline with the recording
+input backend and stand-ins for pyautogui and pyperclip, and reports per-utterance latency.
+The Tk UI and TTS worker are never started, so UI actions and speech stay queued.
+
+Usage:
+    python src/replay.py <wav file or directory> [--speed realtime|max] [--json report.json] [--sleep-cpu]
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+BLOCK_SIZE = 4000  # Matches config.BLOCK_SIZE; config is only imported after the stand-ins are installed
+SAMPLE_RATE = 16000
+PARTIAL = "partial"  # Matches recognition.PARTIAL
+
+class RecordingInput:
+    """Stand-in for pyautogui/pyperclip that records every call with a timestamp"""
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []  # (timestamp, function name, args)
+        self.lock = threading.Lock()
+        self.FAILSAFE = False
+        self.PAUSE = 0
+        self.clipboard = ""
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+
+        def record(*args, **kwargs):
+            with self.lock:
+                self.events.append((time.perf_counter(), attr, args))
+            if attr == "position":
+                return (0, 0)
+            if attr == "size":
+                return (1920, 1080)
+            if attr == "copy":
+                self.clipboard = args[0] if args else ""
+            if attr == "paste":
+                return self.clipboard
+            return None
+        return record
+
+    def events_since(self, since):
+        """Return the recorded events at or after a timestamp"""
+        with self.lock:
+            return [event for event in self.events if event[0] >= since]
+
+class StampedQueue(queue.Queue):
+    """Result queue that records when each utterance was put on it"""
+
+    def __init__(self):
+        super().__init__()
+        self.stamps = queue.Queue()
+
+    def put(self, item, block=True, timeout=None):
+        if item[1] != PARTIAL:
+            self.stamps.put((time.perf_counter(), item))
+        super().put(item, block, timeout)
+
+def install_stand_ins():
+    """Replace the desktop-facing modules before any GAIA module imports them"""
+    fake_pyautogui = RecordingInput("pyautogui")
+    fake_pyperclip = RecordingInput("pyperclip")
+    sys.modules["pyautogui"] = fake_pyautogui
+    sys.modules["pyperclip"] = fake_pyperclip
+    return fake_pyautogui, fake_pyperclip
+
+def read_wav(path):
+    """Read a 16 kHz mono 16-bit WAV file and return its raw frames"""
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected 16 kHz mono 16-bit PCM")
+        return wav.readframes(wav.getnframes())
+
+def collect_wavs(path):
+    """Return the WAV files to replay, one utterance each when given a directory"""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".wav")
+        )
+    return [path]
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+class ReplayHarness:
+    """Drives the GAIA pipeline from WAV files instead of the microphone"""
+
+    def __init__(self, realtime=True, pad_seconds=1.0, result_timeout=5.0):
+        self.realtime = realtime
+        self.pad_seconds = pad_seconds
+        self.result_timeout = result_timeout
+        self.fake_pyautogui, self.fake_pyperclip = install_stand_ins()
+        self.command_entries = queue.Queue()  # (timestamp, command text)
+
+    def start(self, spots_file=None):
+        """Import and start the pipeline with recording stand-ins"""
+        import config
+        # Never touch the operator's real spots while replaying
+        config.SPOTS_FILE = spots_file or os.path.join(tempfile.mkdtemp(), "spots.json")
+
+        import speech
+        import recognition
+        import gaia
+        import tracing
+        import input_backend
+        import text_injection
+
+        self.tracing = tracing
+        self.input = input_backend.RecordingBackend()
+        input_backend.set_backend(self.input)
+        text_injection.set_clipboard(text_injection.PyperclipClipboard())
+
+        self.speech = speech
+        self.recognition = recognition
+        self.gaia = gaia
+        self.command_handler = gaia.command_handler
+
+        # Record command entry before the real handler runs
+        real_handle_command = gaia.handle_command
+
+        def traced_handle_command(command):
+            self.command_entries.put((time.perf_counter(), command))
+            return real_handle_command(command)
+
+        gaia.handle_command = traced_handle_command
+        recognition.result_queue = StampedQueue()
+
+        recognizer = speech.initialize_recognizer()
+        recognition.start_recognition(recognizer)
+        gaia.start_dispatch()
+
+    def stop(self):
+        """Stop the pipeline threads"""
+        self.recognition.stop_recognition()
+        self.gaia.shutdown_dispatch()
+
+    def feed(self, frames):
+        """Feed raw audio through audio_callback block by block"""
+        audio_buffer = self.speech.get_audio_buffer()
+        block_bytes = BLOCK_SIZE * 2
+        for offset in range(0, len(frames), block_bytes):
+            block = frames[offset:offset + block_bytes]
+            if len(block) < block_bytes:
+                block = block + b"\x00" * (block_bytes - len(block))
+            if self.realtime:
+                time.sleep(BLOCK_SIZE / SAMPLE_RATE)
+            else:
+                # At maximum speed, wait for the decoder instead of overflowing the ring buffer
+                while audio_buffer.backlog_samples() > audio_buffer.capacity - BLOCK_SIZE:
+                    time.sleep(0.001)
+            self.speech.audio_callback(block, BLOCK_SIZE, None, None)
+
+    def wait_for(self, source, timeout):
+        """Wait for the next stamped item from a queue"""
+        try:
+            return source.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def replay_utterance(self, path):
+        """Replay one WAV file and measure its latency breakdown"""
+        frames = read_wav(path)
+        self.feed(frames)
+        audio_end = time.perf_counter()
+        self.feed(b"\x00" * int(self.pad_seconds * SAMPLE_RATE) * 2)
+
+        record = {"file": os.path.basename(path), "audio_seconds": len(frames) / 2 / SAMPLE_RATE}
+        stamped = self.wait_for(self.recognition.result_queue.stamps, self.result_timeout)
+        if stamped is None:
+            record["text"] = None
+            return record
+        result_time, (text, trace) = stamped
+        record["text"] = text
+        record["audio_end_to_result"] = result_time - audio_end
+
+        entry = self.wait_for(self.command_entries, 1.0)
+        if entry is None:
+            return record
+        entry_time = entry[0]
+        record["result_to_entry"] = entry_time - result_time
+
+        # Give the command thread a moment to inject its first input event
+        deadline = time.perf_counter() + 1.0
+        while time.perf_counter() < deadline:
+            events = self.input.events_since(entry_time)
+            if events:
+                first = events[0]
+                record["entry_to_first_input"] = first[0] - entry_time
+                record["first_input"] = first[1]
+                break
+            time.sleep(0.001)
+        return record
+
+    def measure_cpu(self, paths):
+        """Feed every file without waiting for results and return the CPU time the pipeline used"""
+        audio_buffer = self.speech.get_audio_buffer()
+        pad = b"\x00" * int(self.pad_seconds * SAMPLE_RATE) * 2
+        audio_seconds = 0.0
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        for path in paths:
+            frames = read_wav(path)
+            self.feed(frames)
+            self.feed(pad)
+            audio_seconds += (len(frames) + len(pad)) / 2 / SAMPLE_RATE
+        while audio_buffer.backlog_samples() >= BLOCK_SIZE:
+            time.sleep(0.001)
+        cpu_seconds = time.process_time() - cpu_started
+        wall_seconds = time.perf_counter() - wall_started
+        return {
+            "audio_seconds": audio_seconds,
+            "cpu_seconds": cpu_seconds,
+            "cpu_percent": 100 * cpu_seconds / wall_seconds if wall_seconds else None,
+            "cpu_per_audio_second": cpu_seconds / audio_seconds if audio_seconds else None,
+        }
+
+    def compare_sleep_cpu(self, paths):
+        """Measure CPU use on the same audio awake and asleep"""
+        awake = self.measure_cpu(paths)
+        self.command_handler.go_to_sleep(reason="replay")
+        # The recognizer switches on the next block it reads
+        self.feed(b"\x00" * BLOCK_SIZE * 2)
+        asleep = self.measure_cpu(paths)
+        self.command_handler.wake_up()
+        self.feed(b"\x00" * BLOCK_SIZE * 2)
+        return {"awake": awake, "asleep": asleep}
+
+    def run(self, paths):
+        """Replay every file and return the per-utterance records and summary"""
+        started = time.perf_counter()
+        records = [self.replay_utterance(path) for path in paths]
+        wall_seconds = time.perf_counter() - started
+        audio_seconds = sum(record["audio_seconds"] for record in records)
+        summary = {
+            "utterances": len(records),
+            "recognized": sum(1 for record in records if record.get("text")),
+            "wall_seconds": wall_seconds,
+            "audio_seconds": audio_seconds,
+            "utterances_per_second": len(records) / wall_seconds if wall_seconds else None,
+            "realtime_factor": audio_seconds / wall_seconds if wall_seconds else None,
+        }
+        for stage in ("audio_end_to_result", "result_to_entry", "entry_to_first_input"):
+            values = [record[stage] for record in records if stage in record]
+            if values:
+                summary[stage] = {
+                    "mean": statistics.mean(values),
+                    "p50": percentile(values, 0.50),
+                    "p95": percentile(values, 0.95),
+                    "max": max(values),
+                }
+        return records, summary
+
+def print_report(records, summary):
+    """Print the per-utterance breakdown and the batch summary"""
+    def ms(value):
+        return f"{value * 1000:8.1f}" if value is not None else "       -"
+
+    print(f"{'file':30} {'result':>8} {'entry':>8} {'input':>8}  text")
+    for record in records:
+        print(f"{record['file'][:30]:30} {ms(record.get('audio_end_to_result'))} "
+              f"{ms(record.get('result_to_entry'))} {ms(record.get('entry_to_first_input'))}  "
+              f"{record.get('text')}")
+    print(f"\n{summary['recognized']}/{summary['utterances']} utterances recognized in "
+          f"{summary['wall_seconds']:.2f}s ({summary['realtime_factor']:.2f}x real time, "
+          f"{summary['utterances_per_second']:.2f} utterances/s)")
+    for stage in ("audio_end_to_result", "result_to_entry", "entry_to_first_input"):
+        if stage in summary:
+            stats = summary[stage]
+            print(f"{stage:22} mean {stats['mean'] * 1000:.1f} ms, p50 {stats['p50'] * 1000:.1f} ms, "
+                  f"p95 {stats['p95'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms")
+
+def print_cpu_report(cpu):
+    """Print CPU use awake and asleep"""
+    for state in ("awake", "asleep"):
+        stats = cpu[state]
+        print(f"CPU {state:6} {stats['cpu_seconds']:.2f}s for {stats['audio_seconds']:.1f}s of audio "
+              f"({stats['cpu_percent']:.1f}% of one core, {stats['cpu_per_audio_second']:.3f} CPU s per audio s)")
+
+def main():
+    """Command line entry point for the replay harness"""
+    parser = argparse.ArgumentParser(description="Replay WAV files through the GAIA pipeline")
+    parser.add_argument("path", help="WAV file or directory of utterance WAV files")
+    parser.add_argument("--speed", choices=["realtime", "max"], default="realtime",
+                        help="Feed audio at real-time pace or as fast as the decoder keeps up")
+    parser.add_argument("--pad-seconds", type=float, default=1.0,
+                        help="Silence appended after each utterance so the recognizer endpoints")
+    parser.add_argument("--spots", help="spots.json to load instead of an empty temporary one")
+    parser.add_argument("--json", help="Write the records and summary to this file")
+    parser.add_argument("--sleep-cpu", action="store_true",
+                        help="Also replay the files awake and asleep without waiting for results and compare CPU use")
+    parser.add_argument("--latency-report", metavar="PATH",
+                        help="Write the per-command latency percentiles from the tracing layer to PATH")
+    args = parser.parse_args()
+
+    harness = ReplayHarness(realtime=args.speed == "realtime", pad_seconds=args.pad_seconds)
+    harness.start(spots_file=args.spots)
+    paths = collect_wavs(args.path)
+    try:
+        records, summary = harness.run(paths)
+        if args.sleep_cpu:
+            summary["cpu"] = harness.compare_sleep_cpu(paths)
+    finally:
+        harness.stop()
+
+    print_report(records, summary)
+    if args.sleep_cpu:
+        print_cpu_report(summary["cpu"])
+    if args.latency_report:
+        harness.tracing.dump_report(args.latency_report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"records": records, "summary": summary}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Streaming polyphase resampler for GAIA
+
+Microphones are opened at their native rate (often 44.1 or 48 kHz) and converted to the
+16 kHz the recognizer expects here rather than by the host audio stack. The conversion is a
+rational up/down polyphase FIR: a Kaiser-windowed sinc low-pass split into one short filter
+per phase, applied to every output sample of a block at once with numpy. The last few input
+samples and the output position carry over between blocks, so block boundaries leave no
+clicks or drift.
+"""
+
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ZERO_CROSSINGS = 16  # Sinc lobes kept on each side of the filter centre, at the lower of the two rates
+KAISER_BETA = 8.0  # Stopband attenuation of the window (~80 dB)
+ROLLOFF = 0.9  # Filter cutoff (-6 dB) as a fraction of the lower Nyquist frequency
+
+def taps_per_phase(up, down, zero_crossings=ZERO_CROSSINGS):
+    """Input samples each output sample is computed from"""
+    return -(-2 * zero_crossings * max(up, down) // up)
+
+def design_filter(up, down, taps):
+    """Low-pass prototype for resampling by up/down, at the upsampled rate"""
+    length = up * taps
+    cutoff = ROLLOFF * 0.5 / max(up, down)  # Cycles per upsampled sample
+    n = np.arange(length) - (length - 1) / 2
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    return prototype * (up / prototype.sum())  # Unity gain after zero-stuffing
+
+class PolyphaseResampler:
+    """Converts a stream of int16 blocks from input_rate to output_rate"""
+
+    def __init__(self, input_rate, output_rate=16000, zero_crossings=ZERO_CROSSINGS):
+        divisor = gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        self.taps = taps_per_phase(self.up, self.down, zero_crossings)
+        prototype = design_filter(self.up, self.down, self.taps)
+        # bank[phase] holds taps phase, phase + up, ...; reversed to line up with oldest-first windows
+        self.bank = np.ascontiguousarray(prototype.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)  # Input carried into the next block
+        self.consumed = 0  # Input samples seen
+        self.produced = 0  # Output samples returned
+
+    def process(self, samples):
+        """Resample one block of int16 samples; the output length varies by a sample between blocks"""
+        signal = np.concatenate((self.history, samples.astype(np.float32)))
+        first_input = self.consumed  # Absolute index of samples[0]
+        self.consumed += len(samples)
+
+        # Output k is computed from input floor(k * down / up) and the taps - 1 samples before it
+        end = (self.consumed * self.up + self.down - 1) // self.down
+        positions = np.arange(self.produced, end) * self.down
+        self.produced = end
+        windows = sliding_window_view(signal, self.taps)[positions // self.up - first_input]
+        output = np.einsum("ij,ij->i", windows, self.bank[positions % self.up])
+
+        self.history = signal[len(signal) - len(self.history):].copy()
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16)
+
+    def reset(self):
+        """Forget the carried-over input, e.g. after switching devices"""
+        self.history[:] = 0
+        self.consumed = self.produced = 0
@@ -0,0 +1,210 @@
+"""N-best rescoring of command hypotheses for GAIA
+
+The command recognizer returns several alternatives. Each one is checked against an index of
+valid command words and spot names: words one edit away from a command word are corrected
+("to down" -> "two down", "mark deleted foo" -> "mark delete foo") at a score penalty, and the
+result must resolve to a real command. A correction is scaled by the share of words that were
+heard as they are, so a hypothesis with every word corrected ("exits" -> "exit") can't clear
+the threshold, and destructive commands are never the result of a correction. A free-text
+command ("type ...", "mark <name>") is only replaced by a correction that turns it into a fully
+indexed command. The best valid candidate runs if its score clears RESCORE_MIN_CONFIDENCE;
+otherwise the utterance is rejected.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import Counter
+
+import config
+import command_handler
+from grammar import UNKNOWN_WORD, needs_free_form_decode
+from spot_manager import get_spots
+from tracing import LatencyHistogram
+from command_registry import PREFIX
+
+# Hypothesis classes
+COMMAND = "command"  # Resolves to a command whose every word is in the index
+FREE_TEXT = "free_text"  # Resolves to a command that takes arbitrary text
+
+def deletion_variants(word):
+    """The word and every string made by deleting one of its characters"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def within_one_edit(a, b):
+    """Whether two words differ by at most one insertion, deletion or substitution"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    for i in range(len(a)):
+        if a[i] != b[i]:
+            if len(a) == len(b):
+                return a[i + 1:] == b[i + 1:]
+            return a[i:] == b[i + 1:]
+    return True
+
+class CommandIndex:
+    """Vocabulary of valid command words with a deletion index for one-edit lookups"""
+
+    def __init__(self):
+        self.counts = Counter()  # word -> number of phrases/spots using it
+        self.variants = {}  # deletion variant -> words it came from
+        self.spot_names = set()  # Spot names whose words are in the index
+        self.lock = threading.Lock()
+
+    def add_words(self, words):
+        for word in words:
+            self.counts[word] += 1
+            if self.counts[word] == 1:
+                for variant in deletion_variants(word):
+                    self.variants.setdefault(variant, set()).add(word)
+
+    def remove_words(self, words):
+        for word in words:
+            self.counts[word] -= 1
+            if self.counts[word] <= 0:
+                del self.counts[word]
+                for variant in deletion_variants(word):
+                    sources = self.variants.get(variant)
+                    if sources is not None:
+                        sources.discard(word)
+                        if not sources:
+                            del self.variants[variant]
+
+    def build(self, phrases):
+        """Index every word of the command phrases (spot names are tracked separately)"""
+        with self.lock:
+            self.counts.clear()
+            self.variants.clear()
+            self.spot_names.clear()
+            vocabulary = {word for phrase in phrases for word in phrase.split() if word != UNKNOWN_WORD}
+            self.add_words(vocabulary)
+        self.sync_spots()
+
+    def sync_spots(self, event=None, name=None):
+        """Add and remove the words of spots that changed since the last sync"""
+        current = set(get_spots())
+        with self.lock:
+            for removed in self.spot_names - current:
+                self.remove_words(removed.split())
+            for added in current - self.spot_names:
+                self.add_words(added.split())
+            self.spot_names = current
+
+    def corrections(self, word):
+        """Return the index words within one edit of word, the word itself first if it is one"""
+        with self.lock:
+            candidates = set()
+            for variant in deletion_variants(word):
+                candidates.update(self.variants.get(variant, ()))
+            known = word in self.counts
+        candidates.discard(word)
+        neighbors = sorted(candidate for candidate in candidates if within_one_edit(word, candidate))
+        return [word] + neighbors if known else neighbors
+
+# Globals
+index = CommandIndex()
+timings = LatencyHistogram()
+rescore_stats = {"accepted": 0, "corrected": 0, "rejected": 0}
+
+def classify(text):
+    """Return COMMAND, FREE_TEXT or None (not a command) for a hypothesis"""
+    if text in command_handler.CONFIRMATION_WORDS:
+        return COMMAND
+    if needs_free_form_decode(text):
+        return FREE_TEXT  # Its words are heard again without the grammar
+    resolved = command_handler.registry.resolve(text)
+    if resolved is None:
+        return None
+    entry, args = resolved
+    if entry.kind == PREFIX:
+        if entry.key.strip() in command_handler.SPOT_COMMAND_PREFIXES:
+            return COMMAND if args and args[0] in get_spots() else None
+        return FREE_TEXT
+    return COMMAND
+
+def word_confidence(result):
+    """Lowest per-word confidence of a result, or 1.0 if Vosk didn't report any"""
+    confs = [word["conf"] for word in result.get("result") or [] if "conf" in word]
+    return min(confs) if confs else 1.0
+
+def alternatives_of(result):
+    """Return [(text, posterior, word confidence)] from a Vosk result with or without n-best"""
+    alternatives = result.get("alternatives")
+    if not alternatives:
+        return [(result.get("text", "").strip(), 1.0, word_confidence(result))]
+
+    # Alternative confidences are log-domain scores; normalize them into posteriors
+    scores = [alt.get("confidence", 0.0) * config.RESCORE_CONFIDENCE_SCALE for alt in alternatives]
+    top = max(scores)
+    weights = [math.exp(score - top) for score in scores]
+    total = sum(weights)
+    return [
+        (alt.get("text", "").strip(), weight / total, word_confidence(alt))
+        for alt, weight in zip(alternatives, weights)
+    ]
+
+def best_variant(text):
+    """Return (valid text, number of corrected words) for a hypothesis, or None"""
+    kind = classify(text) if text else None
+    if kind == COMMAND:
+        return text, 0
+    as_is = (text, 0) if kind == FREE_TEXT else None
+    words = text.split()
+    if not words or UNKNOWN_WORD in words:
+        return as_is
+    options = [index.corrections(word) for word in words]
+    if not all(options):
+        return as_is
+    for variant in itertools.islice(itertools.product(*options), config.RESCORE_MAX_VARIANTS):
+        candidate = " ".join(variant)
+        if candidate in command_handler.DESTRUCTIVE_COMMANDS:
+            continue  # Only run when heard exactly
+        if candidate != text and classify(candidate) == COMMAND:
+            return candidate, sum(1 for a, b in zip(words, variant) if a != b)
+    return as_is
+
+def rescore(result):
+    """Pick the command to run from a recognizer result; returns "" to reject the utterance"""
+    started = time.perf_counter()
+    alternatives = alternatives_of(result)
+    top_text = alternatives[0][0]
+
+    best = None  # (score, text)
+    for text, posterior, word_conf in alternatives:
+        found = best_variant(text)
+        if found is None:
+            continue
+        candidate, edits = found
+        # Corrections are only as good as the words around them that were heard exactly
+        heard_share = 1 - edits / len(candidate.split())
+        score = posterior * word_conf * config.RESCORE_EDIT_PENALTY ** edits * heard_share
+        if best is None or score > best[0]:
+            best = (score, candidate)
+
+    timings.record(time.perf_counter() - started)
+    if best is None:
+        # Nothing valid: leave the top hypothesis to the [unk] and unknown-command handling
+        return top_text
+
+    score, text = best
+    if score < config.RESCORE_MIN_CONFIDENCE:
+        rescore_stats["rejected"] += 1
+        print(f"Rejected low-confidence command '{text}' (score {score:.2f}, heard '{top_text}')")
+        return ""
+    if text != top_text:
+        rescore_stats["corrected"] += 1
+        print(f"Rescored '{top_text}' -> '{text}' (score {score:.2f})")
+    else:
+        rescore_stats["accepted"] += 1
+    return text
+
+def get_stats():
+    """Return rescoring counters and timing in milliseconds"""
+    stats = dict(rescore_stats)
+    if timings.total:
+        stats["p50_ms"] = round(timings.percentile(50) * 1000, 3)
+        stats["max_ms"] = round(timings.max_us / 1000, 3)
+    return stats
@@ -1,18 +1,56 @@
-"""Speech recognition and TTS functionality"""
+"""Speech recognition and TTS functionality
 
-import queue
+Spoken feedback goes through a priority queue: urgent prompts are spoken before routine
+feedback, a message with a key replaces a pending message with the same key ("Speed 3.0" is
+superseded by "Speed 5.0"), and messages that waited longer than their time to live are
+dropped instead of being spoken late. Phrases that were rendered before are played from the
+phrase cache; the rest are synthesized live and rendered for next time while the queue is idle.
+"""
+
+import heapq
+import itertools
+import json
 import threading
+import os
+import time
+from collections import deque
 import pyttsx3
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 
 import config
+from audio_buffer import AudioRingBuffer
+from tracing import LatencyHistogram
+from phrase_cache import COMMON_PHRASES, PhraseCache, play, voice_key
+import echo_control
+from model_pool import COMMAND_MODEL, ModelPool
+
+# Speech priorities, lowest spoken first
+URGENT = 0
+NORMAL = 1
+LOW = 2
 
 # Globals
-audio_queue = queue.Queue()
-speech_queue = queue.Queue()  # Queue for text to be spoken
+audio_buffer = AudioRingBuffer(
+    int(config.AUDIO_BUFFER_SECONDS * 16000),
+    sample_rate=16000,
+    overflow_policy=config.AUDIO_OVERFLOW_POLICY
+)
+speech_pending = []  # Heap of [priority, sequence, text, key, queued_at, expires_at]; text is None once replaced
+pending_by_key = {}  # key -> pending heap entry with that key
+pending_count = 0  # Heap entries still to be spoken
+speech_ready = threading.Condition()  # Guards the pending messages and current_message
+speech_sequence = itertools.count()  # Keeps messages of equal priority in order
+current_message = None  # Entry being spoken
+speech_latency = LatencyHistogram()  # Queued until spoken
+speech_stats = {"spoken": 0, "coalesced": 0, "expired": 0, "interrupted": 0, "max_depth": 0}
 speech_thread = None
 speech_running = False
 engine = None  # Will be initialized in speech worker thread
+phrase_cache = None  # Rendered phrases for this voice, created by the speech worker
+render_queue = deque(maxlen=config.SPEECH_CACHE_MAX_ENTRIES)  # Phrases to render when idle
+playback_stop = threading.Event()  # Cuts off cached playback
+model_pool = None  # Vosk models by name, each shared by all recognizers built on it
+shutdown_hooks = []  # Extra cleanup run by shutdown_speech (e.g. the decoder process)
 
 def initialize_speech():
     """Start the speech worker thread"""
@@ -22,14 +60,71 @@ def initialize_speech():
     speech_thread = threading.Thread(target=speech_worker, daemon=True)
     speech_thread.start()
 
-def speak(text):
-    """Queue text to be spoken"""
-    speech_queue.put(text)
+def speak(text, priority=NORMAL, key=None, ttl=None, interrupt=False):
+    """Queue text to be spoken
+
+    A message with a key replaces the pending message with the same key and cuts it off if it
+    is being spoken. Messages not spoken within ttl seconds (SPEECH_TTL by default) are dropped.
+    interrupt=True cuts off the current utterance so the queue moves straight on.
+    """
+    global pending_count
+    now = time.perf_counter()
+    ttl = config.SPEECH_TTL if ttl is None else ttl
+    entry = [priority, next(speech_sequence), text, key, now, now + ttl]
+    with speech_ready:
+        if key is not None:
+            previous = pending_by_key.get(key)
+            if previous is not None:
+                previous[2] = None
+                pending_count -= 1
+                speech_stats["coalesced"] += 1
+            pending_by_key[key] = entry
+            if current_message is not None and current_message[3] == key:
+                interrupt = True
+        heapq.heappush(speech_pending, entry)
+        pending_count += 1
+        speech_stats["max_depth"] = max(speech_stats["max_depth"], pending_count)
+        if interrupt:
+            interrupt_locked()
+        speech_ready.notify()
     print(f"Queued speech: '{text}'")
 
+def interrupt_speech():
+    """Cut off the utterance being spoken"""
+    with speech_ready:
+        interrupt_locked()
+
+def interrupt_locked():
+    if current_message is not None and engine is not None:
+        speech_stats["interrupted"] += 1
+        playback_stop.set()
+        engine.stop()
+
+def next_message(timeout):
+    """Take the most urgent message that is still worth speaking, or None after timeout"""
+    global current_message, pending_count
+    with speech_ready:
+        if not speech_ready.wait_for(lambda: pending_count > 0, timeout):
+            return None
+        now = time.perf_counter()
+        while speech_pending:
+            entry = heapq.heappop(speech_pending)
+            if entry[2] is None:
+                continue  # Replaced by a newer message with the same key
+            pending_count -= 1
+            if pending_by_key.get(entry[3]) is entry:
+                del pending_by_key[entry[3]]
+            if now > entry[5]:
+                speech_stats["expired"] += 1
+                print(f"Dropped stale speech: '{entry[2]}'")
+                continue
+            current_message = entry
+            return entry
+        return None
+
 def speech_worker():
     """Dedicated thread for speech synthesis"""
-    global engine, speech_running
+    global engine, speech_running, current_message
     
     # Initialize TTS engine in this thread
     try:
@@ -79,47 +174,137 @@ def speech_worker():
     except Exception as e:
         print(f"Error initializing TTS engine: {e}")
         return
+
+    if config.SPEECH_CACHE_ENABLED:
+        open_phrase_cache(selected_voice)
     
     speech_running = True
     
     while speech_running:
-        try:
-            # Get text to speak with timeout to check speech_running periodically
-            text = speech_queue.get(timeout=0.5)
-            print(f"Speaking: '{text}'")
-            
-            # Process the speech
-            engine.say(text)
-            engine.runAndWait()
-            
-            # Mark task as done
-            speech_queue.task_done()
-            
-        except queue.Empty:
-            # No speech to process, continue waiting
+        # Time out periodically to check speech_running
+        entry = next_message(timeout=0.5)
+        if entry is None:
+            render_next_phrase()
             continue
+        text = entry[2]
+        speech_latency.record(time.perf_counter() - entry[4])
+        speech_stats["spoken"] += 1
+        print(f"Speaking: '{text}'")
+        try:
+            say(text)
         except Exception as e:
             print(f"Error in speech worker: {e}")
+        finally:
+            with speech_ready:
+                current_message = None
+
+def open_phrase_cache(voice):
+    """Open the phrase cache for the engine's current voice settings and queue missing common phrases"""
+    global phrase_cache
+    key = voice_key(voice, engine.getProperty('rate'), engine.getProperty('volume'))
+    try:
+        phrase_cache = PhraseCache(os.path.join(config.SPEECH_CACHE_DIR, key), config.SPEECH_CACHE_MAX_ENTRIES)
+    except Exception as e:
+        print(f"Phrase cache unavailable, synthesizing all speech live: {e}")
+        return
+    render_queue.extend(phrase for phrase in COMMON_PHRASES if phrase not in phrase_cache)
+    print(f"Phrase cache: {len(phrase_cache)} phrases, {len(render_queue)} to render")
+
+def say(text):
+    """Play text from the phrase cache, or synthesize it live and render it for next time"""
+    audio = phrase_cache.get(text) if phrase_cache is not None else None
+    if audio is not None:
+        playback_stop.clear()
+        # Recognition ignores (or echo-cancels) the microphone while this plays
+        interval = echo_control.playback_started(audio)
+        try:
+            play(audio, playback_stop.is_set)
+            return
+        except Exception as e:
+            print(f"Cached playback failed, synthesizing live: {e}")
+        finally:
+            echo_control.playback_finished(interval)
+    interval = echo_control.playback_started()
+    try:
+        engine.say(text)
+        engine.runAndWait()
+    finally:
+        echo_control.playback_finished(interval)
+    if phrase_cache is not None and text not in render_queue:
+        render_queue.append(text)
+
+def render_next_phrase():
+    """Render one queued phrase into the cache (runs on the speech thread while it's idle)"""
+    if phrase_cache is None or not render_queue:
+        return
+    text = render_queue.popleft()
+    if text not in phrase_cache:
+        phrase_cache.render(engine, text)
+
+def get_speech_stats():
+    """Return queue depth, coalescing/drop counters and queued-to-spoken latency in milliseconds"""
+    with speech_ready:
+        stats = dict(speech_stats, depth=pending_count)
+    if speech_latency.total:
+        stats["p50_ms"] = round(speech_latency.percentile(50) * 1000, 3)
+        stats["p95_ms"] = round(speech_latency.percentile(95) * 1000, 3)
+        stats["max_ms"] = round(speech_latency.max_us / 1000, 3)
+    if phrase_cache is not None:
+        stats["cache"] = dict(phrase_cache.stats, size=len(phrase_cache))
+    return stats
+
+def add_shutdown_hook(callback):
+    """Register a callback run when speech resources are cleaned up"""
+    shutdown_hooks.append(callback)
 
 def shutdown_speech():
     """Clean up speech resources"""
     global speech_running
     speech_running = False
+    print(f"Speech: {get_speech_stats()}")
+    for callback in shutdown_hooks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in speech shutdown hook: {e}")
     if speech_thread:
         speech_thread.join(timeout=1.0)
 
 def initialize_recognizer():
-    """Initialize the speech recognition model"""
-    model = Model(config.MODEL_PATH)
-    recognizer = KaldiRecognizer(model, 16000)
+    """Load the command model, start loading the others in the background and create the free-form recognizer"""
+    global model_pool
+    model_pool = ModelPool(config.MODEL_PATHS, config.MODEL_MEMORY_BUDGET_MB * 2**20)
+    model_pool.get(COMMAND_MODEL)
+    preload_models()
+    recognizer = create_recognizer()
+    return recognizer
+
+def preload_models():
+    """Start loading the dictation and re-decode models so neither is loaded on first use"""
+    model_pool.preload([*config.PRELOAD_MODELS, config.REDECODE_MODEL])
+
+def get_model_pool():
+    """Access to the loaded Vosk models"""
+    return model_pool
+
+def create_recognizer(grammar=None, alternatives=0, model_name=COMMAND_MODEL):
+    """Create a recognizer on a pooled model, optionally limited to a list of phrases and returning n-best results"""
+    model = model_pool.get(model_name)
+    if grammar is None:
+        recognizer = KaldiRecognizer(model, 16000)
+    else:
+        recognizer = KaldiRecognizer(model, 16000, json.dumps(grammar))
+    if alternatives:
+        recognizer.SetMaxAlternatives(alternatives)
+        recognizer.SetWords(True)
     return recognizer
 
 def audio_callback(indata, frames, time, status):
     """Callback for audio stream data"""
     if status:
         print(status)
-    audio_queue.put(bytes(indata))
+    audio_buffer.write(indata)
 
-def get_audio_queue():
-    """Access to the audio queue"""
-    return audio_queue
+def get_audio_buffer():
+    """Access to the audio ring buffer"""
+    return audio_buffer
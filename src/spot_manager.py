@@ -1,14 +1,40 @@
 """Spot/location management for GAIA"""
 
 import json
-import pyautogui
+import input_backend
 import os
 from speech import speak
 from ui_manager import show_label
+from fuzzy_index import FuzzyIndex
 import config
 
 # Global dictionary for single spots only
 spots = {}
+spot_listeners = []  # Callbacks notified when spots change
+spot_index = FuzzyIndex()  # Spot names for misheard-name lookups
+
+def add_spot_listener(callback):
+    """Register a callback(event, name) run when spots are added, deleted, reset or loaded"""
+    spot_listeners.append(callback)
+
+def notify_spot_listeners(event, name=None):
+    """Tell registered listeners that the spots changed"""
+    for callback in spot_listeners:
+        try:
+            callback(event, name)
+        except Exception as e:
+            print(f"Error in spot listener: {e}")
+
+def update_spot_index(event, name=None):
+    """Keep the fuzzy spot index in step with the spots"""
+    if event == "add":
+        spot_index.add(name)
+    elif event == "delete":
+        spot_index.remove(name)
+    else:
+        spot_index.build(spots)
+
+add_spot_listener(update_spot_index)
 
 def save_spots():
     """Save spots to disk"""
@@ -59,11 +85,13 @@ def load_spots():
     else:
         print("Spots file not found. Starting with empty spots.")
         spots = {}
+    notify_spot_listeners("load")
 
 def reset_spots():
     """Delete all spots"""
     global spots
     spots = {}
+    notify_spot_listeners("reset")
     if os.path.exists(config.SPOTS_FILE):
         try:
             os.remove(config.SPOTS_FILE)
@@ -83,9 +111,10 @@ def add_spot(name):
         speak(f"Cannot use protected name {name}")
         return False
 
-    position = pyautogui.position()
+    position = input_backend.position()
     spots[name] = position
     save_spots()
+    notify_spot_listeners("add", name)
     speak(f"Marked spot {name}")
     show_label(name, *position)
     return True
@@ -95,6 +124,7 @@ def delete_spot(name):
     if name in spots:
         del spots[name]
         save_spots()
+        notify_spot_listeners("delete", name)
         speak(f"Deleted mark {name}")
         return True
     else:
@@ -105,7 +135,7 @@ def go_to_spot(name):
     """Move cursor to a spot"""
     if name in spots:
         x, y = spots[name]
-        pyautogui.moveTo(x, y, duration=0.25)
+        input_backend.move_to(x, y, duration=0.25)
         show_label(name, x, y)
         return True
     else:
@@ -124,5 +154,11 @@ def get_spots():
     """Return the spots dictionary"""
     return spots
 
+def find_spot(name):
+    """Return the spot called name, or the one it was most likely misheard as, or None"""
+    if name in spots:
+        return name
+    return spot_index.closest(name)
+
 # Load spots when the module is imported
 load_spots()
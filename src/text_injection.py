@@ -0,0 +1,262 @@
+"""Text injection for GAIA
+
+Short strings are typed directly as Unicode key events through the input backend. Long
+strings are pasted from a clipboard that GAIA owns in-process, and the operator's previous
+clipboard text is put back shortly after the paste.
+"""
+
+import os
+import queue
+import select
+import sys
+import threading
+import time
+
+import config
+import input_backend
+from tracing import LatencyHistogram
+
+TYPED = "typed"
+PASTED = "pasted"
+
+# Globals
+clipboard = None  # Clipboard backend, created on first paste
+saved_text = None  # Operator's clipboard text waiting to be restored
+restore_timer = None
+paste_lock = threading.Lock()
+histograms = {TYPED: LatencyHistogram(), PASTED: LatencyHistogram()}
+histograms_lock = threading.Lock()
+
+class PyperclipClipboard:
+    """Clipboard through pyperclip (in-process on Windows and macOS, a subprocess per call on Linux)"""
+
+    name = "pyperclip"
+
+    def __init__(self):
+        import pyperclip
+        self.pyperclip = pyperclip
+
+    def get_text(self):
+        return self.pyperclip.paste()
+
+    def set_text(self, text):
+        self.pyperclip.copy(text)
+
+class X11Clipboard:
+    """Persistent owner of the X11 CLIPBOARD selection, served from its own thread"""
+
+    name = "x11"
+    MAX_BYTES = 200000  # Larger transfers need the INCR protocol; those go through pyperclip
+
+    def __init__(self):
+        from Xlib import X, Xatom, display
+        from Xlib.protocol import event
+        self.X = X
+        self.Xatom = Xatom
+        self.event = event
+        self.display = display.Display()
+        self.window = self.display.screen().root.create_window(0, 0, 1, 1, 0, X.CopyFromParent)
+        self.CLIPBOARD = self.display.intern_atom("CLIPBOARD")
+        self.UTF8_STRING = self.display.intern_atom("UTF8_STRING")
+        self.TARGETS = self.display.intern_atom("TARGETS")
+        self.TEXT = self.display.intern_atom("TEXT")
+        self.PROPERTY = self.display.intern_atom("GAIA_CLIPBOARD")
+        self.data = None  # Bytes served while we own the selection
+        self.owned = False
+        self.fallback = None
+        self.requests = queue.Queue()  # (kind, value, reply queue) handled on the owner thread
+        self.wake_read, self.wake_write = os.pipe()
+        self.pending_get = None  # Reply queue of a get waiting for a SelectionNotify
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def call(self, kind, value=None, timeout=1.0):
+        """Run a request on the owner thread and wait for its result"""
+        reply = queue.Queue()
+        self.requests.put((kind, value, reply))
+        os.write(self.wake_write, b"x")
+        result = reply.get(timeout=timeout)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_text(self):
+        try:
+            return self.call("get", timeout=0.2)
+        except queue.Empty:
+            return None  # Owner didn't answer; nothing to restore
+
+    def set_text(self, text):
+        data = text.encode("utf-8")
+        if len(data) > self.MAX_BYTES:
+            if self.fallback is None:
+                self.fallback = PyperclipClipboard()
+            self.fallback.set_text(text)
+            return
+        self.call("set", data)
+
+    def run(self):
+        """Owner thread: answer selection requests and run queued get/set calls"""
+        while True:
+            readable, _, _ = select.select([self.display.fileno(), self.wake_read], [], [])
+            if self.wake_read in readable:
+                os.read(self.wake_read, 64)
+            while True:
+                try:
+                    kind, value, reply = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self.handle_call(kind, value, reply)
+                except Exception as e:
+                    reply.put(e)
+            while self.display.pending_events():
+                self.handle_event(self.display.next_event())
+
+    def handle_call(self, kind, value, reply):
+        X = self.X
+        if kind == "set":
+            self.data = value
+            self.window.set_selection_owner(self.CLIPBOARD, X.CurrentTime)
+            self.owned = self.display.get_selection_owner(self.CLIPBOARD) == self.window
+            reply.put(None if self.owned else RuntimeError("Could not take the X11 clipboard"))
+        elif kind == "get":
+            if self.owned:
+                reply.put(self.data.decode("utf-8", "replace") if self.data is not None else None)
+            elif self.display.get_selection_owner(self.CLIPBOARD) == X.NONE:
+                reply.put(None)
+            else:
+                self.pending_get = reply
+                self.window.convert_selection(self.CLIPBOARD, self.UTF8_STRING, self.PROPERTY, X.CurrentTime)
+                self.display.flush()
+
+    def handle_event(self, event):
+        X = self.X
+        if event.type == X.SelectionRequest:
+            self.answer(event)
+        elif event.type == X.SelectionClear:
+            self.owned = False
+            self.data = None
+        elif event.type == X.SelectionNotify and self.pending_get is not None:
+            text = None
+            if event.property != X.NONE:
+                prop = self.window.get_full_property(self.PROPERTY, X.AnyPropertyType)
+                if prop is not None and prop.format == 8:
+                    value = prop.value
+                    text = value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+            self.pending_get.put(text)
+            self.pending_get = None
+
+    def answer(self, request):
+        """Serve our clipboard text to another client"""
+        X = self.X
+        prop = request.property if request.property != X.NONE else request.target
+        if self.data is None:
+            prop = X.NONE
+        elif request.target == self.TARGETS:
+            request.requestor.change_property(
+                prop, self.Xatom.ATOM, 32, [self.TARGETS, self.UTF8_STRING, self.TEXT, self.Xatom.STRING]
+            )
+        elif request.target in (self.UTF8_STRING, self.TEXT, self.Xatom.STRING):
+            request.requestor.change_property(prop, request.target, 8, self.data)
+        else:
+            prop = X.NONE
+        reply = self.event.SelectionNotify(
+            time=request.time, requestor=request.requestor, selection=request.selection,
+            target=request.target, property=prop
+        )
+        request.requestor.send_event(reply)
+        self.display.flush()
+
+def create_clipboard(name):
+    """Create a clipboard backend by name; "auto" owns the X11 clipboard in-process when possible"""
+    if name == "x11" or (name == "auto" and sys.platform.startswith("linux") and os.environ.get("DISPLAY")):
+        try:
+            return X11Clipboard()
+        except Exception as e:
+            if name == "x11":
+                raise
+            print(f"X11 clipboard owner unavailable ({e}), using pyperclip")
+    return PyperclipClipboard()
+
+def get_clipboard():
+    """Return the clipboard backend, creating it on first use"""
+    global clipboard
+    if clipboard is None:
+        clipboard = create_clipboard(config.CLIPBOARD_OWNER)
+        print(f"Clipboard: {clipboard.name}")
+    return clipboard
+
+def set_clipboard(new_clipboard):
+    """Replace the clipboard backend (used by the replay harness)"""
+    global clipboard
+    clipboard = new_clipboard
+
+def restore_clipboard():
+    """Put the operator's clipboard text back after our paste has been read"""
+    global saved_text, restore_timer
+    with paste_lock:
+        if saved_text is not None:
+            try:
+                get_clipboard().set_text(saved_text)
+            except Exception as e:
+                print(f"Error restoring clipboard: {e}")
+        saved_text = None
+        restore_timer = None
+
+def paste_text(text):
+    """Paste text through the clipboard, saving the operator's clipboard for restore"""
+    global saved_text, restore_timer
+    board = get_clipboard()
+    with paste_lock:
+        if restore_timer is not None:
+            # Back-to-back pastes: the saved text is still the operator's, keep it
+            restore_timer.cancel()
+        else:
+            try:
+                saved_text = board.get_text()
+            except Exception as e:
+                print(f"Error reading clipboard: {e}")
+                saved_text = None
+        board.set_text(text)
+        input_backend.hotkey('ctrl', 'v')
+        restore_timer = threading.Timer(config.CLIPBOARD_RESTORE_DELAY, restore_clipboard)
+        restore_timer.daemon = True
+        restore_timer.start()
+
+def inject_text(text):
+    """Type or paste text into the focused window; returns the strategy used"""
+    if not text:
+        return None
+    started = time.perf_counter()
+    if len(text) <= config.TEXT_TYPE_MAX_CHARS and input_backend.can_type(text):
+        strategy = TYPED
+        input_backend.write(text)
+    else:
+        strategy = PASTED
+        paste_text(text)
+    with histograms_lock:
+        histograms[strategy].record(time.perf_counter() - started)
+    return strategy
+
+def get_stats():
+    """Return count and p50/p95/max latency in milliseconds per strategy"""
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    with histograms_lock:
+        return {
+            strategy: {
+                "count": histogram.total,
+                "p50_ms": ms(histogram.percentile(50)),
+                "p95_ms": ms(histogram.percentile(95)),
+                "max_ms": ms(histogram.max_us / 1_000_000),
+            }
+            for strategy, histogram in histograms.items()
+        }
+
+def shutdown_text_injection():
+    """Restore the operator's clipboard now if a restore is still pending"""
+    if restore_timer is not None:
+        restore_timer.cancel()
+        restore_clipboard()
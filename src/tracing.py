@@ -0,0 +1,144 @@
+"""Per-utterance latency tracing for GAIA"""
+
+import json
+import threading
+import time
+
+import config
+
+# Points an utterance is stamped at, in pipeline order
+TRACE_POINTS = ["audio", "vad_onset", "final", "match", "input", "complete"]
+# Intervals recorded per command (start point, end point)
+TRACE_STAGES = [
+    ("audio", "final"),
+    ("vad_onset", "final"),
+    ("final", "match"),
+    ("match", "input"),
+    ("input", "complete"),
+    ("audio", "complete"),
+]
+SUB_BUCKET_BITS = 7  # 128 sub-buckets per power of two, about 1.6% worst-case error
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+# Globals
+histograms = {}  # command name -> stage name -> LatencyHistogram
+histograms_lock = threading.Lock()
+current = threading.local()  # Trace of the command running on this thread
+exit_report_path = None  # Report written when GAIA exits (set by --latency-report)
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies with microsecond resolution"""
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.total = 0
+        self.max_us = 0
+
+    @staticmethod
+    def bucket_index(value_us):
+        """Map a value to its bucket: exact below 128us, then 64 sub-buckets per power of two"""
+        shift = max(0, value_us.bit_length() - SUB_BUCKET_BITS)
+        return shift * SUB_BUCKET_HALF + (value_us >> shift)
+
+    @staticmethod
+    def bucket_value(index):
+        """Return the midpoint of a bucket in microseconds"""
+        if index < 2 * SUB_BUCKET_HALF:
+            return index
+        shift = index // SUB_BUCKET_HALF - 1
+        sub_bucket = index - shift * SUB_BUCKET_HALF
+        return (sub_bucket << shift) + (1 << shift) // 2
+
+    def record(self, seconds):
+        """Record one latency"""
+        value_us = max(0, int(seconds * 1_000_000))
+        index = self.bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile(self, percent):
+        """Return the latency in seconds at a percentile (0-100)"""
+        if not self.total:
+            return None
+        target = max(1, int(round(percent / 100.0 * self.total)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.bucket_value(index), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+class Trace:
+    """Timestamps of one utterance as it moves through the pipeline"""
+
+    def __init__(self, stamps=None):
+        self.stamps = dict(stamps or {})
+
+    def stamp(self, point, at=None):
+        """Record the first time the utterance reaches a point"""
+        if point not in self.stamps:
+            self.stamps[point] = time.perf_counter() if at is None else at
+
+def start_trace():
+    """Create a trace for a new utterance, or None when tracing is disabled"""
+    if not config.LATENCY_TRACING:
+        return None
+    return Trace()
+
+def set_current(trace):
+    """Attach a trace to the calling thread so later stamps find it"""
+    current.trace = trace
+
+def mark(point):
+    """Stamp the calling thread's trace, if any"""
+    trace = getattr(current, "trace", None)
+    if trace is not None:
+        trace.stamp(point)
+
+def mark_input():
+    """Stamp the first injected input event of the current command"""
+    mark("input")
+
+def finish(trace, command_name):
+    """Stamp completion and record the trace's intervals under a command name"""
+    if trace is None:
+        return
+    trace.stamp("complete")
+    with histograms_lock:
+        stages = histograms.setdefault(command_name, {})
+        for start, end in TRACE_STAGES:
+            if start in trace.stamps and end in trace.stamps:
+                stage = f"{start}_to_{end}"
+                stages.setdefault(stage, LatencyHistogram()).record(trace.stamps[end] - trace.stamps[start])
+
+def build_report():
+    """Return p50/p95/p99/max in milliseconds per command and stage"""
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    report = {}
+    with histograms_lock:
+        for command_name, stages in sorted(histograms.items()):
+            report[command_name] = {
+                stage: {
+                    "count": histogram.total,
+                    "p50_ms": ms(histogram.percentile(50)),
+                    "p95_ms": ms(histogram.percentile(95)),
+                    "p99_ms": ms(histogram.percentile(99)),
+                    "max_ms": ms(histogram.max_us / 1_000_000),
+                }
+                for stage, histogram in stages.items()
+            }
+    return report
+
+def dump_report(path):
+    """Write the latency percentiles to a JSON file"""
+    try:
+        with open(path, "w") as f:
+            json.dump(build_report(), f, indent=4)
+        print(f"Latency report written to {path}")
+        return True
+    except Exception as e:
+        print(f"Error writing latency report {path}: {e}")
+        return False
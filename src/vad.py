@@ -0,0 +1,94 @@
+"""Voice activity gate for GAIA"""
+
+from collections import deque
+
+import numpy as np
+
+import config
+
+class VoiceActivityGate:
+    """Energy gate that only passes speech blocks (plus pre-roll and hangover) to the recognizer"""
+
+    def __init__(self, sample_rate=16000):
+        self.frame_length = max(1, int(sample_rate * config.VAD_FRAME_MS / 1000))
+        self.pre_roll = deque(maxlen=config.VAD_PRE_ROLL_BLOCKS)  # Silent blocks kept so onsets aren't clipped
+        self.noise_floor = None  # Adaptive RMS estimate of background noise
+        self.active = False  # True while speech (or its hangover) is passing through
+        self.hangover_left = 0
+        self.blocks_skipped = 0
+        self.blocks_decoded = 0
+
+    def frame_energies(self, samples):
+        """Return the RMS energy of each frame in a block of int16 samples"""
+        usable = len(samples) - len(samples) % self.frame_length
+        if usable == 0:
+            usable = len(samples)
+            frames = samples[:usable].astype(np.float32).reshape(1, -1)
+        else:
+            frames = samples[:usable].astype(np.float32).reshape(-1, self.frame_length)
+        return np.sqrt(np.mean(frames * frames, axis=1))
+
+    def is_speech(self, samples):
+        """Check a block against the adaptive threshold and update the noise floor"""
+        if len(samples) == 0:
+            return False
+        energies = self.frame_energies(samples)
+        block_floor = float(np.median(energies))
+        if self.noise_floor is None:
+            self.noise_floor = block_floor
+
+        threshold = max(config.VAD_MIN_RMS, self.noise_floor * config.VAD_THRESHOLD_RATIO)
+        speech = bool(np.any(energies > threshold))
+
+        # Track the floor quickly during silence and slowly during speech so steady noise can't lock the gate open
+        rate = config.VAD_FLOOR_SPEECH_ADAPT_RATE if speech else config.VAD_FLOOR_ADAPT_RATE
+        self.noise_floor += rate * (block_floor - self.noise_floor)
+        return speech
+
+    def process(self, data):
+        """Gate a block of audio
+
+        Returns:
+            (blocks, ended): the blocks to decode, in order, and whether an utterance just ended
+        """
+        samples = np.frombuffer(data, dtype=np.int16)
+        ended = False
+
+        if self.is_speech(samples):
+            if self.active:
+                blocks = [data]
+            else:
+                # Speech onset: flush the pre-roll so the start of the first word is decoded
+                blocks = list(self.pre_roll) + [data]
+                self.blocks_skipped -= len(self.pre_roll)
+                self.pre_roll.clear()
+                self.active = True
+            self.hangover_left = config.VAD_HANGOVER_BLOCKS
+        elif self.active and self.hangover_left > 0:
+            # Keep decoding through short pauses and give the recognizer trailing silence to endpoint on
+            self.hangover_left -= 1
+            blocks = [data]
+        else:
+            if self.active:
+                self.active = False
+                ended = True
+            self.pre_roll.append(data)
+            self.blocks_skipped += 1
+            blocks = []
+
+        self.blocks_decoded += len(blocks)
+        return blocks, ended
+
+    def reset(self):
+        """Drop buffered audio and close the gate"""
+        self.pre_roll.clear()
+        self.active = False
+        self.hangover_left = 0
+
+    def get_stats(self):
+        """Return the skipped/decoded block counters"""
+        return {
+            "blocks_skipped": self.blocks_skipped,
+            "blocks_decoded": self.blocks_decoded,
+            "noise_floor": self.noise_floor,
+        }
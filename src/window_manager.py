@@ -1,25 +1,26 @@
 """Window management functionality for GAIA"""
 
-import pyautogui
+import input_backend
 import time
-from speech import speak
+import config
+from speech import speak, URGENT
 from ui_manager import show_confirmation_dialog
 
 def minimize_window():
     """Minimize the current active window"""
-    pyautogui.hotkey('win', 'down')
+    input_backend.hotkey('win', 'down')
     print("Minimized current window")
     return True
 
 def maximize_window():
     """Maximize/restore the current active window"""
-    pyautogui.hotkey('win', 'up')
+    input_backend.hotkey('win', 'up')
     print("Maximized current window")
     return True
 
 def toggle_fullscreen():
     """Toggle fullscreen mode for current window (F11)"""
-    pyautogui.press('f11')
+    input_backend.press('f11')
     print("Toggled fullscreen mode")
     return True
 
@@ -28,13 +29,16 @@ def handle_close_confirmation(confirmed):
     if confirmed:
         print("Close confirmed, closing window")
         # Alt+F4 to close window
-        pyautogui.hotkey('alt', 'f4')
+        input_backend.hotkey('alt', 'f4')
     else:
         print("Close canceled")
 
 def close_window():
     """Close the current active window with confirmation"""
-    speak("Are you sure you want to close this window?")
+    speak(
+        "Are you sure you want to close this window?",
+        priority=URGENT, ttl=config.CLOSE_CONFIRMATION_TIMEOUT, interrupt=True
+    )
     show_confirmation_dialog(
         "Are you sure you want to close this window?",
         handle_close_confirmation
@@ -0,0 +1,6 @@
+"""Shared test setup: GAIA's modules live in src/ and import each other by bare name"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,101 @@
+"""Microphone ring buffer overflow policies and the decoded-audio history"""
+
+import numpy as np
+import pytest
+
+from audio_buffer import DROP_NEWEST, DROP_OLDEST, AudioHistory, AudioRingBuffer
+
+def pcm(start, count):
+    """count int16 samples numbered from start, as raw bytes"""
+    return np.arange(start, start + count, dtype=np.int16).tobytes()
+
+def samples(data):
+    return np.frombuffer(data, dtype=np.int16).tolist()
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        AudioRingBuffer(10, overflow_policy="drop_everything")
+
+def test_read_wraps_around():
+    ring = AudioRingBuffer(10)
+    ring.write(pcm(0, 8))
+    assert samples(ring.read(6)) == list(range(6))
+    ring.write(pcm(8, 6))
+    assert samples(ring.read(8)) == list(range(6, 14))
+    assert ring.backlog_samples() == 0
+
+def test_read_times_out():
+    ring = AudioRingBuffer(10)
+    ring.write(pcm(0, 3))
+    assert ring.read(4, timeout=0.01) is None
+    assert ring.backlog_samples() == 3
+
+def test_drop_oldest_keeps_the_newest_audio():
+    ring = AudioRingBuffer(10, overflow_policy=DROP_OLDEST)
+    ring.write(pcm(0, 8))
+    ring.write(pcm(8, 5))
+    assert ring.get_stats()["overruns"] == 1
+    assert ring.samples_dropped == 3
+    assert samples(ring.read(10)) == list(range(3, 13))
+
+def test_drop_newest_keeps_the_backlog():
+    ring = AudioRingBuffer(10, overflow_policy=DROP_NEWEST)
+    ring.write(pcm(0, 8))
+    ring.write(pcm(8, 5))
+    assert ring.samples_dropped == 3
+    assert samples(ring.read(10)) == list(range(10))
+
+def test_oversized_block_counts_every_dropped_sample():
+    ring = AudioRingBuffer(100, overflow_policy=DROP_OLDEST)
+    ring.write(pcm(0, 80))
+    ring.write(pcm(80, 200))
+    # 80 unread samples are overwritten and the first 100 of the block never fit
+    assert ring.samples_dropped == 180
+    assert samples(ring.read(100)) == list(range(180, 280))
+
+def test_clear_and_backlog():
+    ring = AudioRingBuffer(16000, sample_rate=16000)
+    ring.write(pcm(0, 8000))
+    assert ring.backlog_ms() == 500.0
+    ring.clear()
+    assert ring.backlog_samples() == 0
+
+def test_history_returns_the_last_utterance():
+    history = AudioHistory(100)
+    history.write(pcm(0, 10))
+    history.start_utterance()
+    history.write(pcm(10, 20))
+    history.end_utterance("save")
+    history.start_utterance()
+    history.write(pcm(30, 5))
+    history.end_utterance("try again")
+    data, text = history.last_utterance(exclude=("try again",))
+    assert text == "save"
+    assert samples(data) == list(range(10, 30))
+
+def test_history_utterance_across_the_wrap():
+    history = AudioHistory(50)
+    history.write(pcm(0, 40))
+    history.start_utterance()
+    history.write(pcm(40, 30))
+    history.end_utterance("copy")
+    data, _ = history.last_utterance()
+    assert samples(data) == list(range(40, 70))
+
+def test_history_skips_unfinished_and_overwritten_utterances():
+    history = AudioHistory(50)
+    history.start_utterance()
+    history.write(pcm(0, 20))
+    assert history.last_utterance() is None  # Still open
+    history.end_utterance("paste")
+    history.write(pcm(20, 40))
+    assert history.last_utterance() is None  # Its start was overwritten
+
+def test_history_after_an_oversized_block():
+    history = AudioHistory(10)
+    history.write(pcm(0, 25))
+    history.start_utterance()
+    history.write(pcm(25, 4))
+    history.end_utterance("undo")
+    data, _ = history.last_utterance()
+    assert samples(data) == list(range(25, 29))
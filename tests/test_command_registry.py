@@ -0,0 +1,181 @@
+"""Command resolution checked against the if-chain in handle_command that the registry replaced"""
+
+import os
+import tempfile
+
+import pytest
+
+# command_handler pulls in the speech stack; pyautogui/pyperclip get replay's recording stand-ins
+pytest.importorskip("vosk")
+pytest.importorskip("pyttsx3")
+pytest.importorskip("sounddevice")
+
+from replay import install_stand_ins
+
+install_stand_ins()
+
+import config
+
+# Never touch the operator's real spots
+config.SPOTS_FILE = os.path.join(tempfile.mkdtemp(), "spots.json")
+
+import command_handler
+import spot_manager
+
+# What the old if-chain ran for each fixed phrase: (action, bound arguments)
+OLD_CHAIN = {
+    "start dictation": ("start_dictation_mode", ()),
+    "faster": ("faster_command", ()),
+    "slower": ("slower_command", ()),
+    "stop": ("stop_command", ()),
+    "mode": ("press_hotkey", ("ctrl", ".")),
+    "microphone": ("press_hotkey", ("alt", "n")),
+    "context": ("press_hotkey", ("ctrl", "/")),
+    "screenshot": ("press_hotkey", ("win", "shift", "s")),
+    "minimize window": ("minimize_window", ()),
+    "maximize window": ("maximize_window", ()),
+    "fullscreen": ("toggle_fullscreen", ()),
+    "close window": ("close_window", ()),
+    "new tab": ("press_hotkey", ("ctrl", "t")),
+    "close tab": ("press_hotkey", ("ctrl", "w")),
+    "reopen tab": ("press_hotkey", ("ctrl", "shift", "t")),
+    "save": ("press_hotkey", ("ctrl", "s")),
+    "copy": ("press_hotkey", ("ctrl", "c")),
+    "paste": ("press_hotkey", ("ctrl", "v")),
+    "select all": ("press_hotkey", ("ctrl", "a")),
+    "undo": ("press_hotkey", ("ctrl", "z")),
+    "redo": ("press_hotkey", ("ctrl", "shift", "z")),
+    "zoom": ("press_hotkey", ("ctrl", "+")),
+    "zoom out": ("press_hotkey", ("ctrl", "-")),
+    "previous": ("press_hotkey", ("alt", "left")),
+    "next": ("press_hotkey", ("alt", "right")),
+    "click": ("click_mouse", ()),
+    "left click": ("click_mouse", ()),
+    "right click": ("right_click", ()),
+    "double click": ("double_click", ()),
+    "triple click": ("click_mouse", (3,)),
+    "left": ("press_key", ("left",)),
+    "right": ("press_key", ("right",)),
+    "p up": ("press_key", ("pageup",)),
+    "p down": ("press_key", ("pagedown",)),
+    "enter": ("press_key", ("enter",)),
+    "delete": ("press_key", ("delete",)),
+    "escape": ("press_key", ("escape",)),
+    "tab": ("press_key", ("tab",)),
+    "space": ("press_key", ("space",)),
+    "next edit": ("press_hotkey", ("alt", "f5")),
+    "previous edit": ("press_hotkey", ("shift", "alt", "f5")),
+    "press down": ("hold_arrow_command", ("down",)),
+    "press up": ("hold_arrow_command", ("up",)),
+    "press left": ("hold_arrow_command", ("left",)),
+    "press right": ("hold_arrow_command", ("right",)),
+    "press page down": ("hold_page_command", ("pagedown", "Scrolling down slowly")),
+    "press page up": ("hold_page_command", ("pageup", "Scrolling up slowly")),
+    "select from": ("select_command", ("down", "Selecting downward")),
+    "select until": ("select_command", ("up", "Selecting upward")),
+    "next tab": ("press_hotkey", ("ctrl", "tab")),
+    "previous tab": ("press_hotkey", ("ctrl", "shift", "tab")),
+    "search bar": ("search_bar_command", ()),
+    "save all code": ("save_all_code_command", ()),
+    "file down": ("press_hotkey", ("alt", "down")),
+    "file up": ("press_hotkey", ("alt", "up")),
+    "list spots": ("list_spots", ()),
+    "reset spots": ("reset_spots_command", ()),
+    "visualize marks": ("visualize_marks_command", ()),
+    "latency report": ("latency_report_command", ()),
+    "exit": ("exit_command", ()),
+    "quit": ("exit_command", ()),
+}
+
+def resolve(command):
+    """(action name, arguments) the registry runs for a command, or None"""
+    resolved = command_handler.registry.resolve(command)
+    if resolved is None:
+        return None
+    entry, args = resolved
+    return entry.action.__name__, tuple(args)
+
+@pytest.fixture
+def spots():
+    """Spots named like commands on both sides of the old chain's spot check, plus "desk\""""
+    saved = dict(spot_manager.spots)
+    spot_manager.spots.clear()
+    spot_manager.spots.update({"next": (1, 1), "copy": (2, 2), "left": (3, 3), "enter": (4, 4), "desk": (5, 5)})
+    spot_manager.update_spot_index("load")
+    yield spot_manager.spots
+    spot_manager.spots.clear()
+    spot_manager.spots.update(saved)
+    spot_manager.update_spot_index("load")
+
+@pytest.mark.parametrize("phrase", sorted(OLD_CHAIN))
+def test_fixed_phrases_resolve_as_before(phrase):
+    assert resolve(phrase) == OLD_CHAIN[phrase]
+
+def test_every_registered_phrase_resolves_to_itself():
+    for phrase in command_handler.registry.exact_phrases():
+        entry, _ = command_handler.registry.resolve(phrase)
+        assert phrase in entry.key
+
+@pytest.mark.parametrize("phrase, expected", [
+    # Commands checked before the spot lookup still win over a spot with the same name
+    ("next", ("press_hotkey", ("alt", "right"))),
+    ("copy", ("press_hotkey", ("ctrl", "c"))),
+    # Commands checked after it lose to the spot
+    ("left", ("click_spot", ("left",))),
+    ("enter", ("click_spot", ("enter",))),
+    ("desk", ("click_spot", ("desk",))),
+    ("double click desk", ("double_click_spot", ("desk",))),
+    ("double click", ("double_click", ())),
+])
+def test_spot_precedence(spots, phrase, expected):
+    assert resolve(phrase) == expected
+
+def test_double_click_needs_a_spot():
+    assert resolve("double click banana") is None
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("mark delete desk", ("delete_spot", ("desk",))),
+    ("unmark desk", ("delete_spot", ("desk",))),
+    ("mark desk", ("mark_command", ("desk",))),
+    ("type hello world", ("type_command", ("hello world",))),
+    ("look for needle", ("look_for_command", ("needle",))),
+    ("goto line 12", ("goto_line_command", ("12",))),
+])
+def test_prefix_commands(phrase, expected):
+    assert resolve(phrase) == expected
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("five down", ("up_down_command", ("five", "down", False))),
+    ("twelve up enter", ("up_down_command", ("twelve", "up", True))),
+    ("four hundred and twelve down", ("up_down_command", ("four hundred and twelve", "down", False))),
+    ("next three tabs", ("tab_switch_command", ("next", "three", False))),
+    ("previous two tab enter", ("tab_switch_command", ("previous", "two", True))),
+])
+def test_number_patterns(phrase, expected):
+    assert resolve(phrase) == expected
+
+def test_invalid_numbers_do_not_match():
+    assert resolve("twenty twenty down") is None
+    assert resolve("next and tabs") is None
+
+def test_unknown_command_is_not_handled():
+    assert command_handler.handle_command("banana split") is False
+
+def test_misheard_names_never_run_destructive_commands(spots):
+    for phrase in ("exist", "quite", "reset spot", "close windows", "close tap"):
+        assert command_handler.resolve_misheard(phrase) is None
+
+def test_misheard_spot_is_clicked_but_not_deleted(spots):
+    assert command_handler.resolve_misheard("dusk") is not None
+    assert resolve("mark delete dusk") == ("delete_spot", ("dusk",))
+
+def test_speed_change_is_spoken_once_with_the_new_value(monkeypatch):
+    spoken = []
+    monkeypatch.setattr(command_handler, "speak", lambda text, **kwargs: spoken.append((text, kwargs.get("key"))))
+    command_handler.stop_key_hold()  # Back to 1x
+    command_handler.faster_command()
+    command_handler.slower_command()
+    assert spoken == [
+        (f"Speed {1 + config.SPEED_INCREMENT:.1f}", "speed"),
+        ("Speed 1.0", "speed"),
+    ]
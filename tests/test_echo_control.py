@@ -0,0 +1,65 @@
+"""Echo suppression in the process that decodes, with playback mirrored from the one that speaks"""
+
+import os
+import queue
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+import pytest
+
+pytest.importorskip("vosk")
+pytest.importorskip("pyttsx3")
+pytest.importorskip("sounddevice")
+
+from replay import install_stand_ins
+
+install_stand_ins()
+
+import config
+
+config.SPOTS_FILE = os.path.join(tempfile.mkdtemp(), "spots.json")
+
+import decoder_process
+import echo_control
+
+BLOCK = np.full(1600, 1000, dtype=np.int16).tobytes()  # 0.1 s of audio
+
+@pytest.fixture
+def intervals(monkeypatch):
+    """Fresh playback intervals and listeners"""
+    monkeypatch.setattr(echo_control, "playback_intervals", deque(maxlen=32))
+    monkeypatch.setattr(echo_control, "playback_listeners", [])
+    return echo_control.playback_intervals
+
+def test_block_during_playback_is_dropped(intervals):
+    interval = echo_control.playback_started()
+    assert echo_control.filter_block(BLOCK, time.perf_counter()) is None
+    echo_control.playback_finished(interval)
+    later = time.perf_counter() + config.ECHO_TAIL + 0.2
+    assert echo_control.filter_block(BLOCK, later) == BLOCK
+
+def test_playback_listeners(intervals):
+    events = []
+    echo_control.add_playback_listener(lambda event, interval: events.append(event))
+    echo_control.playback_finished(echo_control.playback_started())
+    assert events == ["started", "finished"]
+
+def test_playback_reaches_the_decoder_process(intervals, monkeypatch):
+    controls = queue.Queue()
+    monkeypatch.setattr(decoder_process, "control_queue", controls)
+    echo_control.add_playback_listener(decoder_process.send_playback)
+
+    # The main process speaks...
+    interval = echo_control.playback_started()
+    echo_control.playback_finished(interval)
+
+    # ...and the decoder process, which has no playback of its own, checks the blocks
+    intervals.clear()
+    for _ in range(2):
+        kind, value = controls.get_nowait()
+        assert kind == "playback"
+        echo_control.mirror_playback(*value)
+    assert list(intervals) == [interval]
+    assert echo_control.filter_block(BLOCK, interval[1]) is None
@@ -0,0 +1,65 @@
+"""Dictation formatting: punctuation, breaks, capitalization, replacements and numbers"""
+
+import pytest
+
+from formatter import DEFAULT_REPLACEMENTS, DictationFormatter, build_phrase_table
+
+def format_chunks(chunks, replacements=None, number_min=10):
+    """Feed each chunk in turn and return (texts typed after each feed, text typed on flush)"""
+    table = build_phrase_table(dict(DEFAULT_REPLACEMENTS, **(replacements or {})))
+    formatter = DictationFormatter(table, number_min=number_min)
+    typed = [formatter.feed(chunk.split()) for chunk in chunks]
+    return typed, formatter.flush()
+
+def format_text(text, **kwargs):
+    typed, flushed = format_chunks([text], **kwargs)
+    return typed[0] + flushed
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("hello comma world period how are you question mark", "hello, world. How are you?"),
+    ("say full stop", "say."),
+    ("period", "."),
+    ("new line hello", "\nhello"),
+    ("hello period new paragraph again", "hello.\n\nAgain"),
+    ("new york", "new york"),
+    ("new", "new"),
+    ("cap john and all caps nasa", "John and NASA"),
+    ("i think i can", "I think I can"),
+])
+def test_words(spoken, expected):
+    assert format_text(spoken) == expected
+
+@pytest.mark.parametrize("spoken, expected", [
+    ("twenty", "20"),
+    ("four hundred and twelve", "412"),
+    ("four hundred and", "400 and"),
+    ("five apples", "five apples"),  # Below number_min stays words
+    ("one two three", "one two three"),  # No digit-by-digit reading in dictation
+])
+def test_numbers(spoken, expected):
+    assert format_text(spoken) == expected
+
+def test_number_min_zero_types_every_number_as_digits():
+    assert format_text("five apples", number_min=0) == "5 apples"
+
+def test_number_is_held_across_feeds():
+    typed, flushed = format_chunks(["twenty", "one"])
+    assert typed == ["", ""]
+    assert flushed == "21"
+
+def test_phrase_is_held_across_feeds():
+    typed, flushed = format_chunks(["hello new", "line there"])
+    assert typed == ["hello", "\nthere"]
+    assert flushed == ""
+
+def test_replacements_win_over_numbers_and_words():
+    assert format_text("twenty one", replacements={"twenty": "XX"}) == "XX one"
+    assert format_text("new york is big", replacements={"new york": "New York"}) == "New York is big"
+
+def test_copy_is_independent():
+    formatter = DictationFormatter(build_phrase_table(DEFAULT_REPLACEMENTS), number_min=10)
+    formatter.feed(["twenty"])
+    clone = formatter.copy()
+    clone.feed(["one"])
+    assert formatter.flush() == "20"
+    assert clone.flush() == "21"
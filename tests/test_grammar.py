@@ -0,0 +1,81 @@
+"""Counts in the command grammar, and counts outside it re-decoded without the grammar"""
+
+import json
+import os
+import queue
+import tempfile
+
+import pytest
+
+pytest.importorskip("vosk")
+pytest.importorskip("pyttsx3")
+pytest.importorskip("sounddevice")
+
+from replay import install_stand_ins
+
+install_stand_ins()
+
+import config
+
+config.SPOTS_FILE = os.path.join(tempfile.mkdtemp(), "spots.json")
+
+import command_handler
+import input_backend
+import recognition
+import rescoring
+from grammar import UNKNOWN_WORD, build_command_grammar, build_early_dispatch_phrases
+from number_parser import number_to_words
+
+rescoring.index.build(build_command_grammar(include_spots=False))
+
+class ScriptedRecognizer:
+    """Stands in for the free-form recognizer: hears the given text whatever the audio"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def AcceptWaveform(self, data):
+        return False
+
+    def FinalResult(self):
+        return json.dumps({"text": self.text})
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Recognition with a grammar recognizer result fed in directly, and input recorded"""
+    results = queue.Queue()
+    backend = input_backend.RecordingBackend()
+    monkeypatch.setattr(recognition, "result_queue", results)
+    monkeypatch.setattr(recognition, "command_recognizer", object())
+    monkeypatch.setattr(input_backend, "backend", backend)
+    return results, backend
+
+def decode(pipeline, grammar_text, free_form_text=""):
+    """Run a command-grammar result through recognition and dispatch; returns the keys pressed"""
+    results, backend = pipeline
+    recognition.free_form_recognizer = ScriptedRecognizer(free_form_text)
+    recognition.utterance_blocks.append(b"\0\0" * config.BLOCK_SIZE)
+    recognition.finish_utterance(recognition.command_recognizer, {"text": grammar_text})
+    text, _ = results.get_nowait()
+    command_handler.handle_command(text)
+    return [args[0] for _, kind, args in backend.events if kind == "press"]
+
+def test_every_count_to_a_hundred_is_in_the_grammar():
+    grammar = set(build_command_grammar(include_spots=False))
+    for count in range(1, 101):
+        assert f"{number_to_words(count)} down" in grammar
+    for count in range(200, config.MAX_REPEAT_COUNT + 1, 100):
+        assert f"{number_to_words(count)} up enter" in grammar
+
+@pytest.mark.parametrize("count", [25, 99, 300])
+def test_grammar_count(pipeline, count):
+    assert decode(pipeline, f"{number_to_words(count)} down") == ["down"] * count
+
+def test_count_outside_the_grammar_is_redecoded(pipeline):
+    pressed = decode(pipeline, f"{UNKNOWN_WORD} up enter", "two hundred and fifty up enter")
+    assert pressed == ["up"] * 250 + ["enter"]
+
+def test_unknown_count_is_not_dispatched_early():
+    early = build_early_dispatch_phrases(build_command_grammar(include_spots=False))
+    assert not any(UNKNOWN_WORD in phrase for phrase in early)
+    assert "twenty five down enter" in early
@@ -0,0 +1,27 @@
+"""Input backends: the event interface and batching"""
+
+import pytest
+
+import input_backend
+from input_backend import InputBackend, RecordingBackend
+
+def test_incomplete_backend_cannot_be_created():
+    class KeyboardOnly(InputBackend):
+        def press(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        KeyboardOnly()
+
+def test_batch_runs_in_order():
+    backend = RecordingBackend()
+    backend.send([("press", "down")] * 3 + [("hotkey", ("ctrl", "s")), ("move", 4, 5)])
+    assert [(kind, args) for _, kind, args in backend.events] == [
+        ("press", ("down",)), ("press", ("down",)), ("press", ("down",)),
+        ("hotkey", (("ctrl", "s"),)), ("move", (4, 5)),
+    ]
+    assert backend.position() == (4, 5)
+
+def test_every_backend_implements_the_interface():
+    for backend_class in (RecordingBackend, input_backend.PyAutoGUIBackend, input_backend.XTestBackend):
+        assert not backend_class.__abstractmethods__
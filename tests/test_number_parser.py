@@ -0,0 +1,60 @@
+"""Spoken number parsing: compositional and digit-by-digit forms"""
+
+import re
+
+import pytest
+
+from number_parser import NUMBER_PATTERN, number_to_words, parse_number, read_number
+
+def test_round_trip():
+    for number in [*range(0, 10000), 12345, 99999, 100000, 999999]:
+        assert parse_number(number_to_words(number)) == number, number_to_words(number)
+
+@pytest.mark.parametrize("text, expected", [
+    ("four hundred and twelve", 412),
+    ("four hundred twelve", 412),
+    ("hundred", 100),
+    ("a hundred", None),
+    ("one thousand and five", 1005),
+    ("twenty one", 21),
+    ("nineteen", 19),
+    ("zero", 0),
+    ("42", 42),
+    ("Twenty One", 21),
+])
+def test_compositional(text, expected):
+    assert parse_number(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("four one two", 412),
+    ("one oh five", 105),
+    ("zero five", 5),
+    ("one two three four", 1234),
+])
+def test_digit_by_digit(text, expected):
+    assert parse_number(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "", "oh", "and", "twenty twenty", "twelve one", "one hundred hundred",
+    "four hundred and", "thousand thousand", "twenty ten", "zero zero zero and",
+])
+def test_invalid(text):
+    assert parse_number(text) is None
+
+def test_read_number_stops_at_the_first_word_that_cannot_continue():
+    assert read_number("twenty one down".split()) == (21, 2)
+    assert read_number("five hundred and cats".split()) == (500, 2)
+    assert read_number("go five".split()) == (None, 0)
+    assert read_number("go five".split(), start=1) == (5, 2)
+
+def test_digits_can_be_turned_off():
+    assert read_number("one two three".split(), digits=False) == (1, 1)
+    assert read_number("one oh five".split(), digits=False) == (1, 1)
+
+@pytest.mark.parametrize("text", ["12", "twelve", "four hundred and twelve", "one oh five"])
+def test_pattern_matches_numbers(text):
+    assert re.fullmatch(NUMBER_PATTERN, text)
+
+@pytest.mark.parametrize("text", ["and", "and five", "tabs", "twelve tabs"])
+def test_pattern_rejects_other_words(text):
+    assert not re.fullmatch(NUMBER_PATTERN, text)
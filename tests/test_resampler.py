@@ -0,0 +1,58 @@
+"""Streaming polyphase resampler: block independence, length and frequency response"""
+
+import numpy as np
+import pytest
+
+from resampler import PolyphaseResampler
+
+RATES = (22050, 32000, 44100, 48000)
+
+def tone(frequency, rate, seconds=1.0, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+def gain(output, amplitude=8000):
+    """RMS of the steady-state output relative to the input sine"""
+    trimmed = output[len(output) // 10:-len(output) // 10].astype(np.float64)
+    return np.sqrt(np.mean(trimmed ** 2)) / (amplitude / np.sqrt(2))
+
+@pytest.mark.parametrize("rate", RATES)
+def test_blocks_match_one_shot(rate):
+    signal = tone(440, rate)
+    whole = PolyphaseResampler(rate).process(signal)
+    resampler = PolyphaseResampler(rate)
+    sizes = [1, 7, 4000, 333, 12000]
+    blocks, start = [], 0
+    while start < len(signal):
+        size = sizes[len(blocks) % len(sizes)]
+        blocks.append(resampler.process(signal[start:start + size]))
+        start += size
+    assert np.array_equal(np.concatenate(blocks), whole)
+
+@pytest.mark.parametrize("rate", RATES)
+def test_output_length_does_not_drift(rate):
+    resampler = PolyphaseResampler(rate)
+    block = round(4000 * rate / 16000)
+    produced = sum(len(resampler.process(np.zeros(block, dtype=np.int16))) for _ in range(100))
+    assert abs(produced - 100 * block * 16000 / rate) <= 1
+
+def test_same_rate_is_close_to_identity():
+    signal = tone(1000, 16000)
+    assert gain(PolyphaseResampler(16000).process(signal)) == pytest.approx(1.0, abs=0.01)
+
+@pytest.mark.parametrize("rate", RATES)
+def test_passband_is_flat(rate):
+    for frequency in (300, 1000, 4000):
+        assert gain(PolyphaseResampler(rate).process(tone(frequency, rate))) == pytest.approx(1.0, abs=0.02)
+
+@pytest.mark.parametrize("rate", (32000, 44100, 48000))
+def test_stopband_is_rejected(rate):
+    # 9.5 kHz would alias to 6.5 kHz at 16 kHz without the low-pass
+    assert gain(PolyphaseResampler(rate).process(tone(9500, rate))) < 1e-3
+
+def test_reset_forgets_history():
+    resampler = PolyphaseResampler(48000)
+    resampler.process(tone(440, 48000))
+    resampler.reset()
+    signal = tone(440, 48000, 0.1)
+    assert np.array_equal(resampler.process(signal), PolyphaseResampler(48000).process(signal))
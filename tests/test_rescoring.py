@@ -0,0 +1,52 @@
+"""N-best rescoring: corrections must be heard mostly as spoken and never produce destructive commands"""
+
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("vosk")
+pytest.importorskip("pyttsx3")
+pytest.importorskip("sounddevice")
+
+from replay import install_stand_ins
+
+install_stand_ins()
+
+import config
+
+config.SPOTS_FILE = os.path.join(tempfile.mkdtemp(), "spots.json")
+
+import rescoring
+from grammar import build_command_grammar
+
+rescoring.index.build(build_command_grammar(include_spots=False))
+
+def heard(text):
+    return {"text": text}
+
+@pytest.mark.parametrize("text, expected", [
+    ("to down", "two down"),
+    ("new tabs", "new tab"),
+    ("save", "save"),
+])
+def test_corrections(text, expected):
+    assert rescoring.rescore(heard(text)) == expected
+
+@pytest.mark.parametrize("text", ["exits", "quits", "reset spot", "close windows"])
+def test_never_corrects_to_destructive_commands(text):
+    assert rescoring.rescore(heard(text)) not in ("exit", "quit", "reset spots", "close window")
+
+def test_single_word_correction_is_rejected():
+    assert rescoring.rescore(heard("saves")) == ""
+
+def test_low_word_confidence_is_rejected():
+    result = {"text": "save", "result": [{"word": "save", "conf": 0.1}]}
+    assert rescoring.rescore(result) == ""
+
+def test_nbest_posteriors():
+    result = {"alternatives": [
+        {"text": "copy", "confidence": 200.0},
+        {"text": "coffee", "confidence": 198.0},
+    ]}
+    assert rescoring.rescore(result) == "copy"
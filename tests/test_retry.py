@@ -0,0 +1,100 @@
+"""'try again' re-decodes where the audio history lives and dispatches through the result queue"""
+
+import json
+import os
+import queue
+import tempfile
+
+import pytest
+
+pytest.importorskip("vosk")
+pytest.importorskip("pyttsx3")
+pytest.importorskip("sounddevice")
+
+from replay import install_stand_ins
+
+install_stand_ins()
+
+import config
+
+config.SPOTS_FILE = os.path.join(tempfile.mkdtemp(), "spots.json")
+
+import command_handler
+import decoder_process
+import recognition
+import rescoring
+from audio_buffer import AudioHistory
+from grammar import build_command_grammar
+
+rescoring.index.build(build_command_grammar(include_spots=False))
+
+class ScriptedRecognizer:
+    """Stands in for a re-decode recognizer: hears the given text whatever the audio"""
+
+    def __init__(self, text):
+        self.text = text
+        self.audio = b""
+
+    def AcceptWaveform(self, data):
+        self.audio += data
+        return False
+
+    def FinalResult(self):
+        return json.dumps({"text": self.text})
+
+@pytest.fixture
+def retry(monkeypatch):
+    """One utterance misheard as "safe" in the history, re-decoded as "save"; returns (results, spoken)"""
+    history = AudioHistory(16000)
+    history.start_utterance()
+    history.write(b"\1\0" * 800)
+    history.end_utterance("safe")
+    results, spoken = queue.Queue(), []
+    monkeypatch.setattr(recognition, "audio_history", history)
+    monkeypatch.setattr(recognition, "result_queue", results)
+    monkeypatch.setattr(recognition, "create_recognizer", lambda **kwargs: ScriptedRecognizer("save"))
+    monkeypatch.setattr(command_handler, "speak", spoken.append)
+    return results, spoken
+
+def test_retry_runs_on_the_concurrent_pool():
+    assert command_handler.is_concurrent_command("try again")
+    assert command_handler.is_concurrent_command("what did you hear")
+
+def test_retry_in_process(retry):
+    results, spoken = retry
+    command_handler.retry_command()
+    assert results.get_nowait() == ("save", None)
+    assert spoken == []
+
+def test_what_did_you_hear(retry):
+    results, spoken = retry
+    command_handler.retry_command(announce=True)
+    assert results.get_nowait() == ("save", None)
+    assert spoken == ["I heard save."]
+
+def test_nothing_to_retry(retry, monkeypatch):
+    results, spoken = retry
+    monkeypatch.setattr(recognition, "audio_history", AudioHistory(16000))
+    command_handler.retry_command()
+    assert results.empty()
+    assert spoken == ["Nothing to try again."]
+
+def test_retry_in_decoder_mode(retry, monkeypatch):
+    results, spoken = retry
+    controls, child_results = queue.Queue(), queue.Queue()
+    monkeypatch.setattr(config, "DECODER_PROCESS", True)
+    monkeypatch.setattr(decoder_process, "control_queue", controls)
+
+    # The parent only asks; the child, which has the audio history and models, re-decodes
+    command_handler.retry_command(announce=True)
+    kind, announce = controls.get_nowait()
+    assert kind == "redecode"
+    assert results.empty()
+
+    decoder_process.send_redecode(announce, child_results)
+    message = json.loads(child_results.get_nowait())
+    assert message == {"retry": ["safe", "save"], "announce": True}
+
+    decoder_process.forward_result(message)
+    assert results.get_nowait() == ("save", None)
+    assert spoken == ["I heard save."]